@@ -4,12 +4,11 @@ from vqe.circuits import (
 )
 from vqe.hamiltonians import generate_j1j2_hamiltonian
 import sympy
-import json
+from array_store import load_results, write_results
 import numpy as np
 
 datafilename = "data/v2/weight_decay/VQE-J1J2_J2=1.25_alternating-ansatz.json"
-with open(datafilename, "r") as f:
-    DATA = json.loads(f.read())
+DATA = load_results(datafilename)
 
 BOUNDARY_CONDITIONS = "open"
 CIRCUIT_TYPE = "alternating-ansatz"
@@ -62,6 +61,4 @@ for weight_decay in [1e-8, 1e-7, 1e-6, 1e-5, 1e-4, 1e-3, 1e-2, 1e-1, 1e0, 1e1]:
         str(weight_decay)
     ] = weight_decay_data
 
-    with open(datafilename, "w") as f:
-        f.write(json.dumps(DATA))
-    f.close()
+    write_results(datafilename, DATA)
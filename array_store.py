@@ -0,0 +1,118 @@
+import json
+import os
+import uuid
+import numpy as np
+
+ARRAY_KEYS = [
+    "initial_parameters",
+    "optimal_parameters",
+    "optimal_parameter_vectors",
+    "target_distribution",
+]
+INDEX_FILE = "index.json"
+
+
+def get_array_directory(path):
+    """Binary form of the results file at path: data/qlt/QCBM/L-BFGS-B/X.json is
+    kept in data/qlt/QCBM/L-BFGS-B/X/"""
+    return os.path.splitext(path)[0]
+
+
+def is_converted(path):
+    """Whether the binary form of the results file at path exists and is at least
+    as recent as the JSON file"""
+    index_path = os.path.join(get_array_directory(path), INDEX_FILE)
+    return os.path.exists(index_path) and (
+        not os.path.exists(path)
+        or os.path.getmtime(index_path) >= os.path.getmtime(path)
+    )
+
+
+def load_results(path):
+    """Contents of a results file, reading its binary form when that is at least
+    as recent as the JSON file.
+
+    In the binary form the vectors under ARRAY_KEYS are read-only views into one
+    memory-mapped .npy file, so loading only parses the small index and a
+    vector is read from disk when it is first used."""
+    directory = get_array_directory(path)
+    if is_converted(path):
+        with open(os.path.join(directory, INDEX_FILE), "r") as f:
+            index = json.load(f)
+        arrays = np.load(os.path.join(directory, index["arrays"]), mmap_mode="r")
+        return _insert_arrays(index["data"], arrays)
+    with open(path, "r") as f:
+        return json.loads(f.read())
+
+
+def write_results(path, data):
+    """Write data in the binary form of the results file at path: the vectors
+    under ARRAY_KEYS are concatenated into one float64 .npy file and everything
+    else is kept in a JSON index that refers to them by offset and length.
+
+    A new .npy file is written before the index is replaced, so readers see
+    either the old or the new results."""
+    directory = get_array_directory(path)
+    os.makedirs(directory, exist_ok=True)
+    vectors = []
+    index_data = _extract_arrays(data, vectors, [0])
+    arrays = np.concatenate(vectors) if vectors else np.zeros(0)
+
+    arrays_file = "arrays-{}.npy".format(uuid.uuid4().hex[:8])
+    # np.save adds .npy to names without it
+    np.save(os.path.join(directory, arrays_file + ".tmp.npy"), arrays)
+    os.replace(
+        os.path.join(directory, arrays_file + ".tmp.npy"),
+        os.path.join(directory, arrays_file),
+    )
+    index_path = os.path.join(directory, INDEX_FILE)
+    with open(index_path + ".tmp", "w") as f:
+        json.dump({"arrays": arrays_file, "data": index_data}, f)
+    os.replace(index_path + ".tmp", index_path)
+
+    for entry in os.listdir(directory):
+        if entry.startswith("arrays-") and entry != arrays_file:
+            os.remove(os.path.join(directory, entry))
+
+
+def _extract_arrays(value, vectors, offset, is_array=False):
+    """value with the vectors under ARRAY_KEYS appended to vectors and replaced
+    by {"array_offset": ..., "array_length": ...}"""
+    if isinstance(value, dict):
+        return {
+            key: _extract_arrays(item, vectors, offset, key in ARRAY_KEYS)
+            for key, item in value.items()
+        }
+    if isinstance(value, (list, np.ndarray)):
+        if is_array and _is_vector(value):
+            vector = np.asarray(value, dtype=np.float64)
+            vectors.append(vector)
+            reference = {"array_offset": offset[0], "array_length": len(vector)}
+            offset[0] += len(vector)
+            return reference
+        return [_extract_arrays(item, vectors, offset, is_array) for item in value]
+    if isinstance(value, np.generic):
+        return value.item()
+    return value
+
+
+def _insert_arrays(value, arrays):
+    if isinstance(value, dict):
+        if value.keys() == {"array_offset", "array_length"}:
+            start = value["array_offset"]
+            return arrays[start : start + value["array_length"]]
+        return {key: _insert_arrays(item, arrays) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_insert_arrays(item, arrays) for item in value]
+    return value
+
+
+def _is_vector(value):
+    if isinstance(value, np.ndarray):
+        return (
+            value.ndim == 1 and len(value) > 0 and np.issubdtype(value.dtype, np.number)
+        )
+    # Empty lists stay lists, so that results can still be appended to them
+    return len(value) > 0 and all(
+        isinstance(item, (int, float)) and not isinstance(item, bool) for item in value
+    )
@@ -0,0 +1,75 @@
+# Run from the repository root: python -m benchmarks.benchmark_metrics
+from metrics import MetricsAggregator, BufferedMetricsSink, NullBackend
+import numpy as np
+import timeit
+
+NUMBER_OF_EVALUATIONS = 200000
+OFFSET = 10.0
+
+
+def get_vqe_style_log_dict(energy, bias, minima):
+    """The log entry built by vqe.cost_function.get_vqe_cost_function"""
+    cost = energy + bias
+    min_energy, min_cost = minima["Energy"], minima["Cost"]
+    return {
+        "Energy": energy,
+        "Minimum Energy": min_energy,
+        "Parameter Weight Bias": bias,
+        "Cost": cost,
+        "Minimum Cost": min_cost,
+        "Offset Energy": energy + OFFSET,
+        "Offset Minimum Energy": min_energy + OFFSET,
+        "Offset Parameter Weight Bias": bias + OFFSET,
+        "Offset Cost": cost + OFFSET,
+        "Offset Minimum Cost": min_cost + OFFSET,
+    }
+
+
+def get_record_function(metrics):
+    def record(energy, bias):
+        def get_log_dict(minima):
+            return get_vqe_style_log_dict(energy, bias, minima)
+
+        metrics.record({"Energy": energy, "Cost": energy + bias}, get_log_dict)
+
+    return record
+
+
+def record_synchronously(energy, bias, minima={"Energy": np.inf, "Cost": np.inf}):
+    """What every evaluation used to pay: the minima and the log dict built and
+    handed to the logger inline"""
+    minima["Energy"] = min(minima["Energy"], energy)
+    minima["Cost"] = min(minima["Cost"], energy + bias)
+    NullBackend().write([get_vqe_style_log_dict(energy, bias, minima)])
+
+
+energies = np.random.uniform(-1, 1, NUMBER_OF_EVALUATIONS).tolist()
+biases = np.random.uniform(0, 0.1, NUMBER_OF_EVALUATIONS).tolist()
+
+
+def time_per_evaluation(record, flush=lambda: None):
+    def run():
+        for energy, bias in zip(energies, biases):
+            record(energy, bias)
+        flush()
+
+    return timeit.timeit(run, number=1) / NUMBER_OF_EVALUATIONS
+
+
+print(
+    "synchronous, no-op logger: {:.2f}us per evaluation".format(
+        1e6 * time_per_evaluation(record_synchronously)
+    )
+)
+for log_every in [1, 10, 100]:
+    metrics = MetricsAggregator(
+        sink=BufferedMetricsSink(NullBackend(), log_every=log_every)
+    )
+    print(
+        "buffered, log_every={}: {:.2f}us per evaluation, {:.2f}us including the "
+        "final flush".format(
+            log_every,
+            1e6 * time_per_evaluation(get_record_function(metrics)),
+            1e6 * time_per_evaluation(get_record_function(metrics), metrics.flush),
+        )
+    )
@@ -0,0 +1,142 @@
+# Run from the repository root: python -m benchmarks.benchmark_prune
+from prune import (
+    get_parameter_indices_to_be_pruned_using_percentage,
+    get_pruned_parameters,
+    get_padded_parameters,
+)
+import numpy as np
+import timeit
+
+NUMBER_OF_PARAMETERS = 10000
+PRUNING_PERCENTAGE = 0.9
+PARAMETER_PERIOD = 2 * np.pi
+
+
+def legacy_get_parameter_indices_to_be_pruned_using_percentage(
+    parameters, percentage_to_prune, period
+):
+    number_of_parameters_to_prune = np.ceil(len(parameters) * percentage_to_prune)
+
+    magnitudes_from_nearest_zero = []
+    for parameter in parameters:
+        remainder = parameter % period
+        magnitudes_from_nearest_zero.append(
+            min(
+                abs(0.0 - remainder),
+                abs(period - remainder),
+            )
+        )
+
+    pruned_indices = []
+    while len(pruned_indices) < number_of_parameters_to_prune:
+        min_magnitude = np.inf
+        min_index = None
+        for index, magnitude in enumerate(magnitudes_from_nearest_zero):
+            if index in pruned_indices:
+                continue
+
+            if magnitude < min_magnitude:
+                min_magnitude = magnitude
+                min_index = index
+        pruned_indices.append(min_index)
+
+    return sorted(pruned_indices)
+
+
+def legacy_get_pruned_parameters(unpruned_parameters, pruned_indices):
+    pruned_parameters = unpruned_parameters
+    for pruned_index in pruned_indices[::-1]:
+        pruned_parameters = np.delete(pruned_parameters, pruned_index)
+    return pruned_parameters
+
+
+def legacy_get_padded_parameters(unpadded_parameters, pruned_indices):
+    padded_parameters = unpadded_parameters
+    for pruned_index in pruned_indices:
+        padded_parameters = np.concatenate(
+            (
+                padded_parameters[:pruned_index],
+                np.asarray([float(1e-15)]),
+                padded_parameters[pruned_index:],
+            )
+        )
+    return padded_parameters
+
+
+def time_function(function, number):
+    return timeit.timeit(function, number=number) / number
+
+
+parameters = np.random.uniform(0, PARAMETER_PERIOD, NUMBER_OF_PARAMETERS)
+# Repeated values exercise the tie-breaking towards lower indices
+parameters[::7] = parameters[0]
+
+# The legacy selection is quadratic in the number of parameters, so it is only
+# timed on a prefix of the parameters
+for number_of_parameters in [1000, NUMBER_OF_PARAMETERS]:
+    prefix = parameters[:number_of_parameters]
+    pruned_indices = get_parameter_indices_to_be_pruned_using_percentage(
+        prefix, PRUNING_PERCENTAGE, PARAMETER_PERIOD
+    )
+    pruned_parameters = get_pruned_parameters(prefix, pruned_indices)
+    padded_parameters = get_padded_parameters(pruned_parameters, pruned_indices)
+    legacy_pruned_parameters = legacy_get_pruned_parameters(prefix, pruned_indices)
+    assert np.array_equal(pruned_parameters, legacy_pruned_parameters)
+    assert np.array_equal(
+        padded_parameters,
+        legacy_get_padded_parameters(legacy_pruned_parameters, pruned_indices),
+    )
+
+    timings = [
+        (
+            "padding",
+            time_function(
+                lambda: legacy_get_padded_parameters(pruned_parameters, pruned_indices),
+                10,
+            ),
+            time_function(
+                lambda: get_padded_parameters(pruned_parameters, pruned_indices), 100
+            ),
+        ),
+        (
+            "pruning",
+            time_function(
+                lambda: legacy_get_pruned_parameters(prefix, pruned_indices), 10
+            ),
+            time_function(lambda: get_pruned_parameters(prefix, pruned_indices), 100),
+        ),
+    ]
+    if number_of_parameters <= 1000:
+        assert pruned_indices == (
+            legacy_get_parameter_indices_to_be_pruned_using_percentage(
+                prefix, PRUNING_PERCENTAGE, PARAMETER_PERIOD
+            )
+        )
+        timings.append(
+            (
+                "selection",
+                time_function(
+                    lambda: legacy_get_parameter_indices_to_be_pruned_using_percentage(
+                        prefix, PRUNING_PERCENTAGE, PARAMETER_PERIOD
+                    ),
+                    1,
+                ),
+                time_function(
+                    lambda: get_parameter_indices_to_be_pruned_using_percentage(
+                        prefix, PRUNING_PERCENTAGE, PARAMETER_PERIOD
+                    ),
+                    100,
+                ),
+            )
+        )
+
+    for name, legacy_time, vectorized_time in timings:
+        print(
+            "{} parameters {}: legacy {:.2e}s vectorized {:.2e}s speedup {:.0f}x".format(
+                number_of_parameters,
+                name,
+                legacy_time,
+                vectorized_time,
+                legacy_time / vectorized_time,
+            )
+        )
@@ -0,0 +1,57 @@
+# Run from the repository root: python -m benchmarks.benchmark_qcbm_simulator
+from qcbm.cost_function import get_pruned_qcbm_cost_function
+from qcbm.target_distribution import get_target_distribution
+from zquantum.qcbm.ansatz import QCBMAnsatz
+import numpy as np
+import timeit
+
+NUMBER_OF_LAYERS = 4
+NUMBER_OF_EVALUATIONS = 20
+
+for number_of_qubits in [4, 6, 8]:
+    target_distribution = get_target_distribution(
+        "normal", number_of_qubits, loc=0.65, scale=0.1
+    )
+    number_of_parameters = QCBMAnsatz(
+        NUMBER_OF_LAYERS, number_of_qubits
+    ).number_of_params
+    cirq_cost_function = get_pruned_qcbm_cost_function(
+        target_distribution, NUMBER_OF_LAYERS, [], use_wandb=False
+    )
+    native_cost_function = get_pruned_qcbm_cost_function(
+        target_distribution,
+        NUMBER_OF_LAYERS,
+        [],
+        use_wandb=False,
+        use_native_simulator=True,
+    )
+
+    test_parameters = np.random.uniform(-np.pi, np.pi, number_of_parameters)
+    difference = abs(
+        cirq_cost_function(test_parameters) - native_cost_function(test_parameters)
+    )
+    # Every evaluation is at a new point, so that the cost function cache is
+    # not hit
+    cirq_time = (
+        timeit.timeit(
+            lambda: cirq_cost_function(test_parameters + np.random.normal(0, 1e-3)),
+            number=NUMBER_OF_EVALUATIONS,
+        )
+        / NUMBER_OF_EVALUATIONS
+    )
+    native_time = (
+        timeit.timeit(
+            lambda: native_cost_function(test_parameters + np.random.normal(0, 1e-3)),
+            number=NUMBER_OF_EVALUATIONS,
+        )
+        / NUMBER_OF_EVALUATIONS
+    )
+    print(
+        "{} qubits: cirq {:.2e}s native {:.2e}s speedup {:.1f}x |difference| {:.1e}".format(
+            number_of_qubits,
+            cirq_time,
+            native_time,
+            cirq_time / native_time,
+            difference,
+        )
+    )
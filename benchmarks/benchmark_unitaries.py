@@ -0,0 +1,53 @@
+# Run from the repository root: python -m benchmarks.benchmark_unitaries
+from quantum_compiling.unitaries import (
+    get_overparameterized_circuit,
+    get_overparameterized_unitary,
+)
+import numpy as np
+import timeit
+
+NUMBER_OF_EVALUATIONS = 100
+BATCH_SIZE = 1000
+PARAMETER_PERIOD = 4 * np.pi
+
+for number_of_layers in [1, 5, 20]:
+    parameter_matrix = np.random.uniform(
+        -PARAMETER_PERIOD, PARAMETER_PERIOD, (BATCH_SIZE, 11 * number_of_layers)
+    )
+    parameters = parameter_matrix[0]
+    difference = np.max(
+        np.abs(
+            get_overparameterized_circuit(parameters, number_of_layers).unitary()
+            - get_overparameterized_unitary(parameters, number_of_layers)
+        )
+    )
+    cirq_time = (
+        timeit.timeit(
+            lambda: get_overparameterized_circuit(
+                parameters, number_of_layers
+            ).unitary(),
+            number=NUMBER_OF_EVALUATIONS,
+        )
+        / NUMBER_OF_EVALUATIONS
+    )
+    numpy_time = (
+        timeit.timeit(
+            lambda: get_overparameterized_unitary(parameters, number_of_layers),
+            number=NUMBER_OF_EVALUATIONS,
+        )
+        / NUMBER_OF_EVALUATIONS
+    )
+    batch_time = (
+        timeit.timeit(
+            lambda: get_overparameterized_unitary(parameter_matrix, number_of_layers),
+            number=NUMBER_OF_EVALUATIONS // 10,
+        )
+        / (NUMBER_OF_EVALUATIONS // 10)
+        / BATCH_SIZE
+    )
+    print(
+        "{} layers: cirq {:.2e}s numpy {:.2e}s batched {:.2e}s per unitary "
+        "|difference| {:.1e}".format(
+            number_of_layers, cirq_time, numpy_time, batch_time, difference
+        )
+    )
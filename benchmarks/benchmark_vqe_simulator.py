@@ -0,0 +1,56 @@
+# Run from the repository root: python -m benchmarks.benchmark_vqe_simulator
+from vqe.cost_function import get_vqe_cost_function
+from vqe.hamiltonians import generate_j1j2_hamiltonian
+from vqe.circuits import generate_alternating_vqe_j1j2_circuit
+import numpy as np
+import sympy
+import timeit
+
+J2 = 1.25
+NUMBER_OF_LAYERS = 4
+NUMBER_OF_EVALUATIONS = 20
+
+for number_of_qubits in [5, 8, 10]:
+    hamiltonian = generate_j1j2_hamiltonian(number_of_qubits, J2, j1=1)
+    number_of_parameters = (
+        (3 * (number_of_qubits - 1)) + number_of_qubits
+    ) * NUMBER_OF_LAYERS
+    parameters = [
+        sympy.Symbol("theta{}".format(i)) for i in range(number_of_parameters)
+    ]
+    parameterized_quantum_circuit = generate_alternating_vqe_j1j2_circuit(
+        number_of_qubits, NUMBER_OF_LAYERS, parameters
+    )
+    cirq_cost_function = get_vqe_cost_function(
+        hamiltonian, parameterized_quantum_circuit
+    )
+    native_cost_function = get_vqe_cost_function(
+        hamiltonian, parameterized_quantum_circuit, use_native_simulator=True
+    )
+
+    test_parameters = np.random.uniform(-np.pi, np.pi, number_of_parameters)
+    difference = abs(
+        cirq_cost_function(test_parameters) - native_cost_function(test_parameters)
+    )
+    cirq_time = (
+        timeit.timeit(
+            lambda: cirq_cost_function(test_parameters), number=NUMBER_OF_EVALUATIONS
+        )
+        / NUMBER_OF_EVALUATIONS
+    )
+    native_time = (
+        timeit.timeit(
+            lambda: native_cost_function(test_parameters),
+            number=NUMBER_OF_EVALUATIONS,
+        )
+        / NUMBER_OF_EVALUATIONS
+    )
+    print(
+        "{} qubits: cirq {:.2e}s native {:.2e}s speedup {:.1f}x |difference| {:.1e}".format(
+            number_of_qubits,
+            cirq_time,
+            native_time,
+            cirq_time / native_time,
+            difference,
+        )
+    )
@@ -4,7 +4,7 @@ from optimize import (
 from vqe.cost_function import get_vqe_cost_function
 from vqe.hamiltonians import generate_j1j2_hamiltonian
 from vqe.circuits import generate_overparameterized_vqe_j1j2_circuit
-from openfermion.linalg import eigenspectrum
+from vqe.ground_state import get_ground_state_energy
 import wandb
 import numpy as np
 import sympy
@@ -18,6 +18,9 @@ PRUNING_CUTOFF = 1e-2
 PARAMETER_PERIOD = 2 * np.pi
 WEIGHT_DECAY = 50
 USE_WANDB = True
+# Processes evaluating each CMA-ES generation; cma-es-hyperparameter-optimization.sh
+# already runs one job per popsize side by side
+WORKERS = 1
 MAX_NUMBER_OF_TRIALS = 30
 BOUNDARY_CONDITIONS = "open"
 PARAMETER_PERIOD = 2 * np.pi
@@ -29,7 +32,7 @@ number_of_layers = int(sys.argv[2])
 popsize = int(sys.argv[3])
 
 hamiltonian = generate_j1j2_hamiltonian(number_of_qubits, J2, j1=1)
-ground_state_energy = eigenspectrum(hamiltonian)[0]
+ground_state_energy = get_ground_state_energy("j1j2", number_of_qubits, j2=J2)
 
 cma_es_options = {
     "sigma_0": 0.01,
@@ -82,4 +85,5 @@ unpruned_results = optimize_cost_function_with_cmaes(
     project=PROJECT,
     use_wandb=USE_WANDB,
     optimizer_options=copy.deepcopy(cma_es_options),
+    workers=WORKERS,
 )
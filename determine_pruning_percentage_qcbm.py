@@ -8,12 +8,15 @@ import wandb
 import numpy as np
 from zquantum.qcbm.ansatz import QCBMAnsatz
 import sys
-import json
+from result_store import ResultStore, load_results_file
+from array_store import write_results
 
 VERSION = "0.1"
 PROJECT = "QLT-QCBM-find-pruning-percentage-v" + VERSION
 PARAMETER_PERIOD = 2 * np.pi
 USE_WANDB = True
+USE_NATIVE_SIMULATOR = False
+USE_ANALYTIC_GRADIENT = False
 MAX_NUMBER_OF_TRIALS = 10
 if USE_WANDB:
     wandb.login()
@@ -22,23 +25,12 @@ number_of_layers = int(sys.argv[2])
 lbfgsb_options = {"ftol": 1e-10}
 
 datafilename = "data/qlt/QCBM/{}/{}.json".format("L-BFGS-B", PROJECT)
-try:
-    with open(datafilename, "r") as f:
-        DATA = json.loads(f.read())
-    f.close()
-except:
-    DATA = {}
-    with open(datafilename, "w") as f:
-        f.write(json.dumps(DATA))
-    f.close()
-if not DATA.get(str(number_of_qubits), False):
-    DATA[str(number_of_qubits)] = {}
-if not DATA[str(number_of_qubits)].get(str(number_of_layers), False):
-    DATA[str(number_of_qubits)][str(number_of_layers)] = []
+RESULTS_PROJECT = PROJECT
+store = ResultStore()
+if store.count(RESULTS_PROJECT) == 0:
+    store.import_trials(RESULTS_PROJECT, load_results_file(datafilename))
 
 for trial in range(MAX_NUMBER_OF_TRIALS):
-    if len(DATA[str(number_of_qubits)][str(number_of_layers)]) == trial:
-        DATA[str(number_of_qubits)][str(number_of_layers)].append({})
     SEED = 1234 + (number_of_layers * 17) + (trial * 23)
     np.random.seed(SEED)
 
@@ -52,14 +44,20 @@ for trial in range(MAX_NUMBER_OF_TRIALS):
     )
 
     #### Unpruned Optimization
-    if not DATA[str(number_of_qubits)][str(number_of_layers)][trial].get(
-        "unpruned", False
+    if not store.has(
+        RESULTS_PROJECT,
+        number_of_qubits,
+        number_of_layers,
+        trial,
+        "unpruned",
     ):
         unpruned_cost_function = get_pruned_qcbm_cost_function(
             target_distribution,
             number_of_layers,
             [],
             use_wandb=USE_WANDB,
+            use_native_simulator=USE_NATIVE_SIMULATOR,
+            use_analytic_gradient=USE_ANALYTIC_GRADIENT,
         )
 
         extra_config = {
@@ -85,21 +83,25 @@ for trial in range(MAX_NUMBER_OF_TRIALS):
             project=PROJECT,
             optimizer_options=lbfgsb_options,
         )
-        DATA[str(number_of_qubits)][str(number_of_layers)][trial]["unpruned"] = {
-            "initial_parameters": initial_parameters.tolist(),
-            "seed": SEED,
-            "energy": unpruned_results.opt_value,
-            "optimal_parameters": unpruned_results.opt_params.tolist(),
-        }
-        with open(datafilename, "w") as f:
-            f.write(json.dumps(DATA))
-        f.close()
+        store.put(
+            RESULTS_PROJECT,
+            number_of_qubits,
+            number_of_layers,
+            trial,
+            "unpruned",
+            {
+                "initial_parameters": initial_parameters.tolist(),
+                "seed": SEED,
+                "energy": unpruned_results.opt_value,
+                "optimal_parameters": unpruned_results.opt_params.tolist(),
+            },
+        )
 
     for PRUNING_PERCENTAGE in [0.05, 0.1, 0.15, 0.2, 0.4, 0.6, 0.8, 0.9, 0.95]:
         unpruned_optimal_parameters = np.asarray(
-            DATA[str(number_of_qubits)][str(number_of_layers)][trial]["unpruned"][
-                "optimal_parameters"
-            ]
+            store.get(
+                RESULTS_PROJECT, number_of_qubits, number_of_layers, trial, "unpruned"
+            )["optimal_parameters"]
         )
         pruned_parameter_indices = get_parameter_indices_to_be_pruned_using_percentage(
             unpruned_optimal_parameters,
@@ -110,18 +112,21 @@ for trial in range(MAX_NUMBER_OF_TRIALS):
             initial_parameters, pruned_parameter_indices
         )
 
-        if not DATA[str(number_of_qubits)][str(number_of_layers)][trial].get(
-            str(PRUNING_PERCENTAGE), False
+        if not store.has(
+            RESULTS_PROJECT,
+            number_of_qubits,
+            number_of_layers,
+            trial,
+            str(PRUNING_PERCENTAGE),
         ):
-            DATA[str(number_of_qubits)][str(number_of_layers)][trial][
-                str(PRUNING_PERCENTAGE)
-            ] = {}
 
             pruned_cost_function = get_pruned_qcbm_cost_function(
                 target_distribution,
                 number_of_layers,
                 pruned_parameter_indices,
                 use_wandb=USE_WANDB,
+                use_native_simulator=USE_NATIVE_SIMULATOR,
+                use_analytic_gradient=USE_ANALYTIC_GRADIENT,
             )
 
             extra_config = {
@@ -147,27 +152,40 @@ for trial in range(MAX_NUMBER_OF_TRIALS):
                 project=PROJECT,
                 optimizer_options=lbfgsb_options,
             )
-            DATA[str(number_of_qubits)][str(number_of_layers)][trial][
-                str(PRUNING_PERCENTAGE)
-            ]["pruned"] = {
-                "initial_parameters": pruned_initial_parameters.tolist(),
-                "seed": SEED,
-                "energy": pruned_results.opt_value,
-                "pruned_indices": pruned_parameter_indices,
-                "optimal_parameters": pruned_results.opt_params.tolist(),
-            }
-            with open(datafilename, "w") as f:
-                f.write(json.dumps(DATA))
-            f.close()
+            store.put(
+                RESULTS_PROJECT,
+                number_of_qubits,
+                number_of_layers,
+                trial,
+                str(PRUNING_PERCENTAGE),
+                {
+                    "pruned": {
+                        "initial_parameters": pruned_initial_parameters.tolist(),
+                        "seed": SEED,
+                        "energy": pruned_results.opt_value,
+                        "pruned_indices": pruned_parameter_indices,
+                        "optimal_parameters": pruned_results.opt_params.tolist(),
+                    }
+                },
+            )
 
-        if not DATA[str(number_of_qubits)][str(number_of_layers)][trial][
-            str(PRUNING_PERCENTAGE)
-        ].get("pruned_and_randomized", False):
+        # Both runs of a pruning percentage are kept in one result, as in the JSON
+        # layout. Only this job writes this trial, so updating it is safe.
+        pruning_percentage_results = store.get(
+            RESULTS_PROJECT,
+            number_of_qubits,
+            number_of_layers,
+            trial,
+            str(PRUNING_PERCENTAGE),
+        )
+        if "pruned_and_randomized" not in pruning_percentage_results:
             pruned_cost_function = get_pruned_qcbm_cost_function(
                 target_distribution,
                 number_of_layers,
                 pruned_parameter_indices,
                 use_wandb=USE_WANDB,
+                use_native_simulator=USE_NATIVE_SIMULATOR,
+                use_analytic_gradient=USE_ANALYTIC_GRADIENT,
             )
             random_initial_parameters = np.random.uniform(
                 -PARAMETER_PERIOD, PARAMETER_PERIOD, len(pruned_initial_parameters)
@@ -196,15 +214,22 @@ for trial in range(MAX_NUMBER_OF_TRIALS):
                 project=PROJECT,
                 optimizer_options=lbfgsb_options,
             )
-            DATA[str(number_of_qubits)][str(number_of_layers)][trial][
-                str(PRUNING_PERCENTAGE)
-            ]["pruned_and_randomized"] = {
-                "initial_parameters": random_initial_parameters.tolist(),
-                "seed": SEED,
-                "energy": pruned_and_randomized_results.opt_value,
-                "pruned_indices": pruned_parameter_indices,
-                "optimal_parameters": pruned_and_randomized_results.opt_params.tolist(),
-            }
-            with open(datafilename, "w") as f:
-                f.write(json.dumps(DATA))
-            f.close()
+            store.put(
+                RESULTS_PROJECT,
+                number_of_qubits,
+                number_of_layers,
+                trial,
+                str(PRUNING_PERCENTAGE),
+                {
+                    **pruning_percentage_results,
+                    "pruned_and_randomized": {
+                        "initial_parameters": random_initial_parameters.tolist(),
+                        "seed": SEED,
+                        "energy": pruned_and_randomized_results.opt_value,
+                        "pruned_indices": pruned_parameter_indices,
+                        "optimal_parameters": pruned_and_randomized_results.opt_params.tolist(),
+                    },
+                },
+            )
+
+write_results(datafilename, store.export_trials(RESULTS_PROJECT))
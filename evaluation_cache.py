@@ -0,0 +1,54 @@
+import hashlib
+import threading
+from collections import OrderedDict
+import numpy as np
+
+
+class EvaluationCache:
+    """Bounded LRU cache of cost function evaluations keyed by a hash of the
+    parameter bytes, so that re-queries of the same point (e.g. the L-BFGS-B
+    logging callback, or scipy asking for the gradient after the value) do not
+    simulate again. Entries are dicts such as {"energy": ..., "bias": ...,
+    "gradient": ...}. A maxsize of 0 disables caching."""
+
+    def __init__(self, maxsize=128):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, parameters):
+        """Cached entry for parameters, or None"""
+        key = _get_key(parameters)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, parameters, entry):
+        if self.maxsize == 0:
+            return
+        key = _get_key(parameters)
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def info(self):
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "maxsize": self.maxsize,
+            "size": len(self._entries),
+        }
+
+
+def _get_key(parameters):
+    parameters = np.ascontiguousarray(parameters, dtype=np.float64)
+    return hashlib.sha1(parameters.tobytes()).digest()
@@ -0,0 +1,26 @@
+# Write the results of a project in the result store to the JSON layout the plots
+# read, e.g. while jobs are still running:
+# python export_results.py <project> <json path> [trials|overparameterization|
+#     overparameterization_energies] [result store database]
+# The run scripts export their project themselves when they finish. The project
+# of the overparameterization scripts is the name of their JSON file.
+from result_store import ResultStore, write_json, DEFAULT_DATABASE
+import sys
+
+project = sys.argv[1]
+path = sys.argv[2]
+layout = sys.argv[3] if len(sys.argv) > 3 else "trials"
+database = sys.argv[4] if len(sys.argv) > 4 else DEFAULT_DATABASE
+assert layout in ["trials", "overparameterization", "overparameterization_energies"]
+
+store = ResultStore(database)
+if layout == "trials":
+    data = store.export_trials(project)
+elif layout == "overparameterization":
+    data = store.export_overparameterization(project, "overparameterization")
+else:
+    data = store.export_overparameterization(
+        project, "overparameterization", include_parameters=False
+    )
+write_json(path, data)
+print("Wrote {} results to {}".format(store.count(project), path))
@@ -0,0 +1,218 @@
+import atexit
+import json
+import threading
+import weakref
+import numpy as np
+import wandb
+from run_store import RunStoreBackend
+
+
+class MetricsAggregator:
+    """Running minima and wandb logging shared by every evaluation of a cost
+    function.
+
+    Updating the minima and handing the entry to the sink happen under one lock,
+    so evaluations recorded from several threads never interleave. Worker
+    processes never record anything themselves: they return raw values to the
+    parent, which records them in submission order so that the logs are
+    identical to a serial run.
+
+    Without a sink, logging goes through a BufferedMetricsSink to the active
+    wandb run and run_store run when use_wandb is set, and nowhere otherwise.
+    Logs are written in the background, so call `flush` before finishing the
+    runs (the optimize functions do)."""
+
+    def __init__(self, use_wandb=True, sink=None):
+        if sink is None and use_wandb:
+            sink = BufferedMetricsSink(
+                CombinedBackend([WandbBackend(), RunStoreBackend()])
+            )
+        self.use_wandb = use_wandb
+        self.sink = sink
+        self.minima = {}
+        self._lock = threading.Lock()
+
+    def record(self, values, get_log_dict=None, force=False):
+        """Fold values (a dict of metric name to value) into the running minima
+        and, when logging, queue get_log_dict with the updated minima so that the
+        sink builds the log entry later. get_log_dict must therefore only close
+        over values that will not change. force bypasses the sink's decimation.
+        Returns the updated minima of the given metrics."""
+        with self._lock:
+            is_new_minimum = False
+            minima = {}
+            for name, value in values.items():
+                minimum = self.minima.get(name, np.inf)
+                if value < minimum:
+                    minimum = value
+                    is_new_minimum = True
+                self.minima[name] = minima[name] = minimum
+            if self.sink is not None and get_log_dict is not None:
+                self.sink.submit(get_log_dict, minima, is_new_minimum, force)
+            return minima
+
+    def flush(self):
+        if self.sink is not None:
+            self.sink.flush()
+
+
+class BufferedMetricsSink:
+    """Queues log entries in a preallocated ring buffer and writes them to a
+    backend from a background thread, in order.
+
+    Entries are kept as (get_log_dict, minima) pairs, so the log dicts are only
+    built off the evaluation path. With log_every=k only every k-th entry is
+    kept, plus every entry that sets a new minimum or is forced. The thread
+    writes whenever the buffer is half full or flush_interval seconds have
+    passed, and a full buffer blocks new entries until it has been drained.
+    `flush` writes everything queued and stops the thread, which is restarted by
+    the next entry."""
+
+    def __init__(self, backend, capacity=4096, log_every=1, flush_interval=1.0):
+        assert capacity > 1 and log_every > 0
+        self.backend = backend
+        self.capacity = capacity
+        self.log_every = log_every
+        self.flush_interval = flush_interval
+        self.number_of_entries = 0
+        self._slots = [None] * capacity
+        self._start = 0
+        self._size = 0
+        self._condition = threading.Condition(threading.Lock())
+        self._thread = None
+        self._is_stopping = False
+        self._error = None
+        atexit.register(_flush_sink, weakref.ref(self))
+
+    def submit(self, get_log_dict, minima, is_new_minimum=False, force=False):
+        with self._condition:
+            self.number_of_entries += 1
+            if not (
+                force or is_new_minimum or self.number_of_entries % self.log_every == 0
+            ):
+                return
+            while self._size == self.capacity:
+                self._condition.wait()
+            self._slots[(self._start + self._size) % self.capacity] = (
+                get_log_dict,
+                minima,
+            )
+            self._size += 1
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._write_entries, daemon=True)
+                self._thread.start()
+            elif self._size == self.capacity // 2:
+                self._condition.notify_all()
+
+    def flush(self):
+        with self._condition:
+            thread = self._thread
+            if thread is None:
+                return
+            self._is_stopping = True
+            self._condition.notify_all()
+        thread.join()
+        with self._condition:
+            self._thread = None
+            self._is_stopping = False
+            error, self._error = self._error, None
+        if error is not None:
+            raise error
+
+    def close(self):
+        self.flush()
+        self.backend.close()
+
+    def _take_entries(self):
+        entries = []
+        for _ in range(self._size):
+            entries.append(self._slots[self._start])
+            self._slots[self._start] = None
+            self._start = (self._start + 1) % self.capacity
+        self._size = 0
+        self._condition.notify_all()
+        return entries
+
+    def _write_entries(self):
+        while True:
+            with self._condition:
+                if not self._is_stopping and self._size < self.capacity // 2:
+                    self._condition.wait(self.flush_interval)
+                is_stopping = self._is_stopping
+                entries = self._take_entries()
+            if entries and self._error is None:
+                try:
+                    self.backend.write(
+                        [get_log_dict(minima) for get_log_dict, minima in entries]
+                    )
+                except Exception as error:
+                    # Raised from the next flush; later entries are dropped
+                    self._error = error
+            if is_stopping and not entries:
+                return
+
+
+class WandbBackend:
+    """Logs to the active wandb run, if any"""
+
+    def write(self, log_dicts):
+        if wandb.run is None:
+            return
+        for log_dict in log_dicts:
+            wandb.log(log_dict)
+
+    def close(self):
+        pass
+
+
+class FileBackend:
+    """Appends each log dict to path as one line of JSON"""
+
+    def __init__(self, path):
+        self.path = path
+        self._file = None
+
+    def write(self, log_dicts):
+        if self._file is None:
+            self._file = open(self.path, "a")
+        for log_dict in log_dicts:
+            self._file.write(json.dumps(log_dict, default=_to_json) + "\n")
+        self._file.flush()
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+class CombinedBackend:
+    def __init__(self, backends):
+        self.backends = backends
+
+    def write(self, log_dicts):
+        for backend in self.backends:
+            backend.write(log_dicts)
+
+    def close(self):
+        for backend in self.backends:
+            backend.close()
+
+
+class NullBackend:
+    def write(self, log_dicts):
+        pass
+
+    def close(self):
+        pass
+
+
+def _to_json(value):
+    if isinstance(value, (np.generic, np.ndarray)):
+        return value.tolist()
+    raise TypeError("{} is not JSON serializable".format(type(value)))
+
+
+def _flush_sink(sink_reference):
+    sink = sink_reference()
+    if sink is not None:
+        sink.flush()
@@ -0,0 +1,80 @@
+# Convert the JSON results files under data/ to the binary form read by
+# array_store.load_results:
+# python migrate_data_to_arrays.py [data directory] [--remove-json]
+# Each converted file is read back and compared with the JSON before the JSON is
+# removed. Unreadable files (e.g. left empty by an interrupted rewrite) are
+# skipped.
+from array_store import (
+    load_results,
+    write_results,
+    is_converted,
+    get_array_directory,
+    INDEX_FILE,
+)
+import numpy as np
+import json
+import sys
+import os
+
+arguments = [argument for argument in sys.argv[1:] if argument != "--remove-json"]
+directory = arguments[0] if arguments else "data"
+remove_json = "--remove-json" in sys.argv
+# Files that are not results: the ground state energy cache, the run store and
+# the wandb download manifests
+SKIPPED_FILES = ["ground_state_energies.json", "manifest.json", INDEX_FILE]
+SKIPPED_DIRECTORIES = ["runs"]
+
+
+def is_equal(value, expected):
+    if isinstance(expected, dict):
+        return (
+            isinstance(value, dict)
+            and value.keys() == expected.keys()
+            and all(is_equal(value[key], expected[key]) for key in expected)
+        )
+    if isinstance(value, np.ndarray):
+        return np.array_equal(value, np.asarray(expected, dtype=np.float64))
+    if isinstance(expected, list):
+        return (
+            isinstance(value, list)
+            and len(value) == len(expected)
+            and all(
+                is_equal(item, expected_item)
+                for item, expected_item in zip(value, expected)
+            )
+        )
+    return value == expected or (value != value and expected != expected)
+
+
+paths = []
+for root, directories, files in os.walk(directory):
+    directories[:] = sorted(
+        name for name in directories if name not in SKIPPED_DIRECTORIES
+    )
+    paths += [
+        os.path.join(root, file)
+        for file in sorted(files)
+        if file.endswith(".json") and file not in SKIPPED_FILES
+    ]
+
+for path in paths:
+    if is_converted(path):
+        print("Already converted", path)
+        continue
+    try:
+        with open(path, "r") as f:
+            data = json.loads(f.read())
+    except ValueError:
+        print("Skipping unreadable", path)
+        continue
+    write_results(path, data)
+    assert is_equal(load_results(path), data), path
+    json_size = os.path.getsize(path)
+    index_size = os.path.getsize(os.path.join(get_array_directory(path), INDEX_FILE))
+    print(
+        "{}: {:.1f}kB of JSON, {:.1f}kB index".format(
+            path, json_size / 1000, index_size / 1000
+        )
+    )
+    if remove_json:
+        os.remove(path)
@@ -1,5 +1,15 @@
 from zquantum.optimizers import ScipyOptimizer, CMAESOptimizer
+from zquantum.core.interfaces.optimizer import optimization_result
+from zquantum.core.history.recorder import HistoryEntry
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing
+import queue
+import threading
+import numpy as np
+import scipy.optimize
+import cma
 import wandb
+import run_store
 
 
 def optimize_cost_function_with_lbfgsb(
@@ -9,20 +19,24 @@ def optimize_cost_function_with_lbfgsb(
     use_wandb=True,
     project="QLT-Deep-PoC",
     optimizer_options={"ftol": 1e-6},
+    run_store_directory=None,
 ):
+    """With a run_store_directory, the run's config and the cost function's logs
+    are also stored locally (see run_store), with or without wandb"""
     optimizer = ScipyOptimizer(method="L-BFGS-B", options=optimizer_options)
 
+    config = {
+        **{
+            "optimizer": "L-BFGS-B",
+            "tolx": optimizer_options["ftol"],
+            "initial_parameters": initial_parameters,
+        },
+        **extra_config,
+    }
     if use_wandb:
-        config = {
-            **{
-                "optimizer": "L-BFGS-B",
-                "tolx": optimizer_options["ftol"],
-                "initial_parameters": initial_parameters,
-            },
-            **extra_config,
-        }
-
         run = wandb.init(project=project, config=config)
+    if run_store_directory is not None:
+        stored_run = run_store.init(project, config, directory=run_store_directory)
 
     iteration_counter = 0
 
@@ -37,12 +51,141 @@ def optimize_cost_function_with_lbfgsb(
         cost_function, initial_parameters, keep_history=True, callback=wandb_callback
     )
 
+    _flush_metrics(cost_function)
     if use_wandb:
         run.finish()
+    if run_store_directory is not None:
+        stored_run.finish()
 
     return results
 
 
+def optimize_cost_function_with_multistart_lbfgsb(
+    initial_parameter_matrix,
+    cost_function,
+    extra_config={},
+    use_wandb=True,
+    project="QLT-Deep-PoC",
+    optimizer_options={"ftol": 1e-6},
+    run_store_directory=None,
+):
+    """One L-BFGS-B optimization of cost_function per row of
+    initial_parameter_matrix, each keeping its own L-BFGS-B state. The starts
+    advance in lockstep (see minimize_with_lbfgsb_in_lockstep) and are evaluated
+    together with cost_function.batch_cost_and_gradient, which the cost
+    functions have with analytic gradients.
+
+    All starts share one wandb run (and run store run), so the logged minima are
+    over every start. Returns one result per row, as
+    optimize_cost_function_with_lbfgsb does."""
+    assert hasattr(cost_function, "batch_cost_and_gradient")
+    initial_parameter_matrix = np.asarray(initial_parameter_matrix, dtype=float)
+    config = {
+        **{
+            "optimizer": "L-BFGS-B",
+            "tolx": optimizer_options["ftol"],
+            "number_of_starts": len(initial_parameter_matrix),
+            "initial_parameters": initial_parameter_matrix,
+        },
+        **extra_config,
+    }
+    if use_wandb:
+        run = wandb.init(project=project, config=config)
+    if run_store_directory is not None:
+        stored_run = run_store.init(project, config, directory=run_store_directory)
+
+    def evaluate(_, parameter_vectors):
+        return cost_function.batch_cost_and_gradient(np.asarray(parameter_vectors))
+
+    results = minimize_with_lbfgsb_in_lockstep(
+        evaluate, initial_parameter_matrix, optimizer_options=optimizer_options
+    )
+
+    _flush_metrics(cost_function)
+    if use_wandb:
+        run.finish()
+    if run_store_directory is not None:
+        stored_run.finish()
+
+    return results
+
+
+def minimize_with_lbfgsb_in_lockstep(
+    evaluate, initial_parameter_vectors, optimizer_options={"ftol": 1e-6}
+):
+    """Run one L-BFGS-B optimization per initial parameter vector, advancing them
+    in lockstep so that their costs are evaluated together.
+
+    evaluate(indices, parameter_vectors) returns the costs and gradients of the
+    optimizations with the given indices at the given parameter vectors, e.g.
+    with one vectorized call for the whole batch. The vectors may have different
+    lengths. Every optimization runs scipy's L-BFGS-B unchanged in its own
+    thread and waits while the others reach their next evaluation, so it takes
+    the same steps and stops by its own convergence criteria exactly as it would
+    alone. Returns one optimization result per initial parameter vector."""
+    number_of_optimizations = len(initial_parameter_vectors)
+    messages = queue.Queue()
+    replies = [queue.Queue(maxsize=1) for _ in range(number_of_optimizations)]
+
+    def run_optimization(index, initial_parameters):
+        def cost_and_gradient(parameters):
+            messages.put((index, "evaluate", np.copy(parameters)))
+            return replies[index].get()
+
+        try:
+            result = scipy.optimize.minimize(
+                cost_and_gradient,
+                initial_parameters,
+                method="L-BFGS-B",
+                jac=True,
+                options=optimizer_options,
+            )
+            messages.put((index, "done", result))
+        except BaseException as error:
+            messages.put((index, "error", error))
+
+    for index, initial_parameters in enumerate(initial_parameter_vectors):
+        # Daemon threads, so that an error in one optimization does not leave
+        # the others waiting forever at exit
+        threading.Thread(
+            target=run_optimization,
+            args=(index, np.asarray(initial_parameters, dtype=float)),
+            daemon=True,
+        ).start()
+
+    results = [None] * number_of_optimizations
+    running = set(range(number_of_optimizations))
+    while running:
+        # Wait for every running optimization to ask for an evaluation or stop
+        requests = {}
+        while len(requests) < len(running):
+            index, kind, payload = messages.get()
+            if kind == "error":
+                raise payload
+            if kind == "done":
+                results[index] = payload
+                running.remove(index)
+            else:
+                requests[index] = payload
+        if not requests:
+            continue
+        indices = sorted(requests)
+        costs, gradients = evaluate(indices, [requests[index] for index in indices])
+        for index, cost, gradient in zip(indices, costs, gradients):
+            replies[index].put((float(cost), np.asarray(gradient, dtype=float)))
+
+    return [
+        optimization_result(
+            opt_value=result.fun,
+            opt_params=result.x,
+            nfev=result.nfev,
+            nit=result.nit,
+            history=[],
+        )
+        for result in results
+    ]
+
+
 def optimize_cost_function_with_cmaes(
     initial_parameters,
     cost_function,
@@ -55,31 +198,124 @@ def optimize_cost_function_with_cmaes(
         "tolx": 1e-6,
         "popsize": 36,
     },
+    workers=1,
+    run_store_directory=None,
 ):
+    """With workers > 1, each generation is split across a pool of processes.
+    This needs a cost function with a `spec` (see vqe.cost_function), from which
+    every worker builds its own copy of the objective once. run_store_directory
+    is as in optimize_cost_function_with_lbfgsb."""
+    assert workers == 1 or hasattr(cost_function, "spec")
     sigma_0 = optimizer_options.pop("sigma_0")
     optimizer = CMAESOptimizer(
         sigma_0=sigma_0,
         options=optimizer_options,
     )
 
+    config = {
+        **{
+            "optimizer": "CMAES",
+            "sigma_0": sigma_0,
+            "bounds": optimizer_options.get("bounds", None),
+            "tolx": optimizer_options.get("tolx", None),
+            "popsize": optimizer_options.get("popsize", None),
+            "initial_parameters": initial_parameters,
+        },
+        **extra_config,
+    }
     if use_wandb:
-        config = {
-            **{
-                "optimizer": "CMAES",
-                "sigma_0": sigma_0,
-                "bounds": optimizer_options.get("bounds", None),
-                "tolx": optimizer_options.get("tolx", None),
-                "popsize": optimizer_options.get("popsize", None),
-                "initial_parameters": initial_parameters,
-            },
-            **extra_config,
-        }
-
         run = wandb.init(project=project, config=config)
+    if run_store_directory is not None:
+        stored_run = run_store.init(project, config, directory=run_store_directory)
 
-    results = optimizer.minimize(cost_function, initial_parameters, keep_history=True)
+    if hasattr(cost_function, "batch_cost"):
+        results = _minimize_with_batched_cmaes(
+            initial_parameters, cost_function, sigma_0, optimizer_options, workers
+        )
+    else:
+        results = optimizer.minimize(
+            cost_function, initial_parameters, keep_history=True
+        )
 
+    _flush_metrics(cost_function)
     if use_wandb:
         run.finish()
+    if run_store_directory is not None:
+        stored_run.finish()
 
     return results
+
+
+def _minimize_with_batched_cmaes(
+    initial_parameters, cost_function, sigma_0, optimizer_options, workers=1
+):
+    """Same loop as CMAESOptimizer (cma's optimize), but every generation is
+    evaluated in one call to cost_function.batch_cost, or fanned out to worker
+    processes whose raw values are recorded back in the parent"""
+    if workers > 1:
+        # Fork explicitly: spawn and forkserver would re-run the calling script,
+        # none of which guard their top level with __name__ == "__main__"
+        pool = ProcessPoolExecutor(
+            workers,
+            mp_context=multiprocessing.get_context("fork"),
+            initializer=_initialize_worker,
+            initargs=cost_function.spec,
+        )
+
+        def evaluate_generation(parameter_matrix):
+            chunks = [
+                chunk
+                for chunk in np.array_split(parameter_matrix, workers)
+                if len(chunk) > 0
+            ]
+            values = np.concatenate(list(pool.map(_evaluate_in_worker, chunks)))
+            return cost_function.record_batch(parameter_matrix, values)
+
+    else:
+        pool = None
+        evaluate_generation = cost_function.batch_cost
+
+    strategy = cma.CMAEvolutionStrategy(initial_parameters, sigma_0, optimizer_options)
+    history = []
+    try:
+        while not strategy.stop():
+            solutions = strategy.ask()
+            costs = evaluate_generation(np.asarray(solutions))
+            for solution, cost in zip(solutions, costs):
+                history.append(
+                    HistoryEntry(call_number=len(history), params=solution, value=cost)
+                )
+            strategy.tell(solutions, list(costs))
+            strategy.logger.add()
+            strategy.disp()
+    finally:
+        if pool is not None:
+            pool.shutdown()
+
+    result = strategy.result
+    return optimization_result(
+        opt_value=result.fbest,
+        opt_params=result.xbest,
+        nfev=result.evaluations,
+        nit=result.iterations,
+        cma_xfavorite=list(result.xfavorite),
+        history=history,
+    )
+
+
+def _flush_metrics(cost_function):
+    """Write out logs still queued by the cost function before the run ends"""
+    if hasattr(cost_function, "metrics"):
+        cost_function.metrics.flush()
+
+
+_worker_function = None
+
+
+def _initialize_worker(factory, kwargs):
+    global _worker_function
+    _worker_function = factory(**kwargs)
+
+
+def _evaluate_in_worker(parameter_matrix):
+    return _worker_function.batch(parameter_matrix)
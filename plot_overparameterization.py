@@ -1,5 +1,5 @@
 import matplotlib.pyplot as plt
-import json
+from array_store import load_results
 
 ENERGY_DIFFERENCE_CUTOFF = 1e-7
 
@@ -11,8 +11,7 @@ plt.rc("ytick", labelsize=10)  # fontsize of the y tick labels
 plt.rc("legend", fontsize=10)  # fontsize of the legend
 
 CIRCUIT_TYPE = "j1j2_alternating-ansatz-J2=1.25"
-with open("data/overparameterization_{}.json".format(CIRCUIT_TYPE), "r") as f:
-    data = json.loads(f.read())
+data = load_results("data/overparameterization_{}.json".format(CIRCUIT_TYPE))
 
 qubit_counts = [int(key) for key in data.keys()]
 ncols = 1
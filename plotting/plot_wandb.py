@@ -1,16 +1,18 @@
+# Run from the repository root: python -m plotting.plot_wandb
 import seaborn as sns
 import matplotlib.pyplot as plt
 
 plt.style.use("classic")
 import numpy as np
 import pandas as pd
+from run_store import load_project
 
 number_of_layers = 16
 sns.set()
 
-dataframe = pd.read_csv(
-    "/Users/williamsimon/Desktop/Research/Quantum-Lottery-Ticket/data/qlt/J1J2-VQE/QLT-VQE-J1J2-v0.5.csv"
-)
+# Runs stored locally by run_store, or downloaded with plotting/download_wandb.py
+# and read with pd.read_csv
+dataframe = load_project("QLT-VQE-J1J2-v0.5", columns=["Offset Energy"])
 dataframe = dataframe[(dataframe["number_of_layers"] == number_of_layers)]
 
 plot = sns.lineplot(
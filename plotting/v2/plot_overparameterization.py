@@ -1,5 +1,5 @@
 import matplotlib.pyplot as plt
-import json
+from array_store import load_results
 
 plt.rc("font", size=10)  # controls default text size
 plt.rc("axes", titlesize=10)  # fontsize of the title
@@ -8,10 +8,9 @@ plt.rc("xtick", labelsize=10)  # fontsize of the x tick labels
 plt.rc("ytick", labelsize=10)  # fontsize of the y tick labels
 plt.rc("legend", fontsize=8)  # fontsize of the legend
 
-with open(
-    "data/v2/overparameterization/VQE-J1J2_J2=1.25_j1j2_alternating-ansatz.json", "r"
-) as f:
-    data = json.loads(f.read())
+data = load_results(
+    "data/v2/overparameterization/VQE-J1J2_J2=1.25_j1j2_alternating-ansatz.json"
+)
 
 qubit_counts = [int(key) for key in data.keys()]
 ncols = 1
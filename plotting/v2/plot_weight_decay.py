@@ -17,7 +17,7 @@ that pruning threshold doesn't impact energy too much after pruning. """
 
 
 import matplotlib.pyplot as plt
-import json
+from array_store import load_results
 
 plt.rc("font", size=10)  # controls default text size
 plt.rc("axes", titlesize=10)  # fontsize of the title
@@ -32,11 +32,7 @@ ACCURACY_THRESHOLD = 1e-4
 PERIOD = 2 * 3.14159
 # PARAMETER_MAGNITUDE_THRESHOLD_PERCENTAGE = 1
 
-with open(
-    "data/v2/weight_decay/VQE-J1J2_J2=1.25_alternating-ansatz.json",
-    "r",
-) as f:
-    data = json.loads(f.read())
+data = load_results("data/v2/weight_decay/VQE-J1J2_J2=1.25_alternating-ansatz.json")
 
 
 length = 6 / 2.54  # convert inches to cm
@@ -1,79 +1,68 @@
 import numpy as np
+from regularizer import calculate_weight_decay, get_magnitudes_from_nearest_zero
+
+PADDING_VALUE = 1e-15
 
 
 def get_parameter_indices_to_be_pruned(parameters, cutoff, period):
-    return [
-        index
-        for index, parameter in enumerate(parameters)
-        if np.isclose(0.0, parameter, atol=cutoff)
-        or np.isclose(period, parameter, atol=cutoff)
-    ]
+    parameters = np.asarray(parameters, dtype=float)
+    is_pruned = np.isclose(0.0, parameters, atol=cutoff) | np.isclose(
+        period, parameters, atol=cutoff
+    )
+    return np.flatnonzero(is_pruned).tolist()
 
 
 def get_parameter_indices_to_be_pruned_using_percentage(
     parameters, percentage_to_prune, period
 ):
-    number_of_parameters_to_prune = np.ceil(len(parameters) * percentage_to_prune)
-
-    magnitudes_from_nearest_zero = []
-    for parameter in parameters:
-        remainder = parameter % period
-        magnitudes_from_nearest_zero.append(
-            min(
-                abs(0.0 - remainder),
-                abs(period - remainder),
-            )
-        )
+    """Sorted indices of the ceil(len(parameters) * percentage_to_prune)
+    parameters closest to zero (modulo period), preferring lower indices on
+    ties"""
+    number_of_parameters_to_prune = int(np.ceil(len(parameters) * percentage_to_prune))
+    if number_of_parameters_to_prune == 0:
+        return []
 
-    pruned_indices = []
-    while len(pruned_indices) < number_of_parameters_to_prune:
-        min_magnitude = np.inf
-        min_index = None
-        for index, magnitude in enumerate(magnitudes_from_nearest_zero):
-            if index in pruned_indices:
-                continue
+    magnitudes_from_nearest_zero = get_magnitudes_from_nearest_zero(parameters, period)
+    cutoff_magnitude = np.partition(
+        magnitudes_from_nearest_zero, number_of_parameters_to_prune - 1
+    )[number_of_parameters_to_prune - 1]
+    # Everything below the cutoff is pruned, and the remaining slots go to the
+    # lowest indices sitting exactly at it
+    is_pruned = magnitudes_from_nearest_zero < cutoff_magnitude
+    tied_indices = np.flatnonzero(magnitudes_from_nearest_zero == cutoff_magnitude)
+    is_pruned[
+        tied_indices[: number_of_parameters_to_prune - np.count_nonzero(is_pruned)]
+    ] = True
+    return np.flatnonzero(is_pruned).tolist()
 
-            if magnitude < min_magnitude:
-                min_magnitude = magnitude
-                min_index = index
-        pruned_indices.append(min_index)
 
-    return sorted(pruned_indices)
+def get_unpruned_mask(pruned_indices, number_of_parameters):
+    """Boolean mask over the padded parameters which is False at pruned_indices"""
+    is_unpruned = np.ones(number_of_parameters, dtype=bool)
+    is_unpruned[np.asarray(pruned_indices, dtype=int)] = False
+    return is_unpruned
 
 
 def get_pruned_parameters(unpruned_parameters, pruned_indices):
-    pruned_parameters = unpruned_parameters
-    for pruned_index in pruned_indices[::-1]:
-        pruned_parameters = np.delete(pruned_parameters, pruned_index)
-    return pruned_parameters
+    unpruned_parameters = np.asarray(unpruned_parameters)
+    return unpruned_parameters[
+        get_unpruned_mask(pruned_indices, len(unpruned_parameters))
+    ]
 
 
 def get_padded_parameters(unpadded_parameters, pruned_indices):
-    padded_parameters = unpadded_parameters
-    for pruned_index in pruned_indices:
-        padded_parameters = np.concatenate(
-            (
-                padded_parameters[:pruned_index],
-                np.asarray([float(1e-15)]),
-                padded_parameters[pruned_index:],
-            )
-        )
+    """Insert PADDING_VALUE at each of the (sorted) pruned_indices"""
+    unpadded_parameters = np.asarray(unpadded_parameters)
+    padded_parameters = np.full(
+        len(unpadded_parameters) + len(pruned_indices),
+        PADDING_VALUE,
+        dtype=np.result_type(unpadded_parameters, float),
+    )
+    is_unpruned = get_unpruned_mask(pruned_indices, len(padded_parameters))
+    padded_parameters[is_unpruned] = unpadded_parameters
     return padded_parameters
 
 
 def calculate_parameter_weight_bias(parameters, period, weight_decay):
-    # Calculate the bias to drive parameters to zero-values based on weight decay
-    # Using 1-norm to evaluate parameteter distance
-    max_parameter_distances = np.asarray([np.pi for _ in parameters])
-    parameter_distances = np.asarray(
-        [
-            min(
-                np.abs(parameter % (period)),
-                np.abs((parameter % period) - period),
-            )
-            for parameter in parameters
-        ]
-    )
-    for param in parameter_distances:
-        assert param >= 0.0
-    return weight_decay * (sum(parameter_distances) / sum(max_parameter_distances))
+    """L1 weight-decay bias, see regularizer.calculate_weight_decay"""
+    return calculate_weight_decay(parameters, weight_decay, period=period, norm=1)[0]
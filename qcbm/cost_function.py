@@ -1,4 +1,13 @@
-from prune import get_padded_parameters, calculate_parameter_weight_bias
+from prune import get_padded_parameters
+from regularizer import calculate_weight_decay
+from metrics import MetricsAggregator
+from evaluation_cache import EvaluationCache
+from vqe.simulator import (
+    compile_circuit,
+    prune_circuit,
+    simulate,
+    calculate_probability_cost_and_gradient,
+)
 from zquantum.qcbm.ansatz import QCBMAnsatz
 from zquantum.qcbm.cost_function import create_QCBM_cost_function
 from qecirq.simulator import CirqSimulator
@@ -7,7 +16,10 @@ from zquantum.core.distribution import (
     create_bitstring_distribution_from_probability_distribution,
 )
 import numpy as np
-import wandb
+import sympy
+
+# The epsilon zquantum's compute_clipped_negative_log_likelihood defaults to
+CLIPPING_EPSILON = 1e-9
 
 
 def get_pruned_qcbm_cost_function(
@@ -19,50 +31,89 @@ def get_pruned_qcbm_cost_function(
     parameter_period=2 * np.pi,
     weight_decay=0,
     seed=123,
+    cache_size=128,
+    metrics_sink=None,
+    use_native_simulator=False,
+    use_analytic_gradient=False,
 ):
+    """With use_native_simulator, the ansatz is compiled once to the NumPy
+    statevector engine in vqe.simulator (see get_native_cnll_function) instead
+    of being run through zquantum and cirq. use_analytic_gradient, which needs
+    the native simulator and exact probabilities, adds a `gradient` method with
+    the adjoint-differentiated gradient of the cost (including the weight decay)
+    with respect to the pruned parameters.
+
+    Re-evaluating a recent point (as the L-BFGS-B logging callback does) is
+    logged again without simulating, unless n_samples makes the cost stochastic.
+    The cache hit and miss counts are available from cost_function.cache.info().
+    Logs go to metrics_sink if given (see metrics.BufferedMetricsSink), and
+    cost_function.metrics.flush() writes out any that are still queued."""
+    assert use_native_simulator or not use_analytic_gradient
+    assert n_samples is None or not use_analytic_gradient
     number_of_qubits = int(np.log2(len(target_distribution)))
+    target_probabilities = np.asarray(target_distribution, dtype=float)
     target_distribution = create_bitstring_distribution_from_probability_distribution(
         target_distribution
     )
     ansatz = QCBMAnsatz(number_of_layers, number_of_qubits)
-    backend = CirqSimulator(seed=seed)
 
-    distance_measure = compute_clipped_negative_log_likelihood
     minimum_possible_cnll = compute_clipped_negative_log_likelihood(
         target_distribution, target_distribution, {}
     )
-    distance_measure_parameters = {}
-    unpruned_cost_function = create_QCBM_cost_function(
-        ansatz=ansatz,
-        backend=backend,
-        n_samples=n_samples,
-        distance_measure=distance_measure,
-        distance_measure_parameters=distance_measure_parameters,
-        target_bitstring_distribution=target_distribution,
-    )
+    if use_native_simulator:
+        cnll_function = get_native_cnll_function(
+            target_probabilities, ansatz, pruned_indices, n_samples, seed
+        )
+    else:
+        cnll_function = _get_zquantum_cnll_function(
+            target_distribution, ansatz, pruned_indices, n_samples, seed
+        )
 
-    min_cost = np.inf
-    min_cnll = np.inf
+    metrics = MetricsAggregator(use_wandb=use_wandb, sink=metrics_sink)
+    cache = EvaluationCache(maxsize=cache_size if n_samples is None else 0)
+
+    def evaluate(parameters):
+        """Clipped negative log likelihood, bias and (with analytic gradients)
+        cost gradient of the pruned parameters, simulated only if they are not
+        cached"""
+        entry = cache.get(parameters)
+        if entry is not None:
+            return entry
+
+        bias, bias_gradient = calculate_weight_decay(
+            get_padded_parameters(parameters, pruned_indices),
+            weight_decay,
+            period=parameter_period,
+            norm=1,
+        )
+        entry = {"bias": bias, "gradient": None}
+        if use_analytic_gradient:
+            # scipy asks for the value and the gradient at every point, and one
+            # adjoint pass yields both
+            cnll, cnll_gradient = cnll_function.cnll_and_gradient(parameters)
+            entry["cnll"] = cnll
+            entry["gradient"] = cnll_gradient + np.delete(bias_gradient, pruned_indices)
+        else:
+            entry["cnll"] = cnll_function(parameters)
+        cache.put(parameters, entry)
+        return entry
 
     def pruned_cost_function(
         parameters,
         extra_wandb_logs=None,
     ):
-        nonlocal min_cost, min_cnll
         if extra_wandb_logs is None:
             extra_wandb_logs = {}
 
-        parameters = get_padded_parameters(parameters, pruned_indices)
-
-        cnll = unpruned_cost_function(parameters)
-        parameter_bias = calculate_parameter_weight_bias(
-            parameters, parameter_period, weight_decay
-        )
+        entry = evaluate(parameters)
+        cnll, parameter_bias = entry["cnll"], entry["bias"]
         cost = cnll + parameter_bias
-        min_cost = min(min_cost, cost)
-        min_cnll = min(min_cnll, cnll)
-        if use_wandb:
-            log_dict = {
+        number_of_circuits_run = cnll_function.get_number_of_circuits_run()
+
+        def get_log_dict(minima):
+            min_cost = minima["Cost"]
+            min_cnll = minima["Clipped Negative Log Likelihood"]
+            return {
                 **{
                     "Minimum Offset Cost": min_cost - minimum_possible_cnll,
                     "Minimum Offset Clipped Negative Log Likelihood": min_cnll
@@ -75,12 +126,129 @@ def get_pruned_qcbm_cost_function(
                     "Parameter Weight Bias": parameter_bias,
                     "Clipped Negative Log Likelihood": cnll,
                     "Minimum Clipped Negative Log Likelihood": min_cnll,
-                    "Number of Circuits Run": backend.number_of_circuits_run,
+                    "Number of Circuits Run": number_of_circuits_run,
                 },
                 **extra_wandb_logs,
             }
-            wandb.log(log_dict)
 
+        metrics.record(
+            {"Cost": cost, "Clipped Negative Log Likelihood": cnll},
+            get_log_dict,
+            force=bool(extra_wandb_logs),
+        )
         return cost
 
+    def batch_cost(parameter_matrix, extra_wandb_logs=None):
+        """Costs of every row of parameter_matrix, evaluated one row at a time"""
+        return np.asarray(
+            [
+                pruned_cost_function(parameters, extra_wandb_logs)
+                for parameters in parameter_matrix
+            ]
+        )
+
+    def gradient(parameters):
+        return evaluate(parameters)["gradient"]
+
+    if use_analytic_gradient:
+        # zquantum's ScipyOptimizer passes this to scipy as the jacobian
+        pruned_cost_function.gradient = gradient
+    pruned_cost_function.batch_cost = batch_cost
+    pruned_cost_function.cache = cache
+    pruned_cost_function.metrics = metrics
     return pruned_cost_function
+
+
+def get_native_cnll_function(
+    target_probabilities, ansatz, pruned_indices=[], n_samples=None, seed=123
+):
+    """Clipped negative log likelihood of the pruned parameters, computed with the
+    NumPy statevector engine in vqe.simulator.
+
+    The circuit is compiled with the pruned gates compiled out of it, and the
+    Born probabilities |psi|^2 are compared with the target as dense arrays
+    indexed like the statevector (qubit 0 is the most significant bit, which is
+    also the bitstring order of
+    create_bitstring_distribution_from_probability_distribution). With
+    n_samples, the probabilities are replaced by the frequencies of that many
+    samples. Otherwise the returned function also has a `cnll_and_gradient`
+    method, which adjoint-differentiates the Born probabilities."""
+    # Bind the parameters by position, as zquantum's QCBM cost function does
+    symbols = [
+        sympy.Symbol("theta_{}".format(index))
+        for index in range(ansatz.number_of_params)
+    ]
+    circuit = ansatz._generate_circuit(np.asarray(symbols))
+    compiled_circuit = prune_circuit(
+        compile_circuit(circuit, symbols=symbols), pruned_indices
+    )
+    target_probabilities = np.asarray(target_probabilities, dtype=float)
+    random_number_generator = np.random.default_rng(seed)
+    number_of_circuits_run = [0]
+
+    def cnll_function(parameters):
+        probabilities = np.abs(simulate(compiled_circuit, parameters)) ** 2
+        number_of_circuits_run[0] += len(np.atleast_2d(parameters))
+        if n_samples is not None:
+            probabilities = (
+                random_number_generator.multinomial(n_samples, probabilities)
+                / n_samples
+            )
+        return calculate_clipped_negative_log_likelihood(
+            target_probabilities, probabilities
+        )
+
+    def cnll_and_gradient(parameters):
+        number_of_circuits_run[0] += len(np.atleast_2d(parameters))
+        return calculate_probability_cost_and_gradient(
+            compiled_circuit,
+            lambda probabilities: calculate_clipped_negative_log_likelihood(
+                target_probabilities, probabilities, with_gradient=True
+            ),
+            parameters,
+        )
+
+    if n_samples is None:
+        cnll_function.cnll_and_gradient = cnll_and_gradient
+    cnll_function.get_number_of_circuits_run = lambda: number_of_circuits_run[0]
+    return cnll_function
+
+
+def calculate_clipped_negative_log_likelihood(
+    target_probabilities, probabilities, epsilon=CLIPPING_EPSILON, with_gradient=False
+):
+    """zquantum's compute_clipped_negative_log_likelihood for dense probability
+    arrays, -sum(target * log(max(probabilities, epsilon))). A 2D array of
+    probabilities returns one value per row. with_gradient also returns the
+    derivatives with respect to the probabilities, which are 0 where they are
+    clipped."""
+    clipped_probabilities = np.maximum(probabilities, epsilon)
+    value = -np.sum(target_probabilities * np.log(clipped_probabilities), axis=-1)
+    if not with_gradient:
+        return value
+    gradient = np.where(
+        probabilities > epsilon, -target_probabilities / clipped_probabilities, 0.0
+    )
+    return value, gradient
+
+
+def _get_zquantum_cnll_function(
+    target_distribution, ansatz, pruned_indices, n_samples, seed
+):
+    """Clipped negative log likelihood of the pruned parameters, computed by
+    running the ansatz through zquantum's QCBM cost function and cirq"""
+    backend = CirqSimulator(seed=seed)
+    unpruned_cost_function = create_QCBM_cost_function(
+        ansatz=ansatz,
+        backend=backend,
+        n_samples=n_samples,
+        distance_measure=compute_clipped_negative_log_likelihood,
+        distance_measure_parameters={},
+        target_bitstring_distribution=target_distribution,
+    )
+
+    def cnll_function(parameters):
+        return unpruned_cost_function(get_padded_parameters(parameters, pruned_indices))
+
+    cnll_function.get_number_of_circuits_run = lambda: backend.number_of_circuits_run
+    return cnll_function
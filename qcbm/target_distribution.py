@@ -0,0 +1,50 @@
+from functools import lru_cache
+import numpy as np
+import scipy.stats
+
+# Names of scipy.stats distributions that differ from the family names used in
+# the run scripts
+FAMILY_NAMES = {"normal": "norm"}
+
+
+def get_target_distribution(
+    family, number_of_qubits, number_of_samples=None, seed=None, **parameters
+):
+    """Probabilities of the 2 ** number_of_qubits equal-width bins of [0, 1] under
+    a distribution conditioned on [0, 1], e.g.
+    get_target_distribution("normal", 5, loc=0.65, scale=0.1).
+
+    family is "normal" or the name of any continuous scipy.stats distribution
+    ("uniform", "beta", ...), and parameters are its scipy.stats arguments. The
+    probabilities are computed exactly from the CDF, which is what a histogram of
+    infinitely many samples would give, and cached by (family, number_of_qubits,
+    parameters). With number_of_samples, they are instead the frequencies of that
+    many samples drawn with the given seed, which keeps the sampling noise
+    without holding the samples in memory."""
+    probabilities = _get_bin_probabilities(
+        family, number_of_qubits, tuple(sorted(parameters.items()))
+    )
+    if number_of_samples is None:
+        return probabilities.copy()
+    counts = np.random.default_rng(seed).multinomial(number_of_samples, probabilities)
+    return counts / number_of_samples
+
+
+@lru_cache(maxsize=128)
+def _get_bin_probabilities(family, number_of_qubits, parameters):
+    distribution = getattr(scipy.stats, FAMILY_NAMES.get(family, family))(
+        **dict(parameters)
+    )
+    bin_edges = np.linspace(0, 1, 2 ** number_of_qubits + 1)
+    # Differences of the survival function are more accurate in the upper tail
+    cdf = distribution.cdf(bin_edges)
+    sf = distribution.sf(bin_edges)
+    probabilities = np.where(
+        bin_edges[1:] > distribution.median(),
+        sf[:-1] - sf[1:],
+        cdf[1:] - cdf[:-1],
+    )
+    assert probabilities.sum() > 0, "The distribution has no mass in [0, 1]"
+    probabilities = probabilities / probabilities.sum()
+    probabilities.setflags(write=False)
+    return probabilities
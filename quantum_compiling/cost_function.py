@@ -1,11 +1,101 @@
 import numpy as np
-import wandb
-from prune import get_padded_parameters
-from unitaries import get_overparameterized_unitary
+from prune import get_padded_parameters, get_unpruned_mask, PADDING_VALUE
+from metrics import MetricsAggregator
+from quantum_compiling.unitaries import (
+    get_overparameterized_unitary,
+    get_overparameterized_factors,
+    get_parameter_generators,
+)
 
 
 def frobenius_norm(matrix_A, matrix_B):
-    return np.linalg.norm(matrix_A - matrix_B)
+    """Frobenius norm of matrix_A - matrix_B, one per matrix for stacks of
+    matrices"""
+    return np.linalg.norm(matrix_A - matrix_B, axis=(-2, -1))
+
+
+def frobenius_norm_and_gradient(target, parameters, number_of_layers):
+    """frobenius_norm(target, get_overparameterized_unitary(parameters,
+    number_of_layers)) and its gradient with respect to the parameters, batched
+    like get_overparameterized_unitary.
+
+    With U = F_N ... F_1 the factors of get_overparameterized_factors and a
+    parameter of factor j with generator G (see get_parameter_generators),
+    dU/dtheta = S_j G P_j for the suffix product S_j = F_N ... F_(j+1) and the
+    prefix product P_j = F_j ... F_1. The derivative of the norm is then
+    Re tr(P_j D^dagger S_j G) / norm with D = U - target, so every gradient
+    takes O(number_of_layers) 4x4 products. The gradient is 0 where the norm
+    is."""
+    factors = get_overparameterized_factors(parameters, number_of_layers)
+    number_of_factors = factors.shape[-3]
+    prefixes = np.empty_like(factors)
+    prefixes[..., 0, :, :] = factors[..., 0, :, :]
+    for factor_index in range(1, number_of_factors):
+        prefixes[..., factor_index, :, :] = (
+            factors[..., factor_index, :, :] @ prefixes[..., factor_index - 1, :, :]
+        )
+    suffixes = np.empty_like(factors)
+    suffixes[..., -1, :, :] = np.eye(4)
+    for factor_index in range(number_of_factors - 2, -1, -1):
+        suffixes[..., factor_index, :, :] = (
+            suffixes[..., factor_index + 1, :, :] @ factors[..., factor_index + 1, :, :]
+        )
+
+    difference = prefixes[..., -1, :, :] - target
+    norm = np.linalg.norm(difference, axis=(-2, -1))
+    adjoint_difference = np.conj(np.swapaxes(difference, -2, -1))
+    products = prefixes @ adjoint_difference[..., np.newaxis, :, :] @ suffixes
+
+    factor_indices, generators = get_parameter_generators(number_of_layers)
+    # Re tr(A G) = Re sum(A * G^T). Unlike einsum, this sums every row in the
+    # same order whatever the batch shape, so batched and single evaluations
+    # agree exactly.
+    traces = np.sum(
+        products[..., factor_indices, :, :] * np.swapaxes(generators, -2, -1),
+        axis=(-2, -1),
+    ).real
+    safe_norm = np.where(norm > 0, norm, 1)[..., np.newaxis]
+    gradient = np.where(norm[..., np.newaxis] > 0, traces / safe_norm, 0.0)
+    return norm, gradient
+
+
+def get_batch_cost_and_gradient_function(
+    targets, number_of_layers, pruned_parameter_indices=None
+):
+    """Frobenius norms and gradients for a batch of trials, each with its own
+    target and pruned parameters, in the form taken by
+    optimize.minimize_with_lbfgsb_in_lockstep. The returned function takes the
+    indices of some trials and their pruned parameter vectors, and evaluates all
+    of them with one call to frobenius_norm_and_gradient."""
+    targets = np.asarray(targets)
+    number_of_parameters = 11 * number_of_layers
+    if pruned_parameter_indices is None:
+        pruned_parameter_indices = [[] for _ in targets]
+    unpruned_masks = np.asarray(
+        [
+            get_unpruned_mask(indices, number_of_parameters)
+            for indices in pruned_parameter_indices
+        ]
+    )
+
+    def batch_cost_and_gradient(trial_indices, parameter_vectors):
+        padded_parameter_matrix = np.full(
+            (len(trial_indices), number_of_parameters), PADDING_VALUE
+        )
+        for row, (trial, parameters) in enumerate(
+            zip(trial_indices, parameter_vectors)
+        ):
+            padded_parameter_matrix[row, unpruned_masks[trial]] = parameters
+        norms, padded_gradients = frobenius_norm_and_gradient(
+            targets[trial_indices], padded_parameter_matrix, number_of_layers
+        )
+        gradients = [
+            padded_gradient[unpruned_masks[trial]]
+            for trial, padded_gradient in zip(trial_indices, padded_gradients)
+        ]
+        return norms, gradients
+
+    return batch_cost_and_gradient
 
 
 def get_unpruned_cost_function(
@@ -14,55 +104,108 @@ def get_unpruned_cost_function(
     first_trivial_parameters,
     second_trivial_parameters,
     use_wandb=True,
+    metrics_sink=None,
+    use_analytic_gradient=False,
 ):
-    min_norm = np.inf
+    metrics = MetricsAggregator(use_wandb=use_wandb, sink=metrics_sink)
 
-    def unpruned_cost_function(parameters):
-        nonlocal min_norm
+    def unpruned_cost_function(parameters, extra_wandb_logs=None):
+        if extra_wandb_logs is None:
+            extra_wandb_logs = {}
         norm = frobenius_norm(
             target, get_overparameterized_unitary(parameters, number_of_layers)
         )
+        # Logs are built later, when the optimizer may have changed parameters
+        first_trivial_distance = np.linalg.norm(parameters - first_trivial_parameters)
+        second_trivial_distance = np.linalg.norm(parameters - second_trivial_parameters)
 
-        if use_wandb:
-            min_norm = min(min_norm, norm)
-            log_dict = {
+        def get_log_dict(minima):
+            return {
                 "Frobenius Norm": norm,
-                "Minimum Frobenius Norm": min_norm,
-                "Parameter Distance from First Trivial": np.linalg.norm(
-                    parameters - first_trivial_parameters
-                ),
-                "Parameter Distance from Second Trivial": np.linalg.norm(
-                    parameters - second_trivial_parameters
-                ),
+                "Minimum Frobenius Norm": minima["Frobenius Norm"],
+                "Parameter Distance from First Trivial": first_trivial_distance,
+                "Parameter Distance from Second Trivial": second_trivial_distance,
+                **extra_wandb_logs,
             }
-            wandb.log(log_dict)
 
+        metrics.record(
+            {"Frobenius Norm": norm}, get_log_dict, force=bool(extra_wandb_logs)
+        )
         return norm
 
+    def gradient(parameters):
+        return frobenius_norm_and_gradient(target, parameters, number_of_layers)[1]
+
+    if use_analytic_gradient:
+        # zquantum's ScipyOptimizer passes this to scipy as the jacobian
+        unpruned_cost_function.gradient = gradient
+    unpruned_cost_function.metrics = metrics
     return unpruned_cost_function
 
 
 def get_pruned_cost_function(
-    target, number_of_layers, pruned_parameter_indices, use_wandb=True
+    target,
+    number_of_layers,
+    pruned_parameter_indices,
+    use_wandb=True,
+    metrics_sink=None,
+    use_analytic_gradient=False,
 ):
-    min_norm = np.inf
-
-    def pruned_cost_function(parameters):
-        nonlocal min_norm
+    metrics = MetricsAggregator(use_wandb=use_wandb, sink=metrics_sink)
 
-        parameters = get_padded_parameters(parameters, pruned_parameter_indices)
+    def record_evaluation(norm, extra_wandb_logs=None):
+        if extra_wandb_logs is None:
+            extra_wandb_logs = {}
 
-        norm = frobenius_norm(
-            target, get_overparameterized_unitary(parameters, number_of_layers)
-        )
-        if use_wandb:
-            min_norm = min(min_norm, norm)
-            log_dict = {
+        def get_log_dict(minima):
+            return {
                 "Frobenius Norm": norm,
-                "Minimum Frobenius Norm": min_norm,
+                "Minimum Frobenius Norm": minima["Frobenius Norm"],
+                **extra_wandb_logs,
             }
-            wandb.log(log_dict)
 
+        metrics.record(
+            {"Frobenius Norm": norm}, get_log_dict, force=bool(extra_wandb_logs)
+        )
         return norm
 
+    def pruned_cost_function(parameters, extra_wandb_logs=None):
+        parameters = get_padded_parameters(parameters, pruned_parameter_indices)
+        return record_evaluation(
+            frobenius_norm(
+                target, get_overparameterized_unitary(parameters, number_of_layers)
+            ),
+            extra_wandb_logs,
+        )
+
+    def batch_cost(parameter_matrix):
+        """Costs of every row of parameter_matrix, with the unitaries of all rows
+        built together and the rows logged in order"""
+        padded_parameter_matrix = np.asarray(
+            [
+                get_padded_parameters(parameters, pruned_parameter_indices)
+                for parameters in parameter_matrix
+            ]
+        )
+        norms = frobenius_norm(
+            target,
+            get_overparameterized_unitary(padded_parameter_matrix, number_of_layers),
+        )
+        return np.asarray([record_evaluation(norm) for norm in norms])
+
+    def gradient(parameters):
+        """Gradient with respect to the unpruned parameters"""
+        padded_parameters = get_padded_parameters(parameters, pruned_parameter_indices)
+        padded_gradient = frobenius_norm_and_gradient(
+            target, padded_parameters, number_of_layers
+        )[1]
+        return padded_gradient[
+            get_unpruned_mask(pruned_parameter_indices, len(padded_parameters))
+        ]
+
+    if use_analytic_gradient:
+        # zquantum's ScipyOptimizer passes this to scipy as the jacobian
+        pruned_cost_function.gradient = gradient
+    pruned_cost_function.batch_cost = batch_cost
+    pruned_cost_function.metrics = metrics
     return pruned_cost_function
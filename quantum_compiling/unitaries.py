@@ -1,18 +1,108 @@
 import cirq
 import numpy as np
 
+NUMBER_OF_PARAMETERS_PER_LAYER = 11
+# (gate name, indices of its parameters within the layer) for the factors of
+# every layer of get_overparameterized_circuit. The single-qubit factors hold
+# the gates on qubit 0 and qubit 1.
+LAYER_FACTORS = [
+    ("RY", (0, 1)),
+    ("CNOT", ()),
+    ("RY", (2, 3)),
+    ("RZ", (4, 5)),
+    ("XX", (6,)),
+    ("RY", (7, 8)),
+    ("RZ", (9, 10)),
+]
+
 
 def get_target_unitary(parameters):
+    """Unitary of get_target_circuit, built directly with NumPy. parameters may
+    have leading batch axes, in which case one 4x4 unitary is returned for each
+    parameter vector."""
+    parameters = np.asarray(parameters, dtype=float)
+    identity = np.broadcast_to(_IDENTITY, parameters.shape[:-1] + (2, 2))
+    return (
+        _kron(identity, _ry_matrix(parameters[..., 1]))
+        @ _CNOT_MATRIX
+        @ _kron(_ry_matrix(parameters[..., 0]), identity)
+    )
+
+
+def get_overparameterized_unitary(parameters, number_of_layers):
+    """Unitary of get_overparameterized_circuit, built directly with NumPy as the
+    product of the factors from get_overparameterized_factors. parameters may
+    have leading batch axes, in which case one 4x4 unitary is returned for each
+    parameter vector."""
+    factors = get_overparameterized_factors(parameters, number_of_layers)
+    unitary = factors[..., 0, :, :]
+    for factor_index in range(1, factors.shape[-3]):
+        unitary = factors[..., factor_index, :, :] @ unitary
+    return unitary
+
+
+def get_overparameterized_factors(parameters, number_of_layers):
+    """The (..., 7 * number_of_layers, 4, 4) 4x4 factors of
+    get_overparameterized_unitary in the order they are applied. Each layer is
+    ry ry, CNOT, ry ry, rz rz, XX, ry ry, rz rz, where the gates on both qubits
+    in the same moment are combined into one Kronecker product. The parameters
+    of each factor are given by LAYER_FACTORS."""
+    parameters = np.asarray(parameters, dtype=float)
+    batch_shape = parameters.shape[:-1]
+    assert parameters.shape[-1] == NUMBER_OF_PARAMETERS_PER_LAYER * number_of_layers
+    layer_parameters = parameters.reshape(
+        batch_shape + (number_of_layers, NUMBER_OF_PARAMETERS_PER_LAYER)
+    )
+
+    factors = np.empty(
+        batch_shape + (number_of_layers, len(LAYER_FACTORS), 4, 4),
+        dtype=np.complex128,
+    )
+    for factor_index, (gate_name, parameter_indices) in enumerate(LAYER_FACTORS):
+        angles = [layer_parameters[..., index] for index in parameter_indices]
+        if gate_name == "CNOT":
+            factors[..., factor_index, :, :] = _CNOT_MATRIX
+        elif gate_name == "XX":
+            factors[..., factor_index, :, :] = _xx_pow_matrix(angles[0])
+        else:
+            single_qubit_matrix = _SINGLE_QUBIT_GATES[gate_name]
+            factors[..., factor_index, :, :] = _kron(
+                single_qubit_matrix(angles[0]), single_qubit_matrix(angles[1])
+            )
+    return factors.reshape(batch_shape + (number_of_layers * len(LAYER_FACTORS), 4, 4))
+
+
+def get_parameter_generators(number_of_layers):
+    """For every parameter, the index of its factor in
+    get_overparameterized_factors and the constant 4x4 matrix G for which the
+    derivative of that factor with respect to the parameter is G @ factor"""
+    layer_factor_indices = []
+    layer_generators = []
+    for factor_index, (gate_name, parameter_indices) in enumerate(LAYER_FACTORS):
+        for qubit, _ in enumerate(parameter_indices):
+            layer_factor_indices.append(factor_index)
+            layer_generators.append(_GENERATORS[gate_name][qubit])
+    # Parameters are listed in LAYER_FACTORS in order
+    factor_indices = np.concatenate(
+        [
+            np.asarray(layer_factor_indices) + layer * len(LAYER_FACTORS)
+            for layer in range(number_of_layers)
+        ]
+    )
+    return factor_indices, np.asarray(layer_generators * number_of_layers)
+
+
+def get_target_circuit(parameters):
     qubits = [cirq.LineQubit(i) for i in range(2)]
     circuit = cirq.Circuit()
 
     circuit.append(cirq.ry(parameters[0]).on(qubits[0]))
     circuit.append(cirq.CNOT(qubits[0], qubits[1]))
     circuit.append(cirq.ry(parameters[1]).on(qubits[1]))
-    return circuit.unitary()
+    return circuit
 
 
-def get_overparameterized_unitary(parameters, number_of_layers):
+def get_overparameterized_circuit(parameters, number_of_layers):
     qubits = [cirq.LineQubit(i) for i in range(2)]
     circuit = cirq.Circuit()
 
@@ -35,4 +125,59 @@ def get_overparameterized_unitary(parameters, number_of_layers):
         circuit.append(cirq.rz(parameters[(11 * i) + 9]).on(qubits[0]))
         circuit.append(cirq.rz(parameters[(11 * i) + 10]).on(qubits[1]))
 
-    return circuit.unitary()
+    return circuit
+
+
+def _kron(first_matrices, second_matrices):
+    """Kronecker product of two (..., 2, 2) arrays of single-qubit matrices, the
+    first acting on qubit 0 (the most significant bit, as in cirq)"""
+    product = np.einsum("...ij,...kl->...ikjl", first_matrices, second_matrices)
+    return product.reshape(product.shape[:-4] + (4, 4))
+
+
+def _ry_matrix(angles):
+    """cirq.ry, exp(-i angle Y / 2)"""
+    cos, sin = np.cos(angles / 2), np.sin(angles / 2)
+    matrices = np.empty(np.shape(angles) + (2, 2), dtype=np.complex128)
+    matrices[..., 0, 0] = cos
+    matrices[..., 0, 1] = -sin
+    matrices[..., 1, 0] = sin
+    matrices[..., 1, 1] = cos
+    return matrices
+
+
+def _rz_matrix(angles):
+    """cirq.rz, exp(-i angle Z / 2)"""
+    matrices = np.zeros(np.shape(angles) + (2, 2), dtype=np.complex128)
+    matrices[..., 0, 0] = np.exp(-0.5j * angles)
+    matrices[..., 1, 1] = np.exp(0.5j * angles)
+    return matrices
+
+
+def _xx_pow_matrix(angles):
+    """cirq.XXPowGate(exponent=angle / (2 pi)), which is
+    ((1 + e^(i angle / 2)) I + (1 - e^(i angle / 2)) XX) / 2 including cirq's
+    global phase"""
+    phase = np.exp(0.5j * np.asarray(angles))[..., np.newaxis, np.newaxis]
+    return ((1 + phase) * np.eye(4) + (1 - phase) * _XX_MATRIX) / 2
+
+
+_IDENTITY = np.eye(2, dtype=np.complex128)
+_CNOT_MATRIX = np.asarray(
+    [[1, 0, 0, 0], [0, 1, 0, 0], [0, 0, 0, 1], [0, 0, 1, 0]], dtype=np.complex128
+)
+_XX_MATRIX = np.fliplr(np.eye(4, dtype=np.complex128))
+
+_SINGLE_QUBIT_GATES = {"RY": _ry_matrix, "RZ": _rz_matrix}
+
+_PAULI_Y = np.asarray([[0, -1j], [1j, 0]], dtype=np.complex128)
+_PAULI_Z = np.asarray([[1, 0], [0, -1]], dtype=np.complex128)
+
+# Generators of every factor type, one per parameter of the factor. d/dangle of
+# exp(-i angle P / 2) is -i P / 2 times the gate, and that of the XXPowGate is
+# i (I - XX) / 4 times the gate.
+_GENERATORS = {
+    "RY": [-0.5j * np.kron(_PAULI_Y, _IDENTITY), -0.5j * np.kron(_IDENTITY, _PAULI_Y)],
+    "RZ": [-0.5j * np.kron(_PAULI_Z, _IDENTITY), -0.5j * np.kron(_IDENTITY, _PAULI_Z)],
+    "XX": [0.25j * (np.eye(4) - _XX_MATRIX)],
+}
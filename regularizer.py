@@ -0,0 +1,51 @@
+import numpy as np
+
+
+def calculate_weight_decay(
+    parameters, weight_decay, period=2 * np.pi, norm=2, normalization="pi"
+):
+    """Weight-decay bias driving parameters towards zero (modulo period), and its
+    gradient with respect to the parameters.
+
+    The bias is weight_decay * sum(distance ** norm) / normalizer, where distance
+    is each parameter's distance to the nearest multiple of period and norm is 1
+    or 2. The normalizer is number_of_parameters * pi ** norm for "pi" (what the
+    VQE and QCBM cost functions have always used), number_of_parameters *
+    (period / 2) ** norm for "period", and 1 for None. The L1 gradient is the
+    subgradient that is 0 at distance 0. A 2D array of parameters returns one
+    bias and gradient per row."""
+    assert norm in (1, 2)
+    distances, directions = _get_distances_and_directions(parameters, period)
+    number_of_parameters = distances.shape[-1]
+    if normalization == "pi":
+        normalizer = number_of_parameters * np.pi ** norm
+    elif normalization == "period":
+        normalizer = number_of_parameters * (period / 2) ** norm
+    elif normalization is None:
+        normalizer = 1
+    else:
+        raise ValueError("Unknown normalization {}".format(normalization))
+
+    scale = weight_decay / normalizer
+    if norm == 1:
+        value = scale * np.sum(distances, axis=-1)
+        gradient = scale * np.where(distances == 0, 0.0, directions)
+    else:
+        value = scale * np.sum(distances ** 2, axis=-1)
+        gradient = scale * 2 * distances * directions
+    return value, gradient
+
+
+def get_magnitudes_from_nearest_zero(parameters, period):
+    return _get_distances_and_directions(parameters, period)[0]
+
+
+def _get_distances_and_directions(parameters, period):
+    """Distance of each parameter to the nearest multiple of period, and the sign
+    of its derivative"""
+    remainders = np.mod(np.asarray(parameters, dtype=float), period)
+    is_closer_to_zero = np.abs(0.0 - remainders) <= np.abs(period - remainders)
+    distances = np.where(
+        is_closer_to_zero, np.abs(0.0 - remainders), np.abs(period - remainders)
+    )
+    return distances, np.where(is_closer_to_zero, 1.0, -1.0)
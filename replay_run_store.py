@@ -0,0 +1,44 @@
+# Push runs kept by run_store to wandb, e.g. after running offline on a cluster:
+# python replay_run_store.py <project> [run store directory]
+import run_store
+import numpy as np
+import wandb
+import json
+import sys
+import os
+
+project = sys.argv[1]
+directory = sys.argv[2] if len(sys.argv) > 2 else run_store.DEFAULT_DIRECTORY
+
+wandb.login()
+
+run_names = run_store.get_run_names(project, directory)
+for i, name in enumerate(run_names):
+    run_path = run_store.get_run_path(project, name, directory)
+    replay_path = os.path.join(run_path, "wandb.json")
+    if os.path.exists(replay_path):
+        continue
+    if not os.path.exists(os.path.join(run_path, "summary.json")):
+        print("Skipping unfinished run", name)
+        continue
+    print("[{}%] ".format(round(100 * (i / len(run_names)), 1)), name)
+
+    run = wandb.init(
+        project=project,
+        config=run_store.load_config(project, name, directory),
+        name=name,
+    )
+    run_frame = run_store.load_run(project, name, directory)
+    for row in run_frame.drop(columns="Step").to_dict("records"):
+        # Keys that were not logged at this step were stored as nulls
+        wandb.log(
+            {
+                key: value
+                for key, value in row.items()
+                if not (value is None or (isinstance(value, float) and np.isnan(value)))
+            }
+        )
+    run.finish()
+
+    with open(replay_path, "w") as f:
+        json.dump({"id": run.id}, f)
@@ -0,0 +1,226 @@
+import json
+import os
+import sqlite3
+import time
+from array_store import load_results
+
+DEFAULT_DATABASE = "data/results.sqlite"
+
+
+class ResultStore:
+    """Experiment results keyed by (project, number_of_qubits, number_of_layers,
+    trial, stage), e.g. ("QLT-VQE-J1J2-v0.12/alternating_ansatz/L-BFGS-B", 5, 8,
+    3, "pruned:0.9"), each holding a JSON-serializable result.
+
+    Every put is its own transaction, so jobs for different (number_of_qubits,
+    number_of_layers) can share one database without overwriting each other's
+    results. The database uses SQLite's write-ahead log, which lets readers run
+    alongside a writer, but needs a filesystem with working locks (not every
+    network filesystem has them). The exporters rebuild the JSON layouts that
+    the plotting scripts read."""
+
+    def __init__(self, path=DEFAULT_DATABASE, timeout=60):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self._connection = sqlite3.connect(path, timeout=timeout)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        with self._connection:
+            self._connection.execute(
+                """CREATE TABLE IF NOT EXISTS results (
+                    project TEXT NOT NULL,
+                    number_of_qubits INTEGER NOT NULL,
+                    number_of_layers INTEGER NOT NULL,
+                    trial INTEGER NOT NULL,
+                    stage TEXT NOT NULL,
+                    result TEXT NOT NULL,
+                    created REAL NOT NULL,
+                    PRIMARY KEY (
+                        project, number_of_qubits, number_of_layers, trial, stage
+                    )
+                )"""
+            )
+
+    def put(self, project, number_of_qubits, number_of_layers, trial, stage, result):
+        with self._connection:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (
+                    project,
+                    number_of_qubits,
+                    number_of_layers,
+                    trial,
+                    stage,
+                    json.dumps(result, default=_to_json),
+                    time.time(),
+                ),
+            )
+
+    def get(self, project, number_of_qubits, number_of_layers, trial, stage):
+        """The stored result, or None"""
+        row = self._connection.execute(
+            "SELECT result FROM results WHERE project = ? AND number_of_qubits = ? "
+            "AND number_of_layers = ? AND trial = ? AND stage = ?",
+            (project, number_of_qubits, number_of_layers, trial, stage),
+        ).fetchone()
+        return json.loads(row[0]) if row is not None else None
+
+    def has(self, project, number_of_qubits, number_of_layers, trial, stage):
+        """Whether the stage is done, without decoding its result"""
+        return (
+            self._connection.execute(
+                "SELECT 1 FROM results WHERE project = ? AND number_of_qubits = ? "
+                "AND number_of_layers = ? AND trial = ? AND stage = ?",
+                (project, number_of_qubits, number_of_layers, trial, stage),
+            ).fetchone()
+            is not None
+        )
+
+    def count(self, project):
+        return self._connection.execute(
+            "SELECT COUNT(*) FROM results WHERE project = ?", (project,)
+        ).fetchone()[0]
+
+    def get_records(self, project):
+        """(number_of_qubits, number_of_layers, trial, stage, result) of every
+        result of the project, in insertion order within each trial"""
+        rows = self._connection.execute(
+            "SELECT number_of_qubits, number_of_layers, trial, stage, result "
+            "FROM results WHERE project = ? "
+            "ORDER BY number_of_qubits, number_of_layers, trial, created",
+            (project,),
+        )
+        return [row[:4] + (json.loads(row[4]),) for row in rows]
+
+    def import_trials(self, project, data):
+        """Insert results from the {qubits: {layers: [{stage: result}]}} JSON
+        layout of the QLT scripts, keeping any result already stored"""
+        records = [
+            (
+                project,
+                int(number_of_qubits),
+                int(number_of_layers),
+                trial,
+                stage,
+                json.dumps(result, default=_to_json),
+                time.time(),
+            )
+            for number_of_qubits, qubit_data in data.items()
+            for number_of_layers, trials in qubit_data.items()
+            if isinstance(trials, list)
+            for trial, trial_data in enumerate(trials)
+            for stage, result in trial_data.items()
+        ]
+        with self._connection:
+            self._connection.executemany(
+                "INSERT OR IGNORE INTO results VALUES (?, ?, ?, ?, ?, ?, ?)", records
+            )
+
+    def import_overparameterization(self, project, data, stage):
+        """Insert results from the JSON layout of the overparameterization scripts
+        (see export_overparameterization) as results of the given stage, keeping
+        any result already stored"""
+        records = []
+        for number_of_qubits, qubit_data in data.items():
+            for number_of_layers, layer_data in qubit_data.items():
+                if number_of_layers == "ground_state_energy":
+                    continue
+                if isinstance(layer_data, dict):
+                    trials = zip(
+                        layer_data["energies"], layer_data["optimal_parameter_vectors"]
+                    )
+                else:
+                    trials = ((energy, None) for energy in layer_data)
+                for trial, (energy, optimal_parameters) in enumerate(trials):
+                    result = {
+                        "energy": energy,
+                        "optimal_parameters": optimal_parameters,
+                        "ground_state_energy": qubit_data.get("ground_state_energy"),
+                    }
+                    records.append(
+                        (
+                            project,
+                            int(number_of_qubits),
+                            int(number_of_layers),
+                            trial,
+                            stage,
+                            json.dumps(result, default=_to_json),
+                            time.time(),
+                        )
+                    )
+        with self._connection:
+            self._connection.executemany(
+                "INSERT OR IGNORE INTO results VALUES (?, ?, ?, ?, ?, ?, ?)", records
+            )
+
+    def export_trials(self, project):
+        """{qubits: {layers: [{stage: result} for each trial]}}, the layout of the
+        QLT scripts' JSON files. Missing trials are empty dicts."""
+        data = {}
+        records = self.get_records(project)
+        for number_of_qubits, number_of_layers, trial, stage, result in records:
+            trials = data.setdefault(str(number_of_qubits), {}).setdefault(
+                str(number_of_layers), []
+            )
+            while len(trials) <= trial:
+                trials.append({})
+            trials[trial][stage] = result
+        return data
+
+    def export_overparameterization(self, project, stage, include_parameters=True):
+        """{qubits: {"ground_state_energy": ..., layers: per-trial results}}, the
+        layout of the overparameterization scripts' JSON files, from results of
+        the given stage holding "energy", "optimal_parameters" and
+        "ground_state_energy". The per-trial results are
+        {"energies": [...], "optimal_parameter_vectors": [...]} with
+        include_parameters, and a list of energies otherwise."""
+        data = {}
+        records = self.get_records(project)
+        for number_of_qubits, number_of_layers, _, record_stage, result in records:
+            if record_stage != stage:
+                continue
+            qubit_data = data.setdefault(str(number_of_qubits), {})
+            qubit_data["ground_state_energy"] = result["ground_state_energy"]
+            if include_parameters:
+                layer_data = qubit_data.setdefault(
+                    str(number_of_layers),
+                    {"energies": [], "optimal_parameter_vectors": []},
+                )
+                layer_data["energies"].append(result["energy"])
+                layer_data["optimal_parameter_vectors"].append(
+                    result["optimal_parameters"]
+                )
+            else:
+                qubit_data.setdefault(str(number_of_layers), []).append(
+                    result["energy"]
+                )
+        return data
+
+    def close(self):
+        self._connection.close()
+
+
+def load_results_file(path):
+    """Results kept in a results file (JSON or its binary form) before the result
+    store, or {} if the file is missing or was left unreadable by an interrupted
+    rewrite"""
+    try:
+        return load_results(path)
+    except (OSError, ValueError):
+        return {}
+
+
+def write_json(path, data):
+    """Replace the file at path in one step, so readers never see it half written"""
+    temporary_path = "{}.{}.tmp".format(path, os.getpid())
+    with open(temporary_path, "w") as f:
+        f.write(json.dumps(data, default=_to_json))
+    os.replace(temporary_path, path)
+
+
+def _to_json(value):
+    if hasattr(value, "tolist"):
+        return value.tolist()
+    raise TypeError("{} is not JSON serializable".format(type(value)))
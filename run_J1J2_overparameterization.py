@@ -9,11 +9,13 @@ from optimize import (
     optimize_cost_function_with_lbfgsb,
     optimize_cost_function_with_cmaes,
 )
-from openfermion.linalg import eigenspectrum
+from vqe.ground_state import get_ground_state_energy
 import sympy
 import numpy as np
-import json
 import sys
+import os
+from result_store import ResultStore, load_results_file
+from array_store import write_results
 
 RECORD_DATA = True
 TRIAL_RANGE = range(10)
@@ -26,26 +28,20 @@ OPTIMIZER = "L-BFGS-B"
 datafilename = "data/v2/overparameterization/VQE-J1J2_J2={}_{}.json".format(
     J2, CIRCUIT_TYPE
 )
-try:
-    with open(datafilename, "r") as f:
-        DATA = json.loads(f.read())
-    f.close()
-except:
-    DATA = {}
-    with open(datafilename, "w") as f:
-        f.write(json.dumps(DATA))
-    f.close()
+RESULTS_PROJECT = os.path.splitext(os.path.basename(datafilename))[0]
+STAGE = "overparameterization"
+store = ResultStore()
+if store.count(RESULTS_PROJECT) == 0:
+    store.import_overparameterization(
+        RESULTS_PROJECT, load_results_file(datafilename), STAGE
+    )
 
 number_of_qubits = int(sys.argv[1])
 
 ##### GENERATE HAMILTONIAN #####
-qubit_data = DATA.get(str(number_of_qubits), {})
-DATA[str(number_of_qubits)] = qubit_data
-
 hamiltonian = generate_j1j2_hamiltonian(number_of_qubits, J2, j1=1)
 
-ground_state_energy = eigenspectrum(hamiltonian)[0]
-DATA[str(number_of_qubits)]["ground_state_energy"] = ground_state_energy
+ground_state_energy = get_ground_state_energy("j1j2", number_of_qubits, j2=J2)
 
 
 ##### GENERATE PARAMETERIZED QUANTUM CIRCUIT #####
@@ -62,18 +58,18 @@ for number_of_layers in [3]:
     )
     assert number_of_parameters == len(parameterized_quantum_circuit.free_symbols)
 
-    layer_data = DATA[str(number_of_qubits)].get(
-        str(number_of_layers), {"energies": [], "optimal_parameter_vectors": []}
-    )
-    print(
-        "     Need to run {} more trials".format(
-            len(TRIAL_RANGE) - len(layer_data["energies"])
+    trials_to_run = [
+        trial
+        for trial in TRIAL_RANGE
+        if not store.has(
+            RESULTS_PROJECT, number_of_qubits, number_of_layers, trial, STAGE
         )
-    )
+    ]
+    print("     Need to run {} more trials".format(len(trials_to_run)))
 
     ##### RUN TRIALS #####
     for trial in TRIAL_RANGE:
-        if trial >= len(layer_data["energies"]):
+        if trial in trials_to_run:
             seed = (number_of_qubits * 123) + (number_of_layers * 97) + trial
             vqe_cost_function = get_vqe_cost_function(
                 hamiltonian,
@@ -95,12 +91,21 @@ for number_of_layers in [3]:
                 optimizer_options={"ftol": 1e-10},
             )
 
-            layer_data["energies"].append(results.opt_value)
-            layer_data["optimal_parameter_vectors"].append(results.opt_params.tolist())
-
-            DATA[str(number_of_qubits)][str(number_of_layers)] = layer_data
-
             if RECORD_DATA:
-                with open(datafilename, "w") as f:
-                    f.write(json.dumps(DATA))
-                f.close()
+                store.put(
+                    RESULTS_PROJECT,
+                    number_of_qubits,
+                    number_of_layers,
+                    trial,
+                    STAGE,
+                    {
+                        "energy": results.opt_value,
+                        "optimal_parameters": results.opt_params.tolist(),
+                        "ground_state_energy": ground_state_energy,
+                    },
+                )
+
+if RECORD_DATA:
+    write_results(
+        datafilename, store.export_overparameterization(RESULTS_PROJECT, STAGE)
+    )
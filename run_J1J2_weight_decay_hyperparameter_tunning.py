@@ -3,10 +3,11 @@ from vqe.circuits import generate_alternating_vqe_j1j2_circuit
 from vqe.hamiltonians import generate_j1j2_hamiltonian
 from optimize import optimize_cost_function_with_lbfgsb
 
-from openfermion.linalg import eigenspectrum
+from vqe.ground_state import get_ground_state_energy
 import sympy
 import numpy as np
-import json
+from result_store import load_results_file
+from array_store import write_results
 
 RECORD_DATA = True
 TRIAL_RANGE = range(10)
@@ -21,18 +22,10 @@ NUMBER_OF_LAYERS = 8
 print("{} Qubits {} Layers".format(NUMBER_OF_QUBITS, NUMBER_OF_LAYERS))
 
 datafilename = "data/v2/weight_decay/VQE-J1J2_J2={}_{}.json".format(J2, CIRCUIT_TYPE)
-try:
-    with open(datafilename, "r") as f:
-        DATA = json.loads(f.read())
-    f.close()
-except:
-    DATA = {}
-    with open(datafilename, "w") as f:
-        f.write(json.dumps(DATA))
-    f.close()
+DATA = load_results_file(datafilename)
 
 hamiltonian = generate_j1j2_hamiltonian(NUMBER_OF_QUBITS, J2, j1=1)
-ground_state_energy = eigenspectrum(hamiltonian)[0]
+ground_state_energy = get_ground_state_energy("j1j2", NUMBER_OF_QUBITS, j2=J2)
 QUBIT_DATA = DATA.get(str(NUMBER_OF_QUBITS), {})
 DATA[str(NUMBER_OF_QUBITS)] = QUBIT_DATA
 QUBIT_DATA["ground_state_energy"] = ground_state_energy
@@ -102,7 +95,5 @@ for weight_decay in [1e-8, 1e-7, 1e-6, 1e-5, 1e-4, 1e-3, 1e-2, 1e-1, 1e0, 1e1]:
             ] = weight_decay_data
 
             if RECORD_DATA:
-                with open(datafilename, "w") as f:
-                    f.write(json.dumps(DATA))
-                f.close()
+                write_results(datafilename, DATA)
             print("    Finished Trial ", trial)
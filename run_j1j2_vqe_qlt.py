@@ -5,6 +5,7 @@ from prune import (
 from optimize import (
     optimize_cost_function_with_cmaes,
     optimize_cost_function_with_lbfgsb,
+    optimize_cost_function_with_multistart_lbfgsb,
 )
 from vqe.cost_function import get_vqe_cost_function
 from vqe.hamiltonians import generate_j1j2_hamiltonian
@@ -12,13 +13,14 @@ from vqe.circuits import (
     generate_overparameterized_vqe_j1j2_circuit,
     generate_alternating_vqe_j1j2_circuit,
 )
-from openfermion.linalg import eigenspectrum
+from vqe.ground_state import get_ground_state_energy
 import wandb
 import numpy as np
 import sympy
 import sys
-import json
 import copy
+from result_store import ResultStore, load_results_file
+from array_store import write_results
 
 VERSION = "0.12"
 PROJECT = "QLT-VQE-J1J2-v" + VERSION
@@ -26,9 +28,15 @@ PRUNING_PERCENTAGE = 0.9
 PARAMETER_PERIOD = 2 * np.pi
 WEIGHT_DECAY = 0
 USE_WANDB = True
+USE_NATIVE_SIMULATOR = False
+USE_ANALYTIC_GRADIENT = False
+# Optimize the parameter displacements of each trial together (needs the native
+# simulator and analytic gradients)
+USE_MULTISTART_LBFGSB = False
 MAX_NUMBER_OF_TRIALS = 10
 BOUNDARY_CONDITIONS = "open"
 J2 = 1.25
+assert not USE_MULTISTART_LBFGSB or USE_ANALYTIC_GRADIENT
 if USE_WANDB:
     wandb.login()
 CIRCUIT_TYPE = "alternating_ansatz"
@@ -47,26 +55,15 @@ cma_es_options = {
 datafilename = "data/qlt/J1J2-VQE/{}/{}/{}.json".format(
     CIRCUIT_TYPE, optimizer, PROJECT
 )
-try:
-    with open(datafilename, "r") as f:
-        DATA = json.loads(f.read())
-    f.close()
-except:
-    DATA = {}
-    with open(datafilename, "w") as f:
-        f.write(json.dumps(DATA))
-    f.close()
-if not DATA.get(str(number_of_qubits), False):
-    DATA[str(number_of_qubits)] = {}
-if not DATA[str(number_of_qubits)].get(str(number_of_layers), False):
-    DATA[str(number_of_qubits)][str(number_of_layers)] = []
+RESULTS_PROJECT = "{}/{}/{}".format(PROJECT, CIRCUIT_TYPE, optimizer)
+store = ResultStore()
+if store.count(RESULTS_PROJECT) == 0:
+    store.import_trials(RESULTS_PROJECT, load_results_file(datafilename))
 
 hamiltonian = generate_j1j2_hamiltonian(number_of_qubits, J2, j1=1)
-ground_state_energy = eigenspectrum(hamiltonian)[0]
+ground_state_energy = get_ground_state_energy("j1j2", number_of_qubits, j2=J2)
 
 for trial in range(MAX_NUMBER_OF_TRIALS):
-    if len(DATA[str(number_of_qubits)][str(number_of_layers)]) == trial:
-        DATA[str(number_of_qubits)][str(number_of_layers)].append({})
     SEED = 1234 + (number_of_layers * 17) + (trial * 23)
     np.random.seed(SEED)
 
@@ -96,8 +93,12 @@ for trial in range(MAX_NUMBER_OF_TRIALS):
     )
 
     #### Unpruned Optimization
-    if not DATA[str(number_of_qubits)][str(number_of_layers)][trial].get(
-        "unpruned", False
+    if not store.has(
+        RESULTS_PROJECT,
+        number_of_qubits,
+        number_of_layers,
+        trial,
+        "unpruned",
     ):
         unpruned_cost_function = get_vqe_cost_function(
             hamiltonian,
@@ -108,6 +109,8 @@ for trial in range(MAX_NUMBER_OF_TRIALS):
             parameter_period=PARAMETER_PERIOD,
             seed=SEED,
             use_wandb=USE_WANDB,
+            use_native_simulator=USE_NATIVE_SIMULATOR,
+            use_analytic_gradient=USE_ANALYTIC_GRADIENT,
         )
 
         extra_config = {
@@ -146,26 +149,25 @@ for trial in range(MAX_NUMBER_OF_TRIALS):
                 use_wandb=USE_WANDB,
                 optimizer_options=copy.deepcopy(cma_es_options),
             )
-        DATA[str(number_of_qubits)][str(number_of_layers)][trial]["unpruned"] = {
-            "initial_parameters": initial_parameters.tolist(),
-            "seed": SEED,
-            "energy": unpruned_results.opt_value,
-            "optimal_parameters": unpruned_results.opt_params.tolist(),
-        }
-        with open(datafilename, "w") as f:
-            f.write(json.dumps(DATA))
-        f.close()
+        store.put(
+            RESULTS_PROJECT,
+            number_of_qubits,
+            number_of_layers,
+            trial,
+            "unpruned",
+            {
+                "initial_parameters": initial_parameters.tolist(),
+                "seed": SEED,
+                "energy": unpruned_results.opt_value,
+                "optimal_parameters": unpruned_results.opt_params.tolist(),
+            },
+        )
 
-    initial_parameters = np.asarray(
-        DATA[str(number_of_qubits)][str(number_of_layers)][trial]["unpruned"][
-            "initial_parameters"
-        ]
-    )
-    unpruned_optimal_parameters = np.asarray(
-        DATA[str(number_of_qubits)][str(number_of_layers)][trial]["unpruned"][
-            "optimal_parameters"
-        ]
+    unpruned_data = store.get(
+        RESULTS_PROJECT, number_of_qubits, number_of_layers, trial, "unpruned"
     )
+    initial_parameters = np.asarray(unpruned_data["initial_parameters"])
+    unpruned_optimal_parameters = np.asarray(unpruned_data["optimal_parameters"])
     pruned_parameter_indices = get_parameter_indices_to_be_pruned_using_percentage(
         unpruned_optimal_parameters,
         PRUNING_PERCENTAGE,
@@ -175,8 +177,12 @@ for trial in range(MAX_NUMBER_OF_TRIALS):
         initial_parameters, pruned_parameter_indices
     )
 
-    if not DATA[str(number_of_qubits)][str(number_of_layers)][trial].get(
-        "pruned:{}".format(PRUNING_PERCENTAGE), False
+    if not store.has(
+        RESULTS_PROJECT,
+        number_of_qubits,
+        number_of_layers,
+        trial,
+        "pruned:{}".format(PRUNING_PERCENTAGE),
     ):
 
         pruned_cost_function = get_vqe_cost_function(
@@ -188,6 +194,8 @@ for trial in range(MAX_NUMBER_OF_TRIALS):
             parameter_period=PARAMETER_PERIOD,
             seed=SEED,
             use_wandb=USE_WANDB,
+            use_native_simulator=USE_NATIVE_SIMULATOR,
+            use_analytic_gradient=USE_ANALYTIC_GRADIENT,
         )
 
         extra_config = {
@@ -227,19 +235,24 @@ for trial in range(MAX_NUMBER_OF_TRIALS):
                 optimizer_options=copy.deepcopy(cma_es_options),
             )
 
-        DATA[str(number_of_qubits)][str(number_of_layers)][trial][
-            "pruned:{}".format(PRUNING_PERCENTAGE)
-        ] = {
-            "initial_parameters": pruned_initial_parameters.tolist(),
-            "seed": SEED,
-            "energy": pruned_results.opt_value,
-            "pruned_indices": pruned_parameter_indices,
-            "optimal_parameters": pruned_results.opt_params.tolist(),
-        }
-        with open(datafilename, "w") as f:
-            f.write(json.dumps(DATA))
-        f.close()
+        store.put(
+            RESULTS_PROJECT,
+            number_of_qubits,
+            number_of_layers,
+            trial,
+            "pruned:{}".format(PRUNING_PERCENTAGE),
+            {
+                "initial_parameters": pruned_initial_parameters.tolist(),
+                "seed": SEED,
+                "energy": pruned_results.opt_value,
+                "pruned_indices": pruned_parameter_indices,
+                "optimal_parameters": pruned_results.opt_params.tolist(),
+            },
+        )
 
+    # (stage, initial parameters, config) of the displacements still to be run,
+    # drawn in the order of the sweep
+    displaced_starts = []
     for PARAMETER_DISPLACEMENT in [
         # (1 / 1024) * PARAMETER_PERIOD,
         # (1 / 512) * PARAMETER_PERIOD,
@@ -250,24 +263,16 @@ for trial in range(MAX_NUMBER_OF_TRIALS):
         (1 / 8) * PARAMETER_PERIOD,
         (1 / 2) * PARAMETER_PERIOD,
     ]:
-        if not DATA[str(number_of_qubits)][str(number_of_layers)][trial].get(
-            "pruned_with_displacement:{}|{}".format(
-                PRUNING_PERCENTAGE, PARAMETER_DISPLACEMENT
-            ),
-            False,
+        stage = "pruned_with_displacement:{}|{}".format(
+            PRUNING_PERCENTAGE, PARAMETER_DISPLACEMENT
+        )
+        if not store.has(
+            RESULTS_PROJECT,
+            number_of_qubits,
+            number_of_layers,
+            trial,
+            stage,
         ):
-
-            pruned_cost_function = get_vqe_cost_function(
-                hamiltonian,
-                parameterized_quantum_circuit,
-                pruned_indices=pruned_parameter_indices,
-                weight_decay=WEIGHT_DECAY,
-                offset=-1 * ground_state_energy,
-                parameter_period=PARAMETER_PERIOD,
-                seed=SEED,
-                use_wandb=USE_WANDB,
-            )
-
             pruned_and_displaced_initial_parameters = (
                 pruned_initial_parameters
                 + np.random.uniform(
@@ -293,31 +298,89 @@ for trial in range(MAX_NUMBER_OF_TRIALS):
                 "number_of_pruned_parameters": len(pruned_parameter_indices),
                 "type": "pruned_with_displacement:{}".format(PARAMETER_DISPLACEMENT),
             }
-            pruned_results = optimize_cost_function_with_lbfgsb(
-                pruned_and_displaced_initial_parameters,
-                pruned_cost_function,
-                extra_config=extra_config,
+            displaced_starts.append(
+                (stage, pruned_and_displaced_initial_parameters, extra_config)
+            )
+
+    if displaced_starts and USE_MULTISTART_LBFGSB:
+        # All displacements share the pruned cost function, so they are
+        # optimized together, in one wandb run
+        pruned_cost_function = get_vqe_cost_function(
+            hamiltonian,
+            parameterized_quantum_circuit,
+            pruned_indices=pruned_parameter_indices,
+            weight_decay=WEIGHT_DECAY,
+            offset=-1 * ground_state_energy,
+            parameter_period=PARAMETER_PERIOD,
+            seed=SEED,
+            use_wandb=USE_WANDB,
+            use_native_simulator=USE_NATIVE_SIMULATOR,
+            use_analytic_gradient=USE_ANALYTIC_GRADIENT,
+        )
+        extra_config = {
+            **displaced_starts[0][2],
+            "initial_parameters": [start[1] for start in displaced_starts],
+            "type": "pruned_with_displacement",
+            "stages": [start[0] for start in displaced_starts],
+        }
+        displaced_results = optimize_cost_function_with_multistart_lbfgsb(
+            [start[1] for start in displaced_starts],
+            pruned_cost_function,
+            extra_config=extra_config,
+            use_wandb=USE_WANDB,
+            project=PROJECT,
+            optimizer_options=lbfgsb_options,
+        )
+    else:
+        displaced_results = []
+        for _, displaced_initial_parameters, extra_config in displaced_starts:
+            pruned_cost_function = get_vqe_cost_function(
+                hamiltonian,
+                parameterized_quantum_circuit,
+                pruned_indices=pruned_parameter_indices,
+                weight_decay=WEIGHT_DECAY,
+                offset=-1 * ground_state_energy,
+                parameter_period=PARAMETER_PERIOD,
+                seed=SEED,
                 use_wandb=USE_WANDB,
-                project=PROJECT,
-                optimizer_options=lbfgsb_options,
+                use_native_simulator=USE_NATIVE_SIMULATOR,
+                use_analytic_gradient=USE_ANALYTIC_GRADIENT,
             )
-            DATA[str(number_of_qubits)][str(number_of_layers)][trial][
-                "pruned_with_displacement:{}|{}".format(
-                    PRUNING_PERCENTAGE, PARAMETER_DISPLACEMENT
+            displaced_results.append(
+                optimize_cost_function_with_lbfgsb(
+                    displaced_initial_parameters,
+                    pruned_cost_function,
+                    extra_config=extra_config,
+                    use_wandb=USE_WANDB,
+                    project=PROJECT,
+                    optimizer_options=lbfgsb_options,
                 )
-            ] = {
+            )
+
+    for (stage, pruned_and_displaced_initial_parameters, _), pruned_results in zip(
+        displaced_starts, displaced_results
+    ):
+        store.put(
+            RESULTS_PROJECT,
+            number_of_qubits,
+            number_of_layers,
+            trial,
+            stage,
+            {
                 "initial_parameters": pruned_and_displaced_initial_parameters.tolist(),
                 "seed": SEED,
                 "energy": pruned_results.opt_value,
                 "pruned_indices": pruned_parameter_indices,
                 "optimal_parameters": pruned_results.opt_params.tolist(),
-            }
-            with open(datafilename, "w") as f:
-                f.write(json.dumps(DATA))
-            f.close()
+            },
+        )
 
-    if not DATA[str(number_of_qubits)][str(number_of_layers)][trial].get(
-        "pruned_and_randomized:{}".format(PRUNING_PERCENTAGE), False
+    if not store.has(
+        RESULTS_PROJECT,
+        number_of_qubits,
+        number_of_layers,
+        trial,
+        "pruned_and_randomized:{}".format(PRUNING_PERCENTAGE),
     ):
         pruned_cost_function = get_vqe_cost_function(
             hamiltonian,
@@ -328,6 +391,8 @@ for trial in range(MAX_NUMBER_OF_TRIALS):
             parameter_period=PARAMETER_PERIOD,
             seed=SEED,
             use_wandb=USE_WANDB,
+            use_native_simulator=USE_NATIVE_SIMULATOR,
+            use_analytic_gradient=USE_ANALYTIC_GRADIENT,
         )
         random_initial_parameters = np.random.uniform(
             -PARAMETER_PERIOD / 2, PARAMETER_PERIOD / 2, len(pruned_initial_parameters)
@@ -370,21 +435,27 @@ for trial in range(MAX_NUMBER_OF_TRIALS):
                 optimizer_options=copy.deepcopy(cma_es_options),
             )
 
-        DATA[str(number_of_qubits)][str(number_of_layers)][trial][
-            "pruned_and_randomized:{}".format(PRUNING_PERCENTAGE)
-        ] = {
-            "initial_parameters": random_initial_parameters.tolist(),
-            "seed": SEED,
-            "energy": pruned_and_randomized_results.opt_value,
-            "pruned_indices": pruned_parameter_indices,
-            "optimal_parameters": pruned_and_randomized_results.opt_params.tolist(),
-        }
-        with open(datafilename, "w") as f:
-            f.write(json.dumps(DATA))
-        f.close()
+        store.put(
+            RESULTS_PROJECT,
+            number_of_qubits,
+            number_of_layers,
+            trial,
+            "pruned_and_randomized:{}".format(PRUNING_PERCENTAGE),
+            {
+                "initial_parameters": random_initial_parameters.tolist(),
+                "seed": SEED,
+                "energy": pruned_and_randomized_results.opt_value,
+                "pruned_indices": pruned_parameter_indices,
+                "optimal_parameters": pruned_and_randomized_results.opt_params.tolist(),
+            },
+        )
 
-    if not DATA[str(number_of_qubits)][str(number_of_layers)][trial].get(
-        "random_subnetwork:{}".format(PRUNING_PERCENTAGE), False
+    if not store.has(
+        RESULTS_PROJECT,
+        number_of_qubits,
+        number_of_layers,
+        trial,
+        "random_subnetwork:{}".format(PRUNING_PERCENTAGE),
     ):
         randomly_pruned_indices = [
             int(index)
@@ -410,6 +481,8 @@ for trial in range(MAX_NUMBER_OF_TRIALS):
             parameter_period=PARAMETER_PERIOD,
             seed=SEED,
             use_wandb=USE_WANDB,
+            use_native_simulator=USE_NATIVE_SIMULATOR,
+            use_analytic_gradient=USE_ANALYTIC_GRADIENT,
         )
 
         extra_config = {
@@ -449,25 +522,35 @@ for trial in range(MAX_NUMBER_OF_TRIALS):
                 optimizer_options=copy.deepcopy(cma_es_options),
             )
 
-        DATA[str(number_of_qubits)][str(number_of_layers)][trial][
-            "random_subnetwork:{}".format(PRUNING_PERCENTAGE)
-        ] = {
-            "initial_parameters": randomly_pruned_initial_parameters.tolist(),
-            "seed": SEED,
-            "energy": pruned_and_randomized_results.opt_value,
-            "pruned_indices": pruned_parameter_indices,
-            "optimal_parameters": pruned_and_randomized_results.opt_params.tolist(),
-        }
-        with open(datafilename, "w") as f:
-            f.write(json.dumps(DATA))
-        f.close()
+        store.put(
+            RESULTS_PROJECT,
+            number_of_qubits,
+            number_of_layers,
+            trial,
+            "random_subnetwork:{}".format(PRUNING_PERCENTAGE),
+            {
+                "initial_parameters": randomly_pruned_initial_parameters.tolist(),
+                "seed": SEED,
+                "energy": pruned_and_randomized_results.opt_value,
+                "pruned_indices": pruned_parameter_indices,
+                "optimal_parameters": pruned_and_randomized_results.opt_params.tolist(),
+            },
+        )
 
-    randomly_pruned_indices = DATA[str(number_of_qubits)][str(number_of_layers)][trial][
-        "random_subnetwork:{}".format(PRUNING_PERCENTAGE)
-    ]["pruned_indices"]
+    randomly_pruned_indices = store.get(
+        RESULTS_PROJECT,
+        number_of_qubits,
+        number_of_layers,
+        trial,
+        "random_subnetwork:{}".format(PRUNING_PERCENTAGE),
+    )["pruned_indices"]
 
-    if not DATA[str(number_of_qubits)][str(number_of_layers)][trial].get(
-        "random_subnetwork_randomized_parameters:{}".format(PRUNING_PERCENTAGE), False
+    if not store.has(
+        RESULTS_PROJECT,
+        number_of_qubits,
+        number_of_layers,
+        trial,
+        "random_subnetwork_randomized_parameters:{}".format(PRUNING_PERCENTAGE),
     ):
         random_initial_parameters = np.random.uniform(
             (-PARAMETER_PERIOD) / 2,
@@ -484,6 +567,8 @@ for trial in range(MAX_NUMBER_OF_TRIALS):
             parameter_period=PARAMETER_PERIOD,
             seed=SEED,
             use_wandb=USE_WANDB,
+            use_native_simulator=USE_NATIVE_SIMULATOR,
+            use_analytic_gradient=USE_ANALYTIC_GRADIENT,
         )
 
         extra_config = {
@@ -514,15 +599,19 @@ for trial in range(MAX_NUMBER_OF_TRIALS):
                 optimizer_options=lbfgsb_options,
             )
         )
-        DATA[str(number_of_qubits)][str(number_of_layers)][trial][
-            "random_subnetwork_randomized_parameters:{}".format(PRUNING_PERCENTAGE)
-        ] = {
-            "initial_parameters": random_initial_parameters.tolist(),
-            "seed": SEED,
-            "energy": random_subnetwork_randomized_parameters_results.opt_value,
-            "pruned_indices": randomly_pruned_indices,
-            "optimal_parameters": random_subnetwork_randomized_parameters_results.opt_params.tolist(),
-        }
-        with open(datafilename, "w") as f:
-            f.write(json.dumps(DATA))
-        f.close()
+        store.put(
+            RESULTS_PROJECT,
+            number_of_qubits,
+            number_of_layers,
+            trial,
+            "random_subnetwork_randomized_parameters:{}".format(PRUNING_PERCENTAGE),
+            {
+                "initial_parameters": random_initial_parameters.tolist(),
+                "seed": SEED,
+                "energy": random_subnetwork_randomized_parameters_results.opt_value,
+                "pruned_indices": randomly_pruned_indices,
+                "optimal_parameters": random_subnetwork_randomized_parameters_results.opt_params.tolist(),
+            },
+        )
+
+write_results(datafilename, store.export_trials(RESULTS_PROJECT))
@@ -0,0 +1,314 @@
+# The experiment of run_j1j2_vqe_qlt.py for every number of qubits and layers
+# below at once: python run_j1j2_vqe_qlt_scheduled.py <optimizer>
+# Each stage of each trial is a task (see scheduler.expand_tasks), and the tasks
+# run on a process pool with one process per allocated core (#SBATCH -c), each
+# stage starting once the unpruned optimization of its trial is stored. The
+# stages, configs and results are those of run_j1j2_vqe_qlt.py, and results
+# already stored by either script are not run again.
+#
+# With SEED_ENTROPY = None every trial draws the numbers of run_j1j2_vqe_qlt.py
+# from SEED = 1234 + 17 L + 23 t, in the order of a fresh run of that script.
+# With an integer SEED_ENTROPY every trial instead has its own
+# np.random.SeedSequence stream, and the results are stored under a project of
+# their own. Either way a trial draws the same numbers whichever tasks run
+# before it.
+from prune import (
+    get_parameter_indices_to_be_pruned_using_percentage,
+    get_pruned_parameters,
+)
+from optimize import (
+    optimize_cost_function_with_cmaes,
+    optimize_cost_function_with_lbfgsb,
+)
+from scheduler import expand_tasks, run_tasks, get_trial_seed, get_trial_random_state
+from vqe.cost_function import get_vqe_cost_function
+from vqe.hamiltonians import generate_j1j2_hamiltonian
+from vqe.circuits import generate_alternating_vqe_j1j2_circuit
+from vqe.ground_state import get_ground_state_energy
+import wandb
+import numpy as np
+import sympy
+import sys
+import copy
+from result_store import ResultStore, load_results_file
+from array_store import write_results
+
+VERSION = "0.12"
+PROJECT = "QLT-VQE-J1J2-v" + VERSION
+PRUNING_PERCENTAGE = 0.9
+PARAMETER_PERIOD = 2 * np.pi
+PARAMETER_DISPLACEMENTS = [
+    (1 / 128) * PARAMETER_PERIOD,
+    (1 / 32) * PARAMETER_PERIOD,
+    (1 / 8) * PARAMETER_PERIOD,
+    (1 / 2) * PARAMETER_PERIOD,
+]
+WEIGHT_DECAY = 0
+USE_WANDB = True
+USE_NATIVE_SIMULATOR = False
+USE_ANALYTIC_GRADIENT = False
+QUBIT_RANGE = range(5, 6, 1)
+LAYER_RANGE = range(4, 5, 1)
+TRIAL_RANGE = range(0, 10, 1)
+SEED_ENTROPY = None
+# Processes of the pool, None for one per allocated core
+NUMBER_OF_PROCESSES = None
+BOUNDARY_CONDITIONS = "open"
+J2 = 1.25
+if USE_WANDB:
+    wandb.login()
+CIRCUIT_TYPE = "alternating_ansatz"
+optimizer = str(sys.argv[1])
+lbfgsb_options = {"ftol": 1e-10}
+cma_es_options = {
+    "sigma_0": 0.01,
+    "bounds": None,
+    "tolx": 1e-10,
+    "popsize": 36,
+    "maxfevals": 20000,
+}
+
+datafilename = "data/qlt/J1J2-VQE/{}/{}/{}.json".format(
+    CIRCUIT_TYPE, optimizer, PROJECT
+)
+RESULTS_PROJECT = "{}/{}/{}".format(PROJECT, CIRCUIT_TYPE, optimizer)
+if SEED_ENTROPY is not None:
+    datafilename = datafilename.replace(
+        ".json", "_seed-sequence={}.json".format(SEED_ENTROPY)
+    )
+    RESULTS_PROJECT += "/seed-sequence={}".format(SEED_ENTROPY)
+store = ResultStore()
+if store.count(RESULTS_PROJECT) == 0:
+    store.import_trials(RESULTS_PROJECT, load_results_file(datafilename))
+store.close()
+
+# Built before the pool is forked, so every process shares them
+hamiltonians = {}
+ground_state_energies = {}
+for number_of_qubits in QUBIT_RANGE:
+    hamiltonians[number_of_qubits] = generate_j1j2_hamiltonian(
+        number_of_qubits, J2, j1=1
+    )
+    ground_state_energies[number_of_qubits] = get_ground_state_energy(
+        "j1j2", number_of_qubits, j2=J2
+    )
+
+PRUNED_STAGE = "pruned:{}".format(PRUNING_PERCENTAGE)
+DISPLACEMENT_STAGES = [
+    "pruned_with_displacement:{}|{}".format(PRUNING_PERCENTAGE, displacement)
+    for displacement in PARAMETER_DISPLACEMENTS
+]
+RANDOMIZED_STAGE = "pruned_and_randomized:{}".format(PRUNING_PERCENTAGE)
+RANDOM_SUBNETWORK_STAGE = "random_subnetwork:{}".format(PRUNING_PERCENTAGE)
+RANDOM_SUBNETWORK_RANDOMIZED_STAGE = (
+    "random_subnetwork_randomized_parameters:{}".format(PRUNING_PERCENTAGE)
+)
+STAGES = {
+    "unpruned": [],
+    PRUNED_STAGE: ["unpruned"],
+    **{stage: ["unpruned"] for stage in DISPLACEMENT_STAGES},
+    RANDOMIZED_STAGE: ["unpruned"],
+    RANDOM_SUBNETWORK_STAGE: ["unpruned"],
+    RANDOM_SUBNETWORK_RANDOMIZED_STAGE: [RANDOM_SUBNETWORK_STAGE],
+}
+
+
+def draw_initializations(
+    random_state, number_of_parameters, number_of_pruned_parameters
+):
+    """Every random draw of a trial, in the order run_j1j2_vqe_qlt.py makes them:
+    the initial parameters, the displacements, the randomized parameters, the
+    random subnetwork and its randomized parameters"""
+    draws = {
+        "unpruned": random_state.uniform(
+            -1 * (PARAMETER_PERIOD / 2), (PARAMETER_PERIOD / 2), number_of_parameters
+        )
+    }
+    if number_of_pruned_parameters is None:
+        return draws
+    number_of_unpruned_parameters = number_of_parameters - number_of_pruned_parameters
+    for displacement, stage in zip(PARAMETER_DISPLACEMENTS, DISPLACEMENT_STAGES):
+        draws[stage] = random_state.uniform(
+            0, displacement, number_of_unpruned_parameters
+        )
+    draws[RANDOMIZED_STAGE] = random_state.uniform(
+        -PARAMETER_PERIOD / 2, PARAMETER_PERIOD / 2, number_of_unpruned_parameters
+    )
+    draws[RANDOM_SUBNETWORK_STAGE] = [
+        int(index)
+        for index in sorted(
+            random_state.choice(
+                range(number_of_parameters),
+                number_of_pruned_parameters,
+                replace=False,
+            )
+        )
+    ]
+    draws[RANDOM_SUBNETWORK_RANDOMIZED_STAGE] = random_state.uniform(
+        (-PARAMETER_PERIOD) / 2,
+        (PARAMETER_PERIOD) / 2,
+        number_of_unpruned_parameters,
+    )
+    return draws
+
+
+def run_task(task):
+    number_of_qubits, number_of_layers, trial, stage = task
+    store = ResultStore()
+    if store.has(RESULTS_PROJECT, *task):
+        store.close()
+        return
+    seed = get_trial_seed(number_of_qubits, number_of_layers, trial, SEED_ENTROPY)
+    random_state = get_trial_random_state(
+        number_of_qubits, number_of_layers, trial, SEED_ENTROPY
+    )
+
+    number_of_parameters = (
+        (3 * (number_of_qubits - 1)) + number_of_qubits
+    ) * number_of_layers
+    parameters = [
+        sympy.Symbol("theta{}".format(i)) for i in range(number_of_parameters)
+    ]
+    parameterized_quantum_circuit = generate_alternating_vqe_j1j2_circuit(
+        number_of_qubits, number_of_layers, parameters
+    )
+
+    if stage == "unpruned":
+        initial_parameters = draw_initializations(
+            random_state, number_of_parameters, None
+        )["unpruned"]
+        pruned_parameter_indices = []
+        stage_initial_parameters = initial_parameters
+        stage_pruned_indices = []
+        stage_type = "unpruned"
+    else:
+        unpruned_data = store.get(
+            RESULTS_PROJECT, number_of_qubits, number_of_layers, trial, "unpruned"
+        )
+        initial_parameters = np.asarray(unpruned_data["initial_parameters"])
+        unpruned_optimal_parameters = np.asarray(unpruned_data["optimal_parameters"])
+        pruned_parameter_indices = get_parameter_indices_to_be_pruned_using_percentage(
+            unpruned_optimal_parameters,
+            PRUNING_PERCENTAGE,
+            PARAMETER_PERIOD,
+        )
+        pruned_initial_parameters = get_pruned_parameters(
+            initial_parameters, pruned_parameter_indices
+        )
+        draws = draw_initializations(
+            random_state, number_of_parameters, len(pruned_parameter_indices)
+        )
+        stage_pruned_indices = pruned_parameter_indices
+        if stage == PRUNED_STAGE:
+            stage_initial_parameters = pruned_initial_parameters
+            stage_type = "pruned"
+        elif stage in DISPLACEMENT_STAGES:
+            stage_initial_parameters = pruned_initial_parameters + draws[stage]
+            stage_type = "pruned_with_displacement:{}".format(
+                PARAMETER_DISPLACEMENTS[DISPLACEMENT_STAGES.index(stage)]
+            )
+        elif stage == RANDOMIZED_STAGE:
+            stage_initial_parameters = draws[stage]
+            stage_type = "pruned_and_randomized"
+        elif stage == RANDOM_SUBNETWORK_STAGE:
+            stage_pruned_indices = draws[stage]
+            stage_initial_parameters = get_pruned_parameters(
+                initial_parameters, stage_pruned_indices
+            )
+            stage_type = "random_subnetwork"
+        elif stage == RANDOM_SUBNETWORK_RANDOMIZED_STAGE:
+            # As in run_j1j2_vqe_qlt.py, the subnetwork is the one recorded by
+            # the random subnetwork stage
+            stage_pruned_indices = store.get(
+                RESULTS_PROJECT,
+                number_of_qubits,
+                number_of_layers,
+                trial,
+                RANDOM_SUBNETWORK_STAGE,
+            )["pruned_indices"]
+            stage_initial_parameters = draws[stage]
+            stage_type = "random_subnetwork"
+
+    cost_function = get_vqe_cost_function(
+        hamiltonians[number_of_qubits],
+        parameterized_quantum_circuit,
+        pruned_indices=stage_pruned_indices,
+        weight_decay=WEIGHT_DECAY,
+        offset=-1 * ground_state_energies[number_of_qubits],
+        parameter_period=PARAMETER_PERIOD,
+        seed=seed,
+        use_wandb=USE_WANDB,
+        use_native_simulator=USE_NATIVE_SIMULATOR,
+        use_analytic_gradient=USE_ANALYTIC_GRADIENT,
+    )
+
+    extra_config = {
+        "intialization_strategy": "uniform (-{}->{})".format(
+            PARAMETER_PERIOD / 2, PARAMETER_PERIOD / 2
+        ),
+        "pruning_percentage": PRUNING_PERCENTAGE if stage != "unpruned" else 0,
+        "boundary_conditions": BOUNDARY_CONDITIONS,
+        "weight decay": WEIGHT_DECAY,
+        "parameter_period": PARAMETER_PERIOD,
+        "J2": J2,
+        "number_of_qubits": number_of_qubits,
+        "number_of_layers": number_of_layers,
+        "trial": trial,
+        "unpruned_initial_parameters": initial_parameters,
+        "initial_parameters": stage_initial_parameters,
+        "pruned_parameter_indices": pruned_parameter_indices,
+        "number_of_pruned_parameters": len(pruned_parameter_indices),
+        "type": stage_type,
+    }
+    # The displacements and the random subnetwork's randomized parameters are
+    # always optimized with L-BFGS-B
+    if (
+        optimizer == "L-BFGS-B"
+        or stage in DISPLACEMENT_STAGES
+        or stage == RANDOM_SUBNETWORK_RANDOMIZED_STAGE
+    ):
+        results = optimize_cost_function_with_lbfgsb(
+            stage_initial_parameters,
+            cost_function,
+            extra_config=extra_config,
+            project=PROJECT,
+            use_wandb=USE_WANDB,
+            optimizer_options=lbfgsb_options,
+        )
+    elif optimizer == "CMA-ES":
+        results = optimize_cost_function_with_cmaes(
+            stage_initial_parameters,
+            cost_function,
+            extra_config=extra_config,
+            project=PROJECT,
+            use_wandb=USE_WANDB,
+            optimizer_options=copy.deepcopy(cma_es_options),
+        )
+
+    result = {
+        "initial_parameters": np.asarray(stage_initial_parameters).tolist(),
+        "seed": seed,
+        "energy": results.opt_value,
+        "optimal_parameters": results.opt_params.tolist(),
+    }
+    if stage != "unpruned":
+        # run_j1j2_vqe_qlt.py records the random subnetwork stage with the
+        # pruned indices of the trial
+        result["pruned_indices"] = (
+            stage_pruned_indices
+            if stage == RANDOM_SUBNETWORK_RANDOMIZED_STAGE
+            else pruned_parameter_indices
+        )
+    store.put(RESULTS_PROJECT, *task, result)
+    store.close()
+
+
+run_tasks(
+    expand_tasks(QUBIT_RANGE, LAYER_RANGE, TRIAL_RANGE, STAGES),
+    run_task,
+    number_of_processes=NUMBER_OF_PROCESSES,
+)
+
+store = ResultStore()
+write_results(datafilename, store.export_trials(RESULTS_PROJECT))
+store.close()
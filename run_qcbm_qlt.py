@@ -4,11 +4,13 @@ from prune import (
 )
 from optimize import optimize_cost_function_with_lbfgsb
 from qcbm.cost_function import get_pruned_qcbm_cost_function
+from qcbm.target_distribution import get_target_distribution
 import wandb
 import numpy as np
 from zquantum.qcbm.ansatz import QCBMAnsatz
 import sys
-import json
+from result_store import ResultStore, load_results_file
+from array_store import write_results
 
 VERSION = "0.15"
 PROJECT = "QLT-QCBM-v" + VERSION
@@ -16,6 +18,8 @@ PRUNING_PERCENTAGE = 0.9
 PARAMETER_PERIOD = 2 * np.pi
 WEIGHT_DECAY = 0
 USE_WANDB = True
+USE_NATIVE_SIMULATOR = False
+USE_ANALYTIC_GRADIENT = False
 MAX_NUMBER_OF_TRIALS = 10
 DISTRIBUTION_TYPE = "normal"
 DISTRIBUTION_MEAN = 0.65
@@ -27,23 +31,12 @@ number_of_layers = int(sys.argv[2])
 lbfgsb_options = {"ftol": 1e-10}
 
 datafilename = "data/qlt/QCBM/{}/{}.json".format("L-BFGS-B", PROJECT)
-try:
-    with open(datafilename, "r") as f:
-        DATA = json.loads(f.read())
-    f.close()
-except:
-    DATA = {}
-    with open(datafilename, "w") as f:
-        f.write(json.dumps(DATA))
-    f.close()
-if not DATA.get(str(number_of_qubits), False):
-    DATA[str(number_of_qubits)] = {}
-if not DATA[str(number_of_qubits)].get(str(number_of_layers), False):
-    DATA[str(number_of_qubits)][str(number_of_layers)] = []
+RESULTS_PROJECT = PROJECT
+store = ResultStore()
+if store.count(RESULTS_PROJECT) == 0:
+    store.import_trials(RESULTS_PROJECT, load_results_file(datafilename))
 
 for trial in range(MAX_NUMBER_OF_TRIALS):
-    if len(DATA[str(number_of_qubits)][str(number_of_layers)]) == trial:
-        DATA[str(number_of_qubits)][str(number_of_layers)].append({})
     SEED = 1234 + (number_of_layers * 17) + (trial * 23) + (abs(hash(PROJECT)) % 10000)
     np.random.seed(SEED)
 
@@ -52,14 +45,19 @@ for trial in range(MAX_NUMBER_OF_TRIALS):
     ).number_of_params
 
     #### Unpruned Optimization
-    if not DATA[str(number_of_qubits)][str(number_of_layers)][trial].get(
-        "unpruned", False
+    if not store.has(
+        RESULTS_PROJECT,
+        number_of_qubits,
+        number_of_layers,
+        trial,
+        "unpruned",
     ):
-        samples = np.random.normal(
-            loc=DISTRIBUTION_MEAN, scale=DISTRIBUTION_STDEV, size=100000000
+        target_distribution = get_target_distribution(
+            DISTRIBUTION_TYPE,
+            number_of_qubits,
+            loc=DISTRIBUTION_MEAN,
+            scale=DISTRIBUTION_STDEV,
         )
-        target_distribution = np.histogram(samples, 2 ** number_of_qubits, (0, 1))[0]
-        target_distribution = target_distribution / sum(target_distribution)
         initial_parameters = np.random.uniform(
             (-1 * PARAMETER_PERIOD) / 2, (PARAMETER_PERIOD) / 2, number_of_parameters
         )
@@ -69,6 +67,8 @@ for trial in range(MAX_NUMBER_OF_TRIALS):
             number_of_layers,
             [],
             use_wandb=USE_WANDB,
+            use_native_simulator=USE_NATIVE_SIMULATOR,
+            use_analytic_gradient=USE_ANALYTIC_GRADIENT,
             weight_decay=WEIGHT_DECAY,
             parameter_period=PARAMETER_PERIOD,
         )
@@ -101,32 +101,27 @@ for trial in range(MAX_NUMBER_OF_TRIALS):
             project=PROJECT,
             optimizer_options=lbfgsb_options,
         )
-        DATA[str(number_of_qubits)][str(number_of_layers)][trial]["unpruned"] = {
-            "initial_parameters": initial_parameters.tolist(),
-            "target_distribution": target_distribution.tolist(),
-            "seed": SEED,
-            "energy": unpruned_results.opt_value,
-            "optimal_parameters": unpruned_results.opt_params.tolist(),
-        }
-        with open(datafilename, "w") as f:
-            f.write(json.dumps(DATA))
-        f.close()
+        store.put(
+            RESULTS_PROJECT,
+            number_of_qubits,
+            number_of_layers,
+            trial,
+            "unpruned",
+            {
+                "initial_parameters": initial_parameters.tolist(),
+                "target_distribution": target_distribution.tolist(),
+                "seed": SEED,
+                "energy": unpruned_results.opt_value,
+                "optimal_parameters": unpruned_results.opt_params.tolist(),
+            },
+        )
 
-    initial_parameters = np.asarray(
-        DATA[str(number_of_qubits)][str(number_of_layers)][trial]["unpruned"][
-            "initial_parameters"
-        ]
-    )
-    target_distribution = np.asarray(
-        DATA[str(number_of_qubits)][str(number_of_layers)][trial]["unpruned"][
-            "target_distribution"
-        ]
-    )
-    unpruned_optimal_parameters = np.asarray(
-        DATA[str(number_of_qubits)][str(number_of_layers)][trial]["unpruned"][
-            "optimal_parameters"
-        ]
+    unpruned_data = store.get(
+        RESULTS_PROJECT, number_of_qubits, number_of_layers, trial, "unpruned"
     )
+    initial_parameters = np.asarray(unpruned_data["initial_parameters"])
+    target_distribution = np.asarray(unpruned_data["target_distribution"])
+    unpruned_optimal_parameters = np.asarray(unpruned_data["optimal_parameters"])
     pruned_parameter_indices = get_parameter_indices_to_be_pruned_using_percentage(
         unpruned_optimal_parameters,
         PRUNING_PERCENTAGE,
@@ -136,14 +131,20 @@ for trial in range(MAX_NUMBER_OF_TRIALS):
         initial_parameters, pruned_parameter_indices
     )
 
-    if not DATA[str(number_of_qubits)][str(number_of_layers)][trial].get(
-        "pruned:{}".format(PRUNING_PERCENTAGE), False
+    if not store.has(
+        RESULTS_PROJECT,
+        number_of_qubits,
+        number_of_layers,
+        trial,
+        "pruned:{}".format(PRUNING_PERCENTAGE),
     ):
         pruned_cost_function = get_pruned_qcbm_cost_function(
             target_distribution,
             number_of_layers,
             pruned_parameter_indices,
             use_wandb=USE_WANDB,
+            use_native_simulator=USE_NATIVE_SIMULATOR,
+            use_analytic_gradient=USE_ANALYTIC_GRADIENT,
             weight_decay=WEIGHT_DECAY,
             parameter_period=PARAMETER_PERIOD,
         )
@@ -176,18 +177,20 @@ for trial in range(MAX_NUMBER_OF_TRIALS):
             project=PROJECT,
             optimizer_options=lbfgsb_options,
         )
-        DATA[str(number_of_qubits)][str(number_of_layers)][trial][
-            "pruned:{}".format(PRUNING_PERCENTAGE)
-        ] = {
-            "initial_parameters": pruned_initial_parameters.tolist(),
-            "seed": SEED,
-            "energy": pruned_results.opt_value,
-            "pruned_indices": pruned_parameter_indices,
-            "optimal_parameters": pruned_results.opt_params.tolist(),
-        }
-        with open(datafilename, "w") as f:
-            f.write(json.dumps(DATA))
-        f.close()
+        store.put(
+            RESULTS_PROJECT,
+            number_of_qubits,
+            number_of_layers,
+            trial,
+            "pruned:{}".format(PRUNING_PERCENTAGE),
+            {
+                "initial_parameters": pruned_initial_parameters.tolist(),
+                "seed": SEED,
+                "energy": pruned_results.opt_value,
+                "pruned_indices": pruned_parameter_indices,
+                "optimal_parameters": pruned_results.opt_params.tolist(),
+            },
+        )
 
     for PARAMETER_DISPLACEMENT in [
         # (1 / 1024) * PARAMETER_PERIOD,
@@ -199,17 +202,22 @@ for trial in range(MAX_NUMBER_OF_TRIALS):
         (1 / 8) * PARAMETER_PERIOD,
         (1 / 2) * PARAMETER_PERIOD,
     ]:
-        if not DATA[str(number_of_qubits)][str(number_of_layers)][trial].get(
+        if not store.has(
+            RESULTS_PROJECT,
+            number_of_qubits,
+            number_of_layers,
+            trial,
             "pruned_with_displacement:{}|{}".format(
                 PRUNING_PERCENTAGE, PARAMETER_DISPLACEMENT
             ),
-            False,
         ):
             pruned_cost_function = get_pruned_qcbm_cost_function(
                 target_distribution,
                 number_of_layers,
                 pruned_parameter_indices,
                 use_wandb=USE_WANDB,
+                use_native_simulator=USE_NATIVE_SIMULATOR,
+                use_analytic_gradient=USE_ANALYTIC_GRADIENT,
                 weight_decay=WEIGHT_DECAY,
                 parameter_period=PARAMETER_PERIOD,
             )
@@ -250,29 +258,37 @@ for trial in range(MAX_NUMBER_OF_TRIALS):
                 project=PROJECT,
                 optimizer_options=lbfgsb_options,
             )
-            DATA[str(number_of_qubits)][str(number_of_layers)][trial][
+            store.put(
+                RESULTS_PROJECT,
+                number_of_qubits,
+                number_of_layers,
+                trial,
                 "pruned_with_displacement:{}|{}".format(
                     PRUNING_PERCENTAGE, PARAMETER_DISPLACEMENT
-                )
-            ] = {
-                "initial_parameters": pruned_and_displaced_initial_parameters.tolist(),
-                "seed": SEED,
-                "energy": pruned_results.opt_value,
-                "pruned_indices": pruned_parameter_indices,
-                "optimal_parameters": pruned_results.opt_params.tolist(),
-            }
-            with open(datafilename, "w") as f:
-                f.write(json.dumps(DATA))
-            f.close()
+                ),
+                {
+                    "initial_parameters": pruned_and_displaced_initial_parameters.tolist(),
+                    "seed": SEED,
+                    "energy": pruned_results.opt_value,
+                    "pruned_indices": pruned_parameter_indices,
+                    "optimal_parameters": pruned_results.opt_params.tolist(),
+                },
+            )
 
-    if not DATA[str(number_of_qubits)][str(number_of_layers)][trial].get(
-        "pruned_and_randomized:{}".format(PRUNING_PERCENTAGE), False
+    if not store.has(
+        RESULTS_PROJECT,
+        number_of_qubits,
+        number_of_layers,
+        trial,
+        "pruned_and_randomized:{}".format(PRUNING_PERCENTAGE),
     ):
         pruned_cost_function = get_pruned_qcbm_cost_function(
             target_distribution,
             number_of_layers,
             pruned_parameter_indices,
             use_wandb=USE_WANDB,
+            use_native_simulator=USE_NATIVE_SIMULATOR,
+            use_analytic_gradient=USE_ANALYTIC_GRADIENT,
             weight_decay=WEIGHT_DECAY,
             parameter_period=PARAMETER_PERIOD,
         )
@@ -310,21 +326,27 @@ for trial in range(MAX_NUMBER_OF_TRIALS):
             project=PROJECT,
             optimizer_options=lbfgsb_options,
         )
-        DATA[str(number_of_qubits)][str(number_of_layers)][trial][
-            "pruned_and_randomized:{}".format(PRUNING_PERCENTAGE)
-        ] = {
-            "initial_parameters": random_initial_parameters.tolist(),
-            "seed": SEED,
-            "energy": pruned_and_randomized_results.opt_value,
-            "pruned_indices": pruned_parameter_indices,
-            "optimal_parameters": pruned_and_randomized_results.opt_params.tolist(),
-        }
-        with open(datafilename, "w") as f:
-            f.write(json.dumps(DATA))
-        f.close()
+        store.put(
+            RESULTS_PROJECT,
+            number_of_qubits,
+            number_of_layers,
+            trial,
+            "pruned_and_randomized:{}".format(PRUNING_PERCENTAGE),
+            {
+                "initial_parameters": random_initial_parameters.tolist(),
+                "seed": SEED,
+                "energy": pruned_and_randomized_results.opt_value,
+                "pruned_indices": pruned_parameter_indices,
+                "optimal_parameters": pruned_and_randomized_results.opt_params.tolist(),
+            },
+        )
 
-    if not DATA[str(number_of_qubits)][str(number_of_layers)][trial].get(
-        "random_subnetwork:{}".format(PRUNING_PERCENTAGE), False
+    if not store.has(
+        RESULTS_PROJECT,
+        number_of_qubits,
+        number_of_layers,
+        trial,
+        "random_subnetwork:{}".format(PRUNING_PERCENTAGE),
     ):
         randomly_pruned_indices = [
             int(index)
@@ -346,6 +368,8 @@ for trial in range(MAX_NUMBER_OF_TRIALS):
             number_of_layers,
             randomly_pruned_indices,
             use_wandb=USE_WANDB,
+            use_native_simulator=USE_NATIVE_SIMULATOR,
+            use_analytic_gradient=USE_ANALYTIC_GRADIENT,
             weight_decay=WEIGHT_DECAY,
             parameter_period=PARAMETER_PERIOD,
         )
@@ -378,25 +402,35 @@ for trial in range(MAX_NUMBER_OF_TRIALS):
             project=PROJECT,
             optimizer_options=lbfgsb_options,
         )
-        DATA[str(number_of_qubits)][str(number_of_layers)][trial][
-            "random_subnetwork:{}".format(PRUNING_PERCENTAGE)
-        ] = {
-            "initial_parameters": randomly_pruned_initial_parameters.tolist(),
-            "seed": SEED,
-            "energy": random_subnetwork_results.opt_value,
-            "pruned_indices": randomly_pruned_indices,
-            "optimal_parameters": random_subnetwork_results.opt_params.tolist(),
-        }
-        with open(datafilename, "w") as f:
-            f.write(json.dumps(DATA))
-        f.close()
+        store.put(
+            RESULTS_PROJECT,
+            number_of_qubits,
+            number_of_layers,
+            trial,
+            "random_subnetwork:{}".format(PRUNING_PERCENTAGE),
+            {
+                "initial_parameters": randomly_pruned_initial_parameters.tolist(),
+                "seed": SEED,
+                "energy": random_subnetwork_results.opt_value,
+                "pruned_indices": randomly_pruned_indices,
+                "optimal_parameters": random_subnetwork_results.opt_params.tolist(),
+            },
+        )
 
-    randomly_pruned_indices = DATA[str(number_of_qubits)][str(number_of_layers)][trial][
-        "random_subnetwork:{}".format(PRUNING_PERCENTAGE)
-    ]["pruned_indices"]
+    randomly_pruned_indices = store.get(
+        RESULTS_PROJECT,
+        number_of_qubits,
+        number_of_layers,
+        trial,
+        "random_subnetwork:{}".format(PRUNING_PERCENTAGE),
+    )["pruned_indices"]
 
-    if not DATA[str(number_of_qubits)][str(number_of_layers)][trial].get(
-        "random_subnetwork_randomized_parameters:{}".format(PRUNING_PERCENTAGE), False
+    if not store.has(
+        RESULTS_PROJECT,
+        number_of_qubits,
+        number_of_layers,
+        trial,
+        "random_subnetwork_randomized_parameters:{}".format(PRUNING_PERCENTAGE),
     ):
         random_initial_parameters = np.random.uniform(
             (-PARAMETER_PERIOD) / 2,
@@ -409,6 +443,8 @@ for trial in range(MAX_NUMBER_OF_TRIALS):
             number_of_layers,
             randomly_pruned_indices,
             use_wandb=USE_WANDB,
+            use_native_simulator=USE_NATIVE_SIMULATOR,
+            use_analytic_gradient=USE_ANALYTIC_GRADIENT,
             weight_decay=WEIGHT_DECAY,
             parameter_period=PARAMETER_PERIOD,
         )
@@ -443,15 +479,19 @@ for trial in range(MAX_NUMBER_OF_TRIALS):
                 optimizer_options=lbfgsb_options,
             )
         )
-        DATA[str(number_of_qubits)][str(number_of_layers)][trial][
-            "random_subnetwork_randomized_parameters:{}".format(PRUNING_PERCENTAGE)
-        ] = {
-            "initial_parameters": random_initial_parameters.tolist(),
-            "seed": SEED,
-            "energy": random_subnetwork_randomized_parameters_results.opt_value,
-            "pruned_indices": randomly_pruned_indices,
-            "optimal_parameters": random_subnetwork_randomized_parameters_results.opt_params.tolist(),
-        }
-        with open(datafilename, "w") as f:
-            f.write(json.dumps(DATA))
-        f.close()
+        store.put(
+            RESULTS_PROJECT,
+            number_of_qubits,
+            number_of_layers,
+            trial,
+            "random_subnetwork_randomized_parameters:{}".format(PRUNING_PERCENTAGE),
+            {
+                "initial_parameters": random_initial_parameters.tolist(),
+                "seed": SEED,
+                "energy": random_subnetwork_randomized_parameters_results.opt_value,
+                "pruned_indices": randomly_pruned_indices,
+                "optimal_parameters": random_subnetwork_randomized_parameters_results.opt_params.tolist(),
+            },
+        )
+
+write_results(datafilename, store.export_trials(RESULTS_PROJECT))
@@ -14,6 +14,7 @@ PROJECT = "QLT-PoC-v" + VERSION
 PRUNING_CUTOFF = 1e-2
 PARAMETER_PERIOD = 4 * np.pi
 USE_WANDB = False
+USE_ANALYTIC_GRADIENT = False
 LAYER_RANGE = range(1, 2, 1)
 TRIAL_RANGE = range(0, 30, 1)
 if USE_WANDB:
@@ -51,6 +52,7 @@ for number_of_layers in LAYER_RANGE:
             first_trivial_parameters,
             second_trivial_parameters,
             use_wandb=USE_WANDB,
+            use_analytic_gradient=USE_ANALYTIC_GRADIENT,
         )
         unpruned_results = optimize_cost_function_with_lbfgsb(
             initial_parameters,
@@ -77,7 +79,11 @@ for number_of_layers in LAYER_RANGE:
             initial_parameters, pruned_parameter_indices
         )
         pruned_cost_function = get_pruned_cost_function(
-            target, number_of_layers, pruned_parameter_indices, use_wandb=USE_WANDB
+            target,
+            number_of_layers,
+            pruned_parameter_indices,
+            use_wandb=USE_WANDB,
+            use_analytic_gradient=USE_ANALYTIC_GRADIENT,
         )
 
         pruned_results = optimize_cost_function_with_lbfgsb(
@@ -101,7 +107,11 @@ for number_of_layers in LAYER_RANGE:
         )
 
         pruned_cost_function = get_pruned_cost_function(
-            target, number_of_layers, pruned_parameter_indices, use_wandb=USE_WANDB
+            target,
+            number_of_layers,
+            pruned_parameter_indices,
+            use_wandb=USE_WANDB,
+            use_analytic_gradient=USE_ANALYTIC_GRADIENT,
         )
         random_initial_parameters = np.random.uniform(
             -PARAMETER_PERIOD, PARAMETER_PERIOD, len(pruned_initial_parameters)
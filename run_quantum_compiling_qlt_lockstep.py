@@ -0,0 +1,109 @@
+# The trials of run_quantum_compiling_qlt.py, optimized together: for each number
+# of layers the unpruned, pruned and pruned and randomized L-BFGS-B optimizations
+# of all trials advance in lockstep, with the costs and gradients of every trial
+# evaluated in one vectorized call (see optimize.minimize_with_lbfgsb_in_lockstep).
+# Each trial takes the same steps as in run_quantum_compiling_qlt.py with
+# USE_ANALYTIC_GRADIENT, but nothing is logged to wandb. The results are written
+# to data/qlt/quantum_compiling/L-BFGS-B/<PROJECT>.json in the layout of the
+# other QLT scripts, with the Frobenius norm under "energy".
+import numpy as np
+from quantum_compiling.cost_function import get_batch_cost_and_gradient_function
+from quantum_compiling.unitaries import get_target_unitary
+from prune import get_parameter_indices_to_be_pruned, get_pruned_parameters
+from optimize import minimize_with_lbfgsb_in_lockstep
+from result_store import load_results_file
+from array_store import write_results
+import time
+
+VERSION = "0.2"
+PROJECT = "QLT-PoC-v" + VERSION
+PRUNING_CUTOFF = 1e-2
+PARAMETER_PERIOD = 4 * np.pi
+LAYER_RANGE = range(1, 2, 1)
+TRIAL_RANGE = range(0, 30, 1)
+NUMBER_OF_QUBITS = 2
+lbfgsb_options = {"ftol": 1e-6}
+
+datafilename = "data/qlt/quantum_compiling/{}/{}.json".format("L-BFGS-B", PROJECT)
+data = load_results_file(datafilename)
+
+for number_of_layers in LAYER_RANGE:
+    start_time = time.time()
+    # One random stream per trial, drawn in the same order as the sequential
+    # script draws from the seeded global stream
+    seeds = [1234 + (number_of_layers * 17) + (trial * 23) for trial in TRIAL_RANGE]
+    random_states = [np.random.RandomState(seed) for seed in seeds]
+    target_parameters = [
+        random_state.uniform(0, PARAMETER_PERIOD, 2) for random_state in random_states
+    ]
+    targets = [get_target_unitary(parameters) for parameters in target_parameters]
+    initial_parameters = [
+        random_state.uniform(-PARAMETER_PERIOD, PARAMETER_PERIOD, 11 * number_of_layers)
+        for random_state in random_states
+    ]
+
+    unpruned_results = minimize_with_lbfgsb_in_lockstep(
+        get_batch_cost_and_gradient_function(targets, number_of_layers),
+        initial_parameters,
+        optimizer_options=lbfgsb_options,
+    )
+
+    pruned_parameter_indices = [
+        get_parameter_indices_to_be_pruned(
+            results.opt_params, PRUNING_CUTOFF, PARAMETER_PERIOD
+        )
+        for results in unpruned_results
+    ]
+    pruned_initial_parameters = [
+        get_pruned_parameters(parameters, indices)
+        for parameters, indices in zip(initial_parameters, pruned_parameter_indices)
+    ]
+    pruned_cost_and_gradient = get_batch_cost_and_gradient_function(
+        targets, number_of_layers, pruned_parameter_indices
+    )
+    pruned_results = minimize_with_lbfgsb_in_lockstep(
+        pruned_cost_and_gradient,
+        pruned_initial_parameters,
+        optimizer_options=lbfgsb_options,
+    )
+
+    random_initial_parameters = [
+        random_state.uniform(-PARAMETER_PERIOD, PARAMETER_PERIOD, len(parameters))
+        for random_state, parameters in zip(random_states, pruned_initial_parameters)
+    ]
+    pruned_and_randomized_results = minimize_with_lbfgsb_in_lockstep(
+        pruned_cost_and_gradient,
+        random_initial_parameters,
+        optimizer_options=lbfgsb_options,
+    )
+
+    data.setdefault(str(NUMBER_OF_QUBITS), {})[str(number_of_layers)] = [
+        {
+            "unpruned": {
+                "initial_parameters": initial_parameters[trial],
+                "target_parameters": target_parameters[trial].tolist(),
+                "seed": seeds[trial],
+                "energy": unpruned_results[trial].opt_value,
+                "optimal_parameters": unpruned_results[trial].opt_params,
+            },
+            "pruned": {
+                "initial_parameters": pruned_initial_parameters[trial],
+                "energy": pruned_results[trial].opt_value,
+                "pruned_indices": pruned_parameter_indices[trial],
+                "optimal_parameters": pruned_results[trial].opt_params,
+            },
+            "pruned_and_randomized": {
+                "initial_parameters": random_initial_parameters[trial],
+                "energy": pruned_and_randomized_results[trial].opt_value,
+                "pruned_indices": pruned_parameter_indices[trial],
+                "optimal_parameters": pruned_and_randomized_results[trial].opt_params,
+            },
+        }
+        for trial in range(len(seeds))
+    ]
+    write_results(datafilename, data)
+    print(
+        "{} layers: {} trials in {:.1f}s".format(
+            number_of_layers, len(seeds), time.time() - start_time
+        )
+    )
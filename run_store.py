@@ -0,0 +1,235 @@
+import json
+import numbers
+import os
+import threading
+import uuid
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+DEFAULT_DIRECTORY = "data/runs"
+ROWS_PER_PART = 10000
+
+_active_run = None
+
+
+class Run:
+    """Local copy of what a wandb run records.
+
+    A run lives in directory/project/run=<name>/, with its config in
+    config.json and its log entries in numbered Parquet parts, one per
+    ROWS_PER_PART entries, so that each part is written once and never
+    rewritten. summary.json is written when the run finishes."""
+
+    def __init__(self, project, config=None, directory=DEFAULT_DIRECTORY, name=None):
+        if pyarrow is None:
+            raise ImportError("The run store needs pyarrow (pip install pyarrow)")
+        self.project = project
+        self.name = name if name is not None else uuid.uuid4().hex[:8]
+        self.path = get_run_path(project, self.name, directory)
+        self.number_of_steps = 0
+        self._rows = []
+        self._lock = threading.Lock()
+        os.makedirs(self.path, exist_ok=True)
+        write_config(self.path, config or {})
+
+    def log(self, log_dict):
+        with self._lock:
+            self._rows.append(get_row(log_dict, self.number_of_steps))
+            self.number_of_steps += 1
+            if len(self._rows) == ROWS_PER_PART:
+                self._write_part()
+
+    def finish(self):
+        global _active_run
+        with self._lock:
+            self._write_part()
+            write_summary(self.path, {"number_of_steps": self.number_of_steps})
+        if _active_run is self:
+            _active_run = None
+
+    def _write_part(self):
+        if self._rows:
+            write_part(self.path, self._rows)
+            self._rows = []
+
+
+class RunStoreBackend:
+    """metrics backend writing to the active run, if any"""
+
+    def write(self, log_dicts):
+        if _active_run is not None:
+            for log_dict in log_dicts:
+                _active_run.log(log_dict)
+
+    def close(self):
+        pass
+
+
+def init(project, config=None, directory=DEFAULT_DIRECTORY, name=None):
+    """Start a run that `log` writes to, like wandb.init"""
+    global _active_run
+    _active_run = Run(project, config=config, directory=directory, name=name)
+    return _active_run
+
+
+def log(log_dict):
+    assert _active_run is not None, "run_store.init must be called before logging"
+    _active_run.log(log_dict)
+
+
+def get_run_path(project, name, directory=DEFAULT_DIRECTORY):
+    return os.path.join(directory, project, "run={}".format(name))
+
+
+def get_row(log_dict, step):
+    """Stored form of a log entry"""
+    return {
+        **{key: _to_column_value(value) for key, value in log_dict.items()},
+        "Step": step,
+    }
+
+
+def write_part(run_path, rows):
+    """Write rows from get_row as the run's next Parquet part"""
+    # Entries may log different keys, e.g. only the L-BFGS-B callback logs
+    # "Iteration", and missing values become nulls
+    keys = list(dict.fromkeys(key for row in rows for key in row))
+    table = pyarrow.table({key: [row.get(key) for row in rows] for key in keys})
+    part_path = os.path.join(
+        run_path, "part-{:05d}.parquet".format(len(get_part_paths(run_path)))
+    )
+    pyarrow.parquet.write_table(table, part_path + ".tmp")
+    os.replace(part_path + ".tmp", part_path)
+
+
+def write_config(run_path, config):
+    write_json(os.path.join(run_path, "config.json"), config)
+
+
+def write_summary(run_path, summary):
+    write_json(os.path.join(run_path, "summary.json"), summary)
+
+
+def load_summary(project, name, directory=DEFAULT_DIRECTORY):
+    summary_path = os.path.join(get_run_path(project, name, directory), "summary.json")
+    if not os.path.exists(summary_path):
+        return None
+    with open(summary_path) as f:
+        return json.load(f)
+
+
+def get_run_names(project, directory=DEFAULT_DIRECTORY):
+    project_path = os.path.join(directory, project)
+    if not os.path.isdir(project_path):
+        return []
+    return sorted(
+        entry[len("run=") :]
+        for entry in os.listdir(project_path)
+        if entry.startswith("run=")
+    )
+
+
+def load_config(project, name, directory=DEFAULT_DIRECTORY):
+    with open(os.path.join(get_run_path(project, name, directory), "config.json")) as f:
+        return json.load(f)
+
+
+def load_configs(project, directory=DEFAULT_DIRECTORY):
+    """One row per run with its full config, including the values too large to be
+    columns of load_project such as initial_parameters. The run name is in the
+    "Name" column."""
+    return pd.DataFrame(
+        [
+            {
+                **load_config(project, name, directory),
+                "Name": _get_display_name(project, name, directory),
+            }
+            for name in get_run_names(project, directory)
+        ]
+    )
+
+
+def load_run(project, name, directory=DEFAULT_DIRECTORY, columns=None):
+    """Log entries of one run in step order. Keys that were not logged at a step
+    are NaN."""
+    if pyarrow is None:
+        raise ImportError("The run store needs pyarrow (pip install pyarrow)")
+    frames = []
+    for part_path in get_part_paths(get_run_path(project, name, directory)):
+        part_columns = None
+        if columns is not None:
+            schema_names = pyarrow.parquet.read_schema(part_path).names
+            part_columns = [
+                column for column in ["Step", *columns] if column in schema_names
+            ]
+        frames.append(
+            pyarrow.parquet.read_table(part_path, columns=part_columns).to_pandas()
+        )
+    if not frames:
+        return pd.DataFrame({"Step": []})
+    return pd.concat(frames, ignore_index=True)
+
+
+def load_project(project, directory=DEFAULT_DIRECTORY, columns=None):
+    """Every logged step of every run in the project, with the run's scalar
+    config values as columns and its name in "Name", like the CSVs produced by
+    plotting/download_wandb.py. columns restricts the logged keys read."""
+    frames = []
+    for name in get_run_names(project, directory):
+        run_frame = load_run(project, name, directory, columns)
+        config = {
+            key: value
+            for key, value in load_config(project, name, directory).items()
+            if not isinstance(value, (list, dict))
+        }
+        for key, value in config.items():
+            if key not in run_frame:
+                run_frame[key] = value
+        run_frame["Name"] = _get_display_name(project, name, directory)
+        frames.append(run_frame)
+    if not frames:
+        return pd.DataFrame({"Name": [], "Step": []})
+    return pd.concat(frames, ignore_index=True)
+
+
+def get_part_paths(run_path):
+    return sorted(
+        os.path.join(run_path, entry)
+        for entry in os.listdir(run_path)
+        if entry.startswith("part-") and entry.endswith(".parquet")
+    )
+
+
+def _get_display_name(project, name, directory):
+    """Runs downloaded from wandb are stored under their id and keep their wandb
+    name in the summary"""
+    summary = load_summary(project, name, directory)
+    return summary.get("name", name) if summary is not None else name
+
+
+def _to_column_value(value):
+    """Numbers are stored as floats so that every part of a column has one type,
+    and anything that is not a number or a string as JSON"""
+    if value is None or isinstance(value, str):
+        return value
+    if isinstance(value, (numbers.Real, np.bool_)):
+        return float(value)
+    return json.dumps(value, default=_to_json)
+
+
+def _to_json(value):
+    if isinstance(value, (np.generic, np.ndarray)):
+        return value.tolist()
+    raise TypeError("{} is not JSON serializable".format(type(value)))
+
+
+def write_json(path, data):
+    with open(path + ".tmp", "w") as f:
+        json.dump(data, f, default=_to_json)
+    os.replace(path + ".tmp", path)
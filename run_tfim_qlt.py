@@ -4,7 +4,7 @@ from vqe.cost_function import get_vqe_cost_function
 from vqe.hamiltonians import generate_tfim_hamiltonian
 from vqe.circuits import generate_overparameterized_vqe_tfim_circuit
 import wandb
-from openfermion.linalg import eigenspectrum
+from vqe.ground_state import get_ground_state_energy
 import sympy
 import numpy as np
 
@@ -26,7 +26,9 @@ for number_of_qubits in QUBIT_RANGE:
     hamiltonian = generate_tfim_hamiltonian(
         number_of_qubits, boundary_conditions=BOUNDARY_CONDITIONS
     )
-    ground_state_energy = eigenspectrum(hamiltonian)[0]
+    ground_state_energy = get_ground_state_energy(
+        "tfim", number_of_qubits, boundary_conditions=BOUNDARY_CONDITIONS
+    )
     for number_of_layers in LAYER_RANGE:
         print("-----------Working on {} Layers".format(number_of_layers))
         number_of_parameters = 2 * number_of_layers
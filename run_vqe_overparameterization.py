@@ -9,11 +9,13 @@ from optimize import (
     optimize_cost_function_with_lbfgsb,
     optimize_cost_function_with_cmaes,
 )
-from openfermion.linalg import eigenspectrum
+from vqe.ground_state import get_ground_state_energy
 import sympy
 import numpy as np
-import json
 import sys
+import os
+from result_store import ResultStore, load_results_file
+from array_store import write_results
 
 RECORD_DATA = True
 TRIAL_RANGE = range(10)
@@ -26,32 +28,28 @@ OPTIMIZER = "L-BFGS-B"
 datafilename = "data/overparameterization/overparameterization_{}-J2={}.json".format(
     CIRCUIT_TYPE, J2
 )
-try:
-    with open(datafilename, "r") as f:
-        DATA = json.loads(f.read())
-    f.close()
-except:
-    DATA = {}
-    with open(datafilename, "w") as f:
-        f.write(json.dumps(DATA))
-    f.close()
+RESULTS_PROJECT = os.path.splitext(os.path.basename(datafilename))[0]
+STAGE = "overparameterization"
+store = ResultStore()
+if store.count(RESULTS_PROJECT) == 0:
+    store.import_overparameterization(
+        RESULTS_PROJECT, load_results_file(datafilename), STAGE
+    )
 
 number_of_qubits = int(sys.argv[1])
 number_of_layers = int(sys.argv[2])
 
 ##### GENERATE HAMILTONIAN #####
-qubit_data = DATA.get(str(number_of_qubits), {})
-DATA[str(number_of_qubits)] = qubit_data
-
 if CIRCUIT_TYPE == "tfim":
     hamiltonian = generate_tfim_hamiltonian(
         number_of_qubits, boundary_conditions=BOUNDARY_CONDITIONS
     )
+    ground_state_energy = get_ground_state_energy(
+        "tfim", number_of_qubits, boundary_conditions=BOUNDARY_CONDITIONS
+    )
 elif (CIRCUIT_TYPE == "j1j2") or (CIRCUIT_TYPE == "j1j2_alternating-ansatz"):
     hamiltonian = generate_j1j2_hamiltonian(number_of_qubits, J2, j1=1)
-
-ground_state_energy = eigenspectrum(hamiltonian)[0]
-DATA[str(number_of_qubits)]["ground_state_energy"] = ground_state_energy
+    ground_state_energy = get_ground_state_energy("j1j2", number_of_qubits, j2=J2)
 
 
 ##### GENERATE PARAMETERIZED QUANTUM CIRCUIT #####
@@ -86,17 +84,19 @@ elif CIRCUIT_TYPE == "j1j2_alternating-ansatz":
 assert number_of_parameters == len(parameterized_quantum_circuit.free_symbols)
 
 
-energies = DATA[str(number_of_qubits)].get(str(number_of_layers), [])
+trials_to_run = [
+    trial
+    for trial in TRIAL_RANGE
+    if not store.has(RESULTS_PROJECT, number_of_qubits, number_of_layers, trial, STAGE)
+]
 print("------Running {} Qubits".format(number_of_qubits))
 print("-----------Working on {} Layers".format(number_of_layers))
-print(
-    "---------------Need to run {} more trials".format(len(TRIAL_RANGE) - len(energies))
-)
+print("---------------Need to run {} more trials".format(len(trials_to_run)))
 
 
 ##### RUN TRIALS #####
 for trial in TRIAL_RANGE:
-    if trial >= len(energies):
+    if trial in trials_to_run:
         seed = (number_of_qubits * 123) + (number_of_layers * 97) + trial
         vqe_cost_function = get_vqe_cost_function(
             hamiltonian,
@@ -131,11 +131,24 @@ for trial in TRIAL_RANGE:
                 },
             )
 
-        energies.append(results.opt_value)
-
-        DATA[str(number_of_qubits)][str(number_of_layers)] = energies
-
         if RECORD_DATA:
-            with open(datafilename, "w") as f:
-                f.write(json.dumps(DATA))
-            f.close()
+            store.put(
+                RESULTS_PROJECT,
+                number_of_qubits,
+                number_of_layers,
+                trial,
+                STAGE,
+                {
+                    "energy": results.opt_value,
+                    "optimal_parameters": results.opt_params.tolist(),
+                    "ground_state_energy": ground_state_energy,
+                },
+            )
+
+if RECORD_DATA:
+    write_results(
+        datafilename,
+        store.export_overparameterization(
+            RESULTS_PROJECT, STAGE, include_parameters=False
+        ),
+    )
@@ -0,0 +1,122 @@
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+import numpy as np
+
+
+def expand_tasks(qubit_range, layer_range, trial_range, stages):
+    """{task: dependencies} of an experiment, where every task is
+    (number_of_qubits, number_of_layers, trial, stage). stages maps each stage to
+    the stages of the same trial it waits for, e.g.
+    {"unpruned": [], "pruned:0.9": ["unpruned"]}."""
+    tasks = {}
+    for number_of_qubits in qubit_range:
+        for number_of_layers in layer_range:
+            for trial in trial_range:
+                for stage, dependencies in stages.items():
+                    assert all(dependency in stages for dependency in dependencies)
+                    tasks[(number_of_qubits, number_of_layers, trial, stage)] = [
+                        (number_of_qubits, number_of_layers, trial, dependency)
+                        for dependency in dependencies
+                    ]
+    return tasks
+
+
+def run_tasks(tasks, run_task, number_of_processes=None):
+    """Call run_task(task) for every task of tasks ({task: dependencies}, see
+    expand_tasks), each once all of its dependencies have returned. Tasks run on
+    a pool of number_of_processes processes, by default one per allocated core
+    (see get_number_of_allocated_cores), in the order of tasks as far as the
+    dependencies allow. Tasks should hand results to the tasks depending on them
+    through the result store. The first exception raised by a task is raised
+    again once the running tasks have finished, and no further tasks are
+    started."""
+    if number_of_processes is None:
+        number_of_processes = get_number_of_allocated_cores()
+    waiting = {task: set(dependencies) for task, dependencies in tasks.items()}
+    assert all(dependencies <= waiting.keys() for dependencies in waiting.values())
+
+    def get_ready_tasks(finished_task=None):
+        ready = []
+        for task, dependencies in waiting.items():
+            dependencies.discard(finished_task)
+            if not dependencies:
+                ready.append(task)
+        for task in ready:
+            del waiting[task]
+        return ready
+
+    if number_of_processes == 1:
+        positions = {task: position for position, task in enumerate(tasks)}
+        ready = get_ready_tasks()
+        while ready:
+            task = ready.pop(0)
+            run_task(task)
+            ready = sorted(ready + get_ready_tasks(task), key=positions.get)
+    else:
+        # Fork explicitly: spawn and forkserver would re-run the calling script,
+        # as in optimize._minimize_with_batched_cmaes
+        with ProcessPoolExecutor(
+            number_of_processes, mp_context=multiprocessing.get_context("fork")
+        ) as pool:
+            running = {pool.submit(run_task, task): task for task in get_ready_tasks()}
+            error = None
+            while running:
+                finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    task = running.pop(future)
+                    if future.exception() is not None:
+                        error = error or future.exception()
+                    elif error is None:
+                        for ready_task in get_ready_tasks(task):
+                            running[pool.submit(run_task, ready_task)] = ready_task
+            if error is not None:
+                raise error
+    assert not waiting, "The dependencies of {} form a cycle".format(list(waiting))
+
+
+def get_number_of_allocated_cores():
+    """Cores allocated to the job: SLURM's cpus per task (#SBATCH -c) under
+    SLURM, and otherwise the cores this process may run on"""
+    if "SLURM_CPUS_PER_TASK" in os.environ:
+        return int(os.environ["SLURM_CPUS_PER_TASK"])
+    return len(os.sched_getaffinity(0))
+
+
+def get_trial_seed(number_of_qubits, number_of_layers, trial, entropy=None):
+    """Seed of a trial, e.g. for the simulator. Without entropy this is the
+    run scripts' SEED = 1234 + 17 L + 23 t, and otherwise it is drawn from the
+    trial's SeedSequence (see get_trial_seed_sequence)."""
+    if entropy is None:
+        return 1234 + (number_of_layers * 17) + (trial * 23)
+    return int(
+        get_trial_seed_sequence(
+            number_of_qubits, number_of_layers, trial, entropy
+        ).generate_state(1)[0]
+    )
+
+
+def get_trial_random_state(number_of_qubits, number_of_layers, trial, entropy=None):
+    """RandomState for the random draws of a trial. Without entropy it is seeded
+    with the trial's legacy seed, so it draws what np.random does in the run
+    scripts after np.random.seed(SEED). With entropy it runs on the trial's own
+    SeedSequence stream."""
+    if entropy is None:
+        return np.random.RandomState(
+            get_trial_seed(number_of_qubits, number_of_layers, trial)
+        )
+    return np.random.RandomState(
+        np.random.MT19937(
+            get_trial_seed_sequence(number_of_qubits, number_of_layers, trial, entropy)
+        )
+    )
+
+
+def get_trial_seed_sequence(number_of_qubits, number_of_layers, trial, entropy):
+    """The child of np.random.SeedSequence(entropy) spawned for the trial, keyed
+    by (number_of_qubits, number_of_layers, trial) rather than by the order in
+    which the trials are spawned, so it does not depend on which other trials
+    are run or when"""
+    return np.random.SeedSequence(
+        entropy, spawn_key=(number_of_qubits, number_of_layers, trial)
+    )
@@ -196,7 +196,11 @@ def _add_xx_yy_zz_gate(circuit, qubit1, qubit2, alpha, beta, gamma):
 
     Corresponds to: exp(i (alpha x@x + beta y@y + gamma z@z)) (Eq. 28) - lambda renamed to omega
 
-    period of parameters is 2*pi"""
+    period of parameters is 2*pi
+
+    Note: with cirq's rotation conventions the gates below implement
+    exp(i (alpha x@x + beta y@y + gamma z@z) / 2) up to a global phase.
+    vqe.simulator builds that matrix directly for the compiled circuit path."""
     theta = (np.pi / 2) - gamma
     phi = alpha - (np.pi / 2)
     omega = (np.pi / 2) - beta
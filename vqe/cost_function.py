@@ -1,9 +1,18 @@
-import wandb
 import numpy as np
 from zquantum.core.cost_function import get_ground_state_cost_function
 from zquantum.core.estimation import calculate_exact_expectation_values
 from qecirq.simulator import CirqSimulator
 from prune import get_padded_parameters
+from regularizer import calculate_weight_decay
+from metrics import MetricsAggregator
+from evaluation_cache import EvaluationCache
+from vqe.simulator import (
+    compile_circuit,
+    prune_circuit,
+    simulate,
+    calculate_energy_and_gradient,
+)
+from vqe.expectation import compile_hamiltonian, calculate_expectation_value
 
 
 def get_vqe_cost_function(
@@ -15,44 +24,66 @@ def get_vqe_cost_function(
     parameter_period=2 * np.pi,
     seed=123,
     use_wandb=False,
+    use_native_simulator=False,
+    use_analytic_gradient=False,
+    cache_size=128,
+    metrics_sink=None,
 ):
-    cost_function = get_ground_state_cost_function(
-        hamiltonian,
-        parameterized_quantum_circuit,
-        CirqSimulator(seed=seed),
-        estimation_method=calculate_exact_expectation_values,
-    )
-
-    min_energy = np.inf
-    min_cost = np.inf
-
-    def wrapped_cost_function(parameters, extra_wandb_logs=None):
-        nonlocal min_energy, min_cost
-        if extra_wandb_logs is None:
-            extra_wandb_logs = {}
-        parameters = get_padded_parameters(parameters, pruned_indices)
-        energy = cost_function(parameters)
+    """The last cache_size evaluations are kept, so re-evaluating a point (as the
+    L-BFGS-B logging callback does) is logged again without simulating. The
+    cache hit and miss counts are available from cost_function.cache.info().
+    Logs go to metrics_sink if given (see metrics.BufferedMetricsSink), and
+    cost_function.metrics.flush() writes out any that are still queued."""
+    assert use_native_simulator or not use_analytic_gradient
+    energy_function_kwargs = {
+        "hamiltonian": hamiltonian,
+        "parameterized_quantum_circuit": parameterized_quantum_circuit,
+        "pruned_indices": pruned_indices,
+        "seed": seed,
+        "use_native_simulator": use_native_simulator,
+    }
+    energy_function = get_vqe_energy_function(**energy_function_kwargs)
+    metrics = MetricsAggregator(use_wandb=use_wandb, sink=metrics_sink)
+    cache = EvaluationCache(maxsize=cache_size)
 
+    def get_parameter_weight_bias(parameters):
         # Add bias to drive parameters to zero-values
-        max_parameter_distances = np.asarray([np.pi for _ in parameters])
-        parameter_distances = np.asarray(
-            [
-                min(
-                    parameter % (parameter_period),
-                    np.abs((parameter % parameter_period) - parameter_period),
-                )
-                for parameter in parameters
-            ]
+        return calculate_weight_decay(
+            parameters, weight_decay, period=parameter_period, norm=2
         )
-        bias = weight_decay * (
-            sum(parameter_distances ** 2) / sum(max_parameter_distances ** 2)
+
+    def evaluate(parameters):
+        """Energy, bias and (with analytic gradients) cost gradient of the pruned
+        parameters, simulated only if they are not cached"""
+        entry = cache.get(parameters)
+        if entry is not None:
+            return entry
+
+        bias, bias_gradient = get_parameter_weight_bias(
+            get_padded_parameters(parameters, pruned_indices)
         )
+        entry = {"bias": bias, "gradient": None}
+        if use_analytic_gradient:
+            # scipy asks for the value and the gradient at every point, and one
+            # adjoint pass yields both
+            energy, energy_gradient = energy_function.energy_and_gradient(parameters)
+            entry["energy"] = energy
+            entry["gradient"] = energy_gradient + np.delete(
+                bias_gradient, pruned_indices
+            )
+        else:
+            entry["energy"] = energy_function(parameters)
+        cache.put(parameters, entry)
+        return entry
+
+    def record_evaluation(energy, bias, extra_wandb_logs=None):
+        if extra_wandb_logs is None:
+            extra_wandb_logs = {}
         cost = energy + bias
 
-        if use_wandb:
-            min_energy = min(min_energy, energy)
-            min_cost = min(min_cost, cost)
-            log_dict = {
+        def get_log_dict(minima):
+            min_energy, min_cost = minima["Energy"], minima["Cost"]
+            return {
                 **{
                     "Energy": energy,
                     "Minimum Energy": min_energy,
@@ -67,8 +98,166 @@ def get_vqe_cost_function(
                 },
                 **extra_wandb_logs,
             }
-            wandb.log(log_dict)
 
+        metrics.record(
+            {"Energy": energy, "Cost": cost},
+            get_log_dict,
+            force=bool(extra_wandb_logs),
+        )
         return cost
 
+    def wrapped_cost_function(parameters, extra_wandb_logs=None):
+        entry = evaluate(parameters)
+        return record_evaluation(entry["energy"], entry["bias"], extra_wandb_logs)
+
+    def record_batch(parameter_matrix, energies, extra_wandb_logs=None):
+        """Costs of every row of parameter_matrix given their energies, logged in
+        row order exactly as if the rows had been passed to the cost function one
+        at a time"""
+        biases, _ = get_parameter_weight_bias(
+            [
+                get_padded_parameters(parameters, pruned_indices)
+                for parameters in parameter_matrix
+            ]
+        )
+        return np.asarray(
+            [
+                record_evaluation(energy, bias, extra_wandb_logs)
+                for energy, bias in zip(energies, biases)
+            ]
+        )
+
+    def batch_cost(parameter_matrix, extra_wandb_logs=None):
+        energies = energy_function.batch(parameter_matrix)
+        return record_batch(parameter_matrix, energies, extra_wandb_logs)
+
+    def gradient(parameters):
+        return evaluate(parameters)["gradient"]
+
+    def batch_cost_and_gradient(parameter_matrix, extra_wandb_logs=None):
+        """Costs and cost gradients of every row of parameter_matrix from one
+        batched adjoint pass, logged like record_batch"""
+        parameter_matrix = np.asarray(parameter_matrix, dtype=float)
+        _, bias_gradients = get_parameter_weight_bias(
+            [
+                get_padded_parameters(parameters, pruned_indices)
+                for parameters in parameter_matrix
+            ]
+        )
+        energies, energy_gradients = energy_function.energy_and_gradient(
+            parameter_matrix
+        )
+        costs = record_batch(parameter_matrix, energies, extra_wandb_logs)
+        return costs, energy_gradients + np.delete(
+            bias_gradients, pruned_indices, axis=1
+        )
+
+    if use_analytic_gradient:
+        # zquantum's ScipyOptimizer passes this to scipy as the jacobian
+        wrapped_cost_function.gradient = gradient
+        wrapped_cost_function.batch_cost_and_gradient = batch_cost_and_gradient
+    wrapped_cost_function.batch_cost = batch_cost
+    wrapped_cost_function.record_batch = record_batch
+    wrapped_cost_function.cache = cache
+    wrapped_cost_function.metrics = metrics
+    # Picklable recipe for rebuilding the energy function in worker processes
+    wrapped_cost_function.spec = (get_vqe_energy_function, energy_function_kwargs)
+
     return wrapped_cost_function
+
+
+def get_vqe_energy_function(
+    hamiltonian,
+    parameterized_quantum_circuit,
+    pruned_indices=[],
+    seed=123,
+    use_native_simulator=False,
+):
+    """Energy of the pruned parameters, without the weight-decay bias or logging.
+    The returned function also has a `batch` method taking a matrix of parameter
+    vectors and, when using the native simulator, an `energy_and_gradient` method
+    (the gradient being with respect to the pruned parameters). The native
+    simulator compiles the pruned gates out of the circuit rather than padding the
+    parameters."""
+    if use_native_simulator:
+        return _get_native_energy_function(
+            hamiltonian, parameterized_quantum_circuit, pruned_indices
+        )
+
+    energy_function = get_ground_state_cost_function(
+        hamiltonian,
+        parameterized_quantum_circuit,
+        CirqSimulator(seed=seed),
+        estimation_method=calculate_exact_expectation_values,
+    )
+
+    def pruned_energy_function(parameters):
+        return energy_function(get_padded_parameters(parameters, pruned_indices))
+
+    def batch(parameter_matrix):
+        return np.asarray(
+            [pruned_energy_function(parameters) for parameters in parameter_matrix]
+        )
+
+    pruned_energy_function.batch = batch
+    return pruned_energy_function
+
+
+def get_vqe_cost_function_with_gradient(
+    hamiltonian,
+    parameterized_quantum_circuit,
+    pruned_indices=[],
+    weight_decay=0,
+    offset=0,
+    parameter_period=2 * np.pi,
+    use_wandb=False,
+):
+    """Native-simulator cost function with an adjoint-differentiated gradient"""
+    return get_vqe_cost_function(
+        hamiltonian,
+        parameterized_quantum_circuit,
+        pruned_indices=pruned_indices,
+        weight_decay=weight_decay,
+        offset=offset,
+        parameter_period=parameter_period,
+        use_wandb=use_wandb,
+        use_native_simulator=True,
+        use_analytic_gradient=True,
+    )
+
+
+def _get_native_energy_function(
+    hamiltonian, parameterized_quantum_circuit, pruned_indices=[]
+):
+    """Energy of the pruned parameters evaluated with the NumPy statevector engine
+    in vqe.simulator"""
+    compiled_circuit = prune_circuit(
+        compile_circuit(parameterized_quantum_circuit), pruned_indices
+    )
+    compiled_hamiltonian = compile_hamiltonian(
+        hamiltonian, compiled_circuit.number_of_qubits
+    )
+
+    # Keep each batch of statevectors to about 64MB
+    batch_size = max(1, 2 ** 22 // 2 ** compiled_circuit.number_of_qubits)
+
+    def energy_function(parameters):
+        state = simulate(compiled_circuit, parameters)
+        return calculate_expectation_value(compiled_hamiltonian, state)
+
+    def batch_energy_function(parameter_matrix):
+        return np.concatenate(
+            [
+                energy_function(parameter_matrix[start : start + batch_size])
+                for start in range(0, len(parameter_matrix), batch_size)
+            ]
+        )
+
+    def energy_and_gradient(parameters):
+        return calculate_energy_and_gradient(
+            compiled_circuit, compiled_hamiltonian, parameters
+        )
+
+    energy_function.energy_and_gradient = energy_and_gradient
+    energy_function.batch = batch_energy_function
+    return energy_function
@@ -0,0 +1,121 @@
+import numpy as np
+from scipy.sparse import csr_matrix
+
+
+class CompiledHamiltonian:
+    """Pauli sum stored as X/Z bitmasks for the NumPy statevector engine.
+
+    A Pauli string P maps the basis state |s> to i^ny (-1)^popcount(s & z) |s ^ x>
+    where x marks the qubits carrying X or Y, z the qubits carrying Z or Y and ny
+    is the number of Y factors. Each term is kept as (flip_mask, sign_mask,
+    coefficient) with i^ny folded into the coefficient. Bit number_of_qubits - 1 - i
+    of a mask corresponds to qubit i, matching the big-endian ordering of
+    vqe.simulator.
+
+    Terms sharing the same x mask share one index permutation, so their phase
+    arrays are summed before anything is stored and every diagonal term (x = 0,
+    e.g. all the ZZ terms) collapses into a single precomputed diagonal. The
+    permutations and phases are then packed into one sparse matrix so that H|psi>
+    is a single fused pass over the state."""
+
+    def __init__(
+        self, number_of_qubits, flip_masks, sign_masks, coefficients, diagonal, matrix
+    ):
+        self.number_of_qubits = number_of_qubits
+        self.flip_masks = flip_masks
+        self.sign_masks = sign_masks
+        self.coefficients = coefficients
+        self.diagonal = diagonal
+        self.matrix = matrix
+
+
+def compile_hamiltonian(hamiltonian, number_of_qubits, dtype=np.complex128):
+    """Compile an openfermion QubitOperator such as the ones returned by
+    vqe.hamiltonians. A real dtype can be used when the Hamiltonian is a real
+    matrix, which is the case when every coefficient is real."""
+    flip_masks, sign_masks, coefficients = get_pauli_masks(
+        hamiltonian, number_of_qubits
+    )
+
+    basis_states = np.arange(2 ** number_of_qubits)
+    rows, columns, values = [], [], []
+    diagonal = np.zeros(2 ** number_of_qubits)
+    for flip_mask in np.unique(flip_masks):
+        # Phase picked up by the amplitude that lands on |t>, i.e. from |t ^ x>
+        flipped_states = basis_states ^ flip_mask
+        phases = 0
+        for term_index in np.flatnonzero(flip_masks == flip_mask):
+            phases = phases + coefficients[term_index] * get_parity_signs(
+                flipped_states, sign_masks[term_index]
+            )
+        if flip_mask == 0:
+            diagonal = phases.real
+            nonzero_states = basis_states
+        else:
+            nonzero_states = np.flatnonzero(phases)
+        phases = phases[nonzero_states]
+        if np.dtype(dtype).kind != "c":
+            assert not np.any(phases.imag)
+            phases = phases.real
+        rows.append(nonzero_states)
+        columns.append(nonzero_states ^ flip_mask)
+        values.append(phases.astype(dtype))
+    # Kept in the dtype of the states so scipy does not cast on every product
+    matrix = csr_matrix(
+        (np.concatenate(values), (np.concatenate(rows), np.concatenate(columns))),
+        shape=(2 ** number_of_qubits, 2 ** number_of_qubits),
+    )
+
+    return CompiledHamiltonian(
+        number_of_qubits, flip_masks, sign_masks, coefficients, diagonal, matrix
+    )
+
+
+def get_pauli_masks(hamiltonian, number_of_qubits):
+    """Return the (flip_masks, sign_masks, coefficients) arrays of a QubitOperator,
+    with the i^ny of the Y factors folded into the coefficients"""
+    flip_masks, sign_masks, coefficients = [], [], []
+    for term, coefficient in hamiltonian.terms.items():
+        flip_mask, sign_mask, number_of_ys = 0, 0, 0
+        for qubit, pauli in term:
+            assert qubit < number_of_qubits
+            bit = 1 << (number_of_qubits - qubit - 1)
+            if pauli in ("X", "Y"):
+                flip_mask |= bit
+            if pauli in ("Z", "Y"):
+                sign_mask |= bit
+            if pauli == "Y":
+                number_of_ys += 1
+        flip_masks.append(flip_mask)
+        sign_masks.append(sign_mask)
+        coefficients.append(coefficient * 1j ** number_of_ys)
+    return (
+        np.array(flip_masks, dtype=np.int64),
+        np.array(sign_masks, dtype=np.int64),
+        np.array(coefficients, dtype=np.complex128),
+    )
+
+
+def get_parity_signs(basis_states, mask):
+    """(-1)^popcount(basis_states & mask) for an array of basis states"""
+    parity = np.zeros(len(basis_states), dtype=bool)
+    bit = 1
+    while bit <= mask:
+        if mask & bit:
+            parity ^= (basis_states & bit) != 0
+        bit <<= 1
+    return 1 - 2 * parity.astype(np.int8)
+
+
+def apply_hamiltonian(compiled_hamiltonian, state):
+    """H|state>, or H applied to every row of a (batch, 2^n) array of states"""
+    if state.ndim == 2:
+        return (compiled_hamiltonian.matrix @ state.T).T
+    return compiled_hamiltonian.matrix @ state
+
+
+def calculate_expectation_value(compiled_hamiltonian, state):
+    """<state|H|state>, or one expectation value per row of a batch of states"""
+    return np.sum(
+        np.conj(state) * apply_hamiltonian(compiled_hamiltonian, state), axis=-1
+    ).real
@@ -0,0 +1,236 @@
+import json
+import os
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+from openfermion import QubitOperator
+from scipy.sparse import csr_matrix
+from scipy.sparse.linalg import eigsh
+from vqe.hamiltonians import generate_j1j2_hamiltonian, generate_tfim_hamiltonian
+from vqe.expectation import compile_hamiltonian, get_pauli_masks, get_parity_signs
+
+GROUND_STATE_ENERGY_CACHE = "data/ground_state_energies.json"
+DENSE_DIAGONALIZATION_CUTOFF = 4
+DENSE_BLOCK_CUTOFF = 512
+
+
+def get_ground_state_energy(
+    model,
+    number_of_qubits,
+    j1=1,
+    j2=0,
+    h=1,
+    boundary_conditions="open",
+    cache_path=GROUND_STATE_ENERGY_CACHE,
+):
+    """Lowest eigenvalue of the "j1j2" or "tfim" Hamiltonian from vqe.hamiltonians.
+
+    Results are stored in a JSON file keyed by (model, n, J1, J2, h, boundary
+    conditions) so that repeated jobs read the value instead of diagonalizing
+    again. Pass cache_path=None to skip the cache."""
+    hamiltonian, j1, j2, h = _generate_hamiltonian(
+        model, number_of_qubits, j1, j2, h, boundary_conditions
+    )
+    key = "{}-n={}-J1={}-J2={}-h={}-{}".format(
+        model, number_of_qubits, j1, j2, h, boundary_conditions
+    )
+    if cache_path is not None:
+        cached_energies = _load_cache(cache_path)
+        if key in cached_energies:
+            return cached_energies[key]
+
+    ground_state_energy = calculate_ground_state_energy(hamiltonian, number_of_qubits)
+
+    if cache_path is not None:
+        # Re-read right before writing so that concurrent jobs do not drop each
+        # other's entries, then swap the file in atomically
+        cached_energies = _load_cache(cache_path)
+        cached_energies[key] = ground_state_energy
+        temporary_path = "{}.{}.tmp".format(cache_path, os.getpid())
+        with open(temporary_path, "w") as f:
+            json.dump(cached_energies, f, indent=2, sort_keys=True)
+        os.replace(temporary_path, cache_path)
+
+    return ground_state_energy
+
+
+def calculate_ground_state_energy(hamiltonian, number_of_qubits, seed=0):
+    """Lowest eigenvalue of a QubitOperator using a sparse Lanczos solver
+    (ARPACK through scipy) on the bitmask-compiled Hamiltonian, instead of
+    diagonalizing the dense 2^n x 2^n matrix."""
+    coefficients = get_pauli_masks(hamiltonian, number_of_qubits)[2]
+    dtype = np.float64 if not np.any(coefficients.imag) else np.complex128
+    matrix = compile_hamiltonian(hamiltonian, number_of_qubits, dtype=dtype).matrix
+
+    if number_of_qubits <= DENSE_DIAGONALIZATION_CUTOFF:
+        return float(np.linalg.eigvalsh(matrix.toarray())[0])
+
+    # A random start vector overlaps with every symmetry sector, unlike e.g. the
+    # uniform superposition
+    initial_vector = np.random.default_rng(seed).normal(size=2 ** number_of_qubits)
+    eigenvalues = eigsh(
+        matrix,
+        k=1,
+        which="SA",
+        v0=initial_vector.astype(dtype),
+        return_eigenvectors=False,
+    )
+    return float(eigenvalues[0])
+
+
+def get_ground_state_energy_and_gap(
+    model,
+    number_of_qubits,
+    j1=1,
+    j2=0,
+    h=1,
+    boundary_conditions="open",
+    max_workers=None,
+):
+    """Ground state energy and gap E1 - E0 (zero when the ground state is
+    degenerate) of the "j1j2" or "tfim" Hamiltonian, from the symmetry-resolved
+    spectrum. J1J2 conserves total S^z, so its sectors are the Hamming weights of
+    the basis states. The TFIM conserves the parity prod_i X_i, which becomes
+    prod_i Z_i after a Hadamard on every qubit, so it is rotated first and split
+    by the parity of the Hamming weight."""
+    hamiltonian = _generate_hamiltonian(
+        model, number_of_qubits, j1, j2, h, boundary_conditions
+    )[0]
+    hamming_weights = _get_hamming_weights(
+        np.arange(2 ** number_of_qubits), number_of_qubits
+    )
+    if model == "j1j2":
+        # Flipping every spin maps weight k onto weight n - k with the same
+        # spectrum, so only half of the blocks need to be diagonalized
+        sector_labels = hamming_weights
+        sectors = range(number_of_qubits // 2 + 1)
+    else:
+        hamiltonian = _apply_global_hadamard(hamiltonian)
+        sector_labels = hamming_weights % 2
+        sectors = None
+
+    sector_spectra = calculate_sector_spectra(
+        hamiltonian,
+        number_of_qubits,
+        sector_labels,
+        sectors=sectors,
+        max_workers=max_workers,
+    )
+    if model == "j1j2":
+        for sector in range(number_of_qubits // 2 + 1, number_of_qubits + 1):
+            sector_spectra[sector] = sector_spectra[number_of_qubits - sector]
+    eigenvalues = np.sort(np.concatenate(list(sector_spectra.values())))
+    return float(eigenvalues[0]), float(eigenvalues[1] - eigenvalues[0])
+
+
+def calculate_sector_spectra(
+    hamiltonian,
+    number_of_qubits,
+    sector_labels,
+    number_of_eigenvalues=2,
+    sectors=None,
+    max_workers=None,
+):
+    """Lowest eigenvalues of every symmetry block of a QubitOperator.
+
+    sector_labels gives the conserved quantum number of each basis state. Each
+    block is built directly from the Pauli bitmasks restricted to the basis
+    states of its sector, and blocks are diagonalized concurrently (LAPACK and
+    ARPACK release the GIL, so threads are enough). Returns a dict mapping each
+    sector label (all of them unless sectors is given) to its lowest
+    number_of_eigenvalues eigenvalues."""
+    masks = get_pauli_masks(hamiltonian, number_of_qubits)
+    dtype = np.float64 if not np.any(masks[2].imag) else np.complex128
+    if sectors is None:
+        sectors = np.unique(sector_labels).tolist()
+
+    def diagonalize_sector(sector):
+        sector_states = np.flatnonzero(sector_labels == sector)
+        block = _build_sector_block(masks, sector_states, sector_labels, dtype)
+        if len(sector_states) <= DENSE_BLOCK_CUTOFF:
+            return np.linalg.eigvalsh(block.toarray())[:number_of_eigenvalues]
+        initial_vector = np.random.default_rng(0).normal(size=len(sector_states))
+        return np.sort(
+            eigsh(
+                block,
+                k=number_of_eigenvalues,
+                which="SA",
+                v0=initial_vector.astype(dtype),
+                return_eigenvectors=False,
+            )
+        )
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        sector_spectra = executor.map(diagonalize_sector, sectors)
+        return dict(zip(sectors, sector_spectra))
+
+
+def _build_sector_block(masks, sector_states, sector_labels, dtype):
+    flip_masks, sign_masks, coefficients = masks
+    sector = sector_labels[sector_states[0]]
+    rows, columns, values = [], [], []
+    for flip_mask in np.unique(flip_masks):
+        # Same construction as compile_hamiltonian, restricted to the sector
+        source_states = sector_states ^ flip_mask
+        phases = 0
+        for term_index in np.flatnonzero(flip_masks == flip_mask):
+            phases = phases + coefficients[term_index] * get_parity_signs(
+                source_states, sign_masks[term_index]
+            )
+        nonzero_indices = np.flatnonzero(phases)
+        # The terms sharing a flip mask only connect states within a sector once
+        # they are summed, e.g. XX + YY only swaps 01 and 10
+        assert np.all(sector_labels[source_states[nonzero_indices]] == sector)
+        phases = phases[nonzero_indices]
+        if np.dtype(dtype).kind != "c":
+            phases = phases.real
+        rows.append(nonzero_indices)
+        columns.append(np.searchsorted(sector_states, source_states[nonzero_indices]))
+        values.append(phases.astype(dtype))
+    return csr_matrix(
+        (np.concatenate(values), (np.concatenate(rows), np.concatenate(columns))),
+        shape=(len(sector_states), len(sector_states)),
+    )
+
+
+def _generate_hamiltonian(model, number_of_qubits, j1, j2, h, boundary_conditions):
+    """Hamiltonian together with its normalized (j1, j2, h); couplings that do not
+    enter the model are None"""
+    if model == "j1j2":
+        # generate_j1j2_hamiltonian only builds open chains
+        assert boundary_conditions == "open"
+        j1, j2, h = float(j1), float(j2), None
+        hamiltonian = generate_j1j2_hamiltonian(number_of_qubits, j2, j1=j1)
+    elif model == "tfim":
+        j1, j2, h = None, None, float(h)
+        hamiltonian = generate_tfim_hamiltonian(
+            number_of_qubits, h=h, boundary_conditions=boundary_conditions
+        )
+    else:
+        raise ValueError("Unknown model {}".format(model))
+    return hamiltonian, j1, j2, h
+
+
+def _apply_global_hadamard(hamiltonian):
+    """H^n hamiltonian H^n, which swaps X and Z and maps Y to -Y"""
+    rotated_hamiltonian = QubitOperator()
+    rotation = {"X": "Z", "Y": "Y", "Z": "X"}
+    for term, coefficient in hamiltonian.terms.items():
+        sign = (-1) ** sum(pauli == "Y" for _, pauli in term)
+        rotated_term = tuple((qubit, rotation[pauli]) for qubit, pauli in term)
+        rotated_hamiltonian += QubitOperator(rotated_term, sign * coefficient)
+    return rotated_hamiltonian
+
+
+def _get_hamming_weights(basis_states, number_of_qubits):
+    hamming_weights = np.zeros(len(basis_states), dtype=np.int64)
+    for qubit in range(number_of_qubits):
+        hamming_weights += (basis_states >> qubit) & 1
+    return hamming_weights
+
+
+def _load_cache(cache_path):
+    try:
+        with open(cache_path, "r") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
@@ -0,0 +1,711 @@
+import numpy as np
+import sympy
+from vqe.expectation import apply_hamiltonian
+
+
+class CompiledCircuit:
+    """Flat gate program compiled from a sympy-parameterized circuit.
+
+    Every operation is stored as (gate_name, qubit_indices, gate_parameters)
+    where gate_parameters holds one (parameter_index, coefficient, offset)
+    triple per gate angle, so that the angle is
+    coefficient * parameters[parameter_index] + offset. Constant angles have a
+    parameter_index of None. Parameter indices follow the order of
+    `circuit.free_symbols`, which is the order used when binding parameters in
+    zquantum's cost functions, or that of the symbols given to compile_circuit. MATRIX operations, produced by `prune_circuit`,
+    hold a constant unitary in place of gate_parameters."""
+
+    def __init__(self, number_of_qubits, number_of_parameters, operations):
+        self.number_of_qubits = number_of_qubits
+        self.number_of_parameters = number_of_parameters
+        self.operations = operations
+
+
+def compile_circuit(parameterized_quantum_circuit, fuse_blocks=True, symbols=None):
+    """Compile a circuit from vqe.circuits once so it can be evaluated
+    repeatedly with `simulate` instead of resolving sympy symbols. Parameter
+    indices follow symbols if given, and `circuit.free_symbols` otherwise.
+
+    With fuse_blocks, the gate sequences emitted by
+    vqe.circuits._add_xx_yy_zz_gate and vqe.circuits._add_zz_gate are replaced by
+    a single two-qubit XX_YY_ZZ unitary and ZZ_PHASE diagonal respectively. The
+    circuits themselves keep the decomposition for hardware-level export."""
+    number_of_qubits = parameterized_quantum_circuit.n_qubits
+    if symbols is None:
+        symbols = parameterized_quantum_circuit.free_symbols
+    symbol_indices = {symbol: index for index, symbol in enumerate(symbols)}
+
+    operations = []
+    for operation in parameterized_quantum_circuit.operations:
+        gate_name = operation.gate.name
+        if gate_name not in _SUPPORTED_GATES:
+            raise ValueError(
+                "Gate {} is not supported by the native simulator".format(gate_name)
+            )
+        gate_parameters = tuple(
+            _get_affine_parameter(parameter, symbol_indices)
+            for parameter in operation.gate.params
+        )
+        operations.append((gate_name, tuple(operation.qubit_indices), gate_parameters))
+
+    if fuse_blocks:
+        operations = _fuse_xx_yy_zz_blocks(operations)
+        operations = _fuse_zz_blocks(operations)
+
+    return CompiledCircuit(number_of_qubits, len(symbols), operations)
+
+
+def prune_circuit(compiled_circuit, pruned_indices):
+    """Compile the pruned parameters out of a compiled circuit.
+
+    Pruned parameters are fixed to zero, so rotations that only depend on them
+    vanish and fused blocks whose angles are all pruned reduce to their constant
+    (Clifford) remainder. Adjacent constant gates acting on at most two qubits
+    are then multiplied into single MATRIX operations, and those equal to the
+    identity up to a global phase are dropped. The returned circuit takes the
+    unpruned parameters, i.e. `prune.get_pruned_parameters(parameters,
+    pruned_indices)`."""
+    pruned_indices = set(pruned_indices)
+    kept_indices = [
+        index
+        for index in range(compiled_circuit.number_of_parameters)
+        if index not in pruned_indices
+    ]
+    new_indices = {index: new_index for new_index, index in enumerate(kept_indices)}
+
+    operations = []
+    for gate_name, qubit_indices, gate_parameters in compiled_circuit.operations:
+        if gate_name in _PARAMETERIZED_GATES:
+            gate_parameters = tuple(
+                _bind_pruned_parameter(gate_parameter, new_indices)
+                for gate_parameter in gate_parameters
+            )
+        operation = (gate_name, qubit_indices, gate_parameters)
+        if gate_name in _PARAMETERIZED_GATES and all(
+            parameter_index is None for parameter_index, _, _ in gate_parameters
+        ):
+            operation = ("MATRIX", qubit_indices, _get_constant_matrix(operation))
+        operations.append(operation)
+
+    number_of_operations = None
+    while number_of_operations != len(operations):
+        number_of_operations = len(operations)
+        operations = _merge_constant_operations(operations)
+
+    return CompiledCircuit(
+        compiled_circuit.number_of_qubits, len(kept_indices), operations
+    )
+
+
+def simulate(compiled_circuit, parameters):
+    """Return the final statevector (big-endian, qubit 0 is the most
+    significant bit) for the given parameter vector. A 2D array of parameter
+    vectors returns one statevector per row, simulated together with one
+    vectorized kernel per gate."""
+    parameters = np.asarray(parameters, dtype=float)
+    batch_parameters = np.atleast_2d(parameters)
+    gate_matrices = _get_gate_matrices(compiled_circuit.operations, batch_parameters)
+    states = _simulate_batch(compiled_circuit, gate_matrices, len(batch_parameters))
+    return states if parameters.ndim == 2 else states[0]
+
+
+def calculate_energy_and_gradient(compiled_circuit, compiled_hamiltonian, parameters):
+    """Adjoint (reverse-mode) differentiation of <psi|H|psi>.
+
+    One forward pass prepares psi, then a single backward pass un-computes both
+    psi and H|psi> gate by gate, so the cost is about three simulations
+    regardless of the number of parameters. Like `simulate`, a 2D array of
+    parameter vectors returns one energy and gradient per row."""
+    parameters = np.asarray(parameters, dtype=float)
+    batch_parameters = np.atleast_2d(parameters)
+    gate_matrices = _get_gate_matrices(compiled_circuit.operations, batch_parameters)
+    states = _simulate_batch(compiled_circuit, gate_matrices, len(batch_parameters))
+    adjoint_states = apply_hamiltonian(compiled_hamiltonian, states)
+    energies = np.sum(np.conj(states) * adjoint_states, axis=1).real
+    gradients = _calculate_adjoint_gradients(
+        compiled_circuit, gate_matrices, states, adjoint_states
+    )
+
+    if parameters.ndim == 2:
+        return energies, gradients
+    return energies[0], gradients[0]
+
+
+def calculate_probability_cost_and_gradient(
+    compiled_circuit, probability_cost_function, parameters
+):
+    """Adjoint differentiation of a cost of the Born probabilities |psi|^2.
+
+    probability_cost_function takes a (batch, 2^n) array of probabilities and
+    returns the costs and their (batch, 2^n) derivatives with respect to the
+    probabilities. As the probabilities are real, the cost has the gradient of
+    <psi|W|psi> for the diagonal W holding those derivatives, which is
+    back-propagated like an energy. Like `simulate`, a 2D array of parameter
+    vectors returns one cost and gradient per row."""
+    parameters = np.asarray(parameters, dtype=float)
+    batch_parameters = np.atleast_2d(parameters)
+    gate_matrices = _get_gate_matrices(compiled_circuit.operations, batch_parameters)
+    states = _simulate_batch(compiled_circuit, gate_matrices, len(batch_parameters))
+    costs, probability_gradients = probability_cost_function(np.abs(states) ** 2)
+    gradients = _calculate_adjoint_gradients(
+        compiled_circuit, gate_matrices, states, probability_gradients * states
+    )
+
+    if parameters.ndim == 2:
+        return costs, gradients
+    return costs[0], gradients[0]
+
+
+def _calculate_adjoint_gradients(
+    compiled_circuit, gate_matrices, states, adjoint_states
+):
+    """2 Re <adjoint|d psi/d theta> for every parameter, un-computing the final
+    states and adjoint states gate by gate"""
+    number_of_qubits = compiled_circuit.number_of_qubits
+    operations = compiled_circuit.operations
+    gradients = np.zeros((len(states), compiled_circuit.number_of_parameters))
+    for operation, gate_matrix in zip(reversed(operations), reversed(gate_matrices)):
+        gate_name, qubit_indices, gate_parameters = operation
+        for (parameter_index, coefficient, _), (generator, factor) in zip(
+            gate_parameters, _GENERATORS.get(gate_name, ())
+        ):
+            if parameter_index is None:
+                continue
+            # dU/dtheta = (i factor / 2) G U, so
+            # dE/dtheta = 2 Re <adjoint|dU/dtheta|psi> = -factor Im <adjoint|G|psi>
+            generator_states = _apply_matrix(
+                states, generator, qubit_indices, number_of_qubits
+            )
+            gradients[:, parameter_index] -= (
+                factor
+                * coefficient
+                * np.sum(np.conj(adjoint_states) * generator_states, axis=1).imag
+            )
+        states = _apply_operation(
+            states, operation, gate_matrix, number_of_qubits, inverse=True
+        )
+        adjoint_states = _apply_operation(
+            adjoint_states, operation, gate_matrix, number_of_qubits, inverse=True
+        )
+    return gradients
+
+
+def _simulate_batch(compiled_circuit, gate_matrices, batch_size):
+    number_of_qubits = compiled_circuit.number_of_qubits
+    states = np.zeros((batch_size, 2 ** number_of_qubits), dtype=np.complex128)
+    states[:, 0] = 1
+    for operation, gate_matrix in zip(compiled_circuit.operations, gate_matrices):
+        states = _apply_operation(states, operation, gate_matrix, number_of_qubits)
+    return states
+
+
+def _get_gate_matrices(operations, parameters):
+    """Bind the angles of every parameterized gate for a (batch, parameters)
+    array. The matrices (or diagonals) of each gate type are built in a single
+    vectorized call, and the returned list holds one (batch, ...) array per
+    operation, with None for constant gates."""
+    gate_matrices = [None] * len(operations)
+    for gate_name, builder in _PARAMETERIZED_GATES.items():
+        operation_indices = [
+            index
+            for index, operation in enumerate(operations)
+            if operation[0] == gate_name
+        ]
+        if not operation_indices:
+            continue
+        angles = []
+        for gate_parameters in zip(
+            *(operations[index][2] for index in operation_indices)
+        ):
+            parameter_indices = [
+                0 if parameter_index is None else parameter_index
+                for parameter_index, _, _ in gate_parameters
+            ]
+            coefficients = [
+                0 if parameter_index is None else coefficient
+                for parameter_index, coefficient, _ in gate_parameters
+            ]
+            offsets = [offset for _, _, offset in gate_parameters]
+            angles.append(
+                np.asarray(offsets)
+                + np.asarray(coefficients) * parameters[:, parameter_indices]
+            )
+        matrices = builder(*angles)
+        for position, index in enumerate(operation_indices):
+            gate_matrices[index] = matrices[:, position]
+    return gate_matrices
+
+
+def _get_affine_parameter(parameter, symbol_indices):
+    """Split a gate parameter into (parameter_index, coefficient, offset)."""
+    if not isinstance(parameter, sympy.Expr) or not parameter.free_symbols:
+        return None, 0.0, float(parameter)
+
+    if len(parameter.free_symbols) != 1:
+        raise ValueError(
+            "Gate parameter {} depends on more than one symbol".format(parameter)
+        )
+    (symbol,) = parameter.free_symbols
+    if sympy.diff(parameter, symbol, 2) != 0:
+        raise ValueError("Gate parameter {} is not linear".format(parameter))
+
+    coefficient = float(sympy.diff(parameter, symbol))
+    offset = float(parameter.subs(symbol, 0))
+    return symbol_indices[symbol], coefficient, offset
+
+
+def _scale_affine_parameter(gate_parameter, scale, shift):
+    """Affine parameter for scale * angle + shift"""
+    parameter_index, coefficient, offset = gate_parameter
+    return parameter_index, scale * coefficient, scale * offset + shift
+
+
+def _get_wire_links(operations):
+    """Index of the previous and next operation on each qubit of every operation"""
+    previous_operation = [{} for _ in operations]
+    next_operation = [{} for _ in operations]
+    last_operation_on_qubit = {}
+    for operation_index, (_, qubit_indices, _) in enumerate(operations):
+        for qubit in qubit_indices:
+            if qubit in last_operation_on_qubit:
+                previous_index = last_operation_on_qubit[qubit]
+                previous_operation[operation_index][qubit] = previous_index
+                next_operation[previous_index][qubit] = operation_index
+            last_operation_on_qubit[qubit] = operation_index
+    return previous_operation, next_operation
+
+
+def _is_constant_rz(operation, angle):
+    gate_name, _, gate_parameters = operation
+    return (
+        gate_name == "RZ"
+        and gate_parameters[0][0] is None
+        and np.isclose(gate_parameters[0][2], angle)
+    )
+
+
+def _fuse_xx_yy_zz_blocks(operations):
+    """Replace vqe.circuits._add_xx_yy_zz_gate sequences by one XX_YY_ZZ gate.
+
+    The block on (qubit1, qubit2) is rz(-pi/2) q2, CNOT(q2, q1), rz(theta) q1,
+    ry(phi) q2, CNOT(q1, q2), ry(omega) q2, CNOT(q2, q1), rz(pi/2) q1. cirq packs
+    appended gates into moments, so the block is matched by following each
+    qubit's wire rather than by position. The fused gate takes the place of the
+    first CNOT, which keeps every other gate on either qubit on the same side of
+    the block."""
+    previous_operation, next_operation = _get_wire_links(operations)
+
+    def follow(operation_index, qubit, gate_name, qubit_indices=None):
+        candidate_index = next_operation[operation_index].get(qubit)
+        if candidate_index is None:
+            return None
+        candidate_name, candidate_qubit_indices, _ = operations[candidate_index]
+        if candidate_name != gate_name:
+            return None
+        if qubit_indices is not None and candidate_qubit_indices != qubit_indices:
+            return None
+        return candidate_index
+
+    replacements = {}
+    removed = set()
+    for first_cnot, (gate_name, qubit_indices, _) in enumerate(operations):
+        if gate_name != "CNOT":
+            continue
+        qubit2, qubit1 = qubit_indices
+
+        first_rz = previous_operation[first_cnot].get(qubit2)
+        if first_rz is None or not _is_constant_rz(operations[first_rz], -np.pi / 2):
+            continue
+        theta_rz = follow(first_cnot, qubit1, "RZ")
+        phi_ry = follow(first_cnot, qubit2, "RY")
+        if theta_rz is None or phi_ry is None:
+            continue
+        second_cnot = follow(theta_rz, qubit1, "CNOT", (qubit1, qubit2))
+        if second_cnot is None or next_operation[phi_ry].get(qubit2) != second_cnot:
+            continue
+        omega_ry = follow(second_cnot, qubit2, "RY")
+        third_cnot = follow(second_cnot, qubit1, "CNOT", (qubit2, qubit1))
+        if (
+            omega_ry is None
+            or third_cnot is None
+            or next_operation[omega_ry].get(qubit2) != third_cnot
+        ):
+            continue
+        last_rz = follow(third_cnot, qubit1, "RZ")
+        if last_rz is None or not _is_constant_rz(operations[last_rz], np.pi / 2):
+            continue
+
+        block = [
+            first_rz,
+            first_cnot,
+            theta_rz,
+            phi_ry,
+            second_cnot,
+            omega_ry,
+            third_cnot,
+            last_rz,
+        ]
+        if removed.intersection(block):
+            continue
+        # theta = pi/2 - gamma, phi = alpha - pi/2, omega = pi/2 - beta
+        alpha = _scale_affine_parameter(operations[phi_ry][2][0], 1, np.pi / 2)
+        beta = _scale_affine_parameter(operations[omega_ry][2][0], -1, np.pi / 2)
+        gamma = _scale_affine_parameter(operations[theta_rz][2][0], -1, np.pi / 2)
+        replacements[first_cnot] = ("XX_YY_ZZ", (qubit1, qubit2), (alpha, beta, gamma))
+        removed.update(block)
+
+    return _replace_operations(operations, replacements, removed)
+
+
+def _fuse_zz_blocks(operations):
+    """Replace vqe.circuits._add_zz_gate sequences, CNOT(a, b) rz(-2 gamma) b
+    CNOT(a, b), by one ZZ_PHASE gate."""
+    _, next_operation = _get_wire_links(operations)
+
+    replacements = {}
+    removed = set()
+    for first_cnot, (gate_name, qubit_indices, _) in enumerate(operations):
+        if gate_name != "CNOT" or first_cnot in removed:
+            continue
+        control, target = qubit_indices
+        rz = next_operation[first_cnot].get(target)
+        if rz is None or operations[rz][0] != "RZ":
+            continue
+        second_cnot = next_operation[rz].get(target)
+        if (
+            second_cnot is None
+            or next_operation[first_cnot].get(control) != second_cnot
+            or operations[second_cnot][:2] != ("CNOT", (control, target))
+        ):
+            continue
+
+        gamma = _scale_affine_parameter(operations[rz][2][0], -0.5, 0)
+        replacements[first_cnot] = ("ZZ_PHASE", (control, target), (gamma,))
+        removed.update([first_cnot, rz, second_cnot])
+
+    return _replace_operations(operations, replacements, removed)
+
+
+def _replace_operations(operations, replacements, removed):
+    fused_operations = []
+    for operation_index, operation in enumerate(operations):
+        if operation_index in replacements:
+            fused_operations.append(replacements[operation_index])
+        elif operation_index not in removed:
+            fused_operations.append(operation)
+    return fused_operations
+
+
+def _bind_pruned_parameter(gate_parameter, new_indices):
+    """Fix the angle to its offset if its parameter is pruned, otherwise point it
+    at the parameter's index in the pruned parameter vector"""
+    parameter_index, coefficient, offset = gate_parameter
+    if parameter_index is None or parameter_index not in new_indices:
+        return None, 0.0, offset
+    return new_indices[parameter_index], coefficient, offset
+
+
+def _is_constant_operation(operation):
+    return operation[0] in _CONSTANT_GATES or operation[0] in ("CNOT", "MATRIX")
+
+
+def _get_constant_matrix(operation):
+    gate_name, _, gate_parameters = operation
+    if gate_name == "MATRIX":
+        return gate_parameters
+    if gate_name == "CNOT":
+        return _CNOT_MATRIX
+    if gate_name in _CONSTANT_GATES:
+        return _CONSTANT_GATES[gate_name]
+    matrix = _PARAMETERIZED_GATES[gate_name](
+        *(np.asarray(offset) for _, _, offset in gate_parameters)
+    )
+    return np.diag(matrix) if gate_name in _DIAGONAL_GATES else matrix
+
+
+def _embed_matrix(matrix, qubit_indices, target_qubit_indices):
+    """matrix acting on qubit_indices as a matrix on target_qubit_indices, which
+    contains them"""
+    if qubit_indices == target_qubit_indices:
+        return matrix
+    if len(qubit_indices) == 2:
+        # Same pair in the opposite order
+        return _SWAP_MATRIX @ matrix @ _SWAP_MATRIX
+    identity = np.eye(2, dtype=np.complex128)
+    if qubit_indices[0] == target_qubit_indices[0]:
+        return np.kron(matrix, identity)
+    return np.kron(identity, matrix)
+
+
+def _merge_constant_operations(operations):
+    """Multiply every constant operation into the latest earlier constant
+    operation it can be moved next to, as long as the product still acts on at
+    most two qubits. Products equal to the identity up to a global phase are
+    dropped."""
+    merged_operations = []
+    last_operation_on_qubit = {}
+    for operation in operations:
+        _, qubit_indices, _ = operation
+        previous_index = max(
+            (
+                last_operation_on_qubit[qubit]
+                for qubit in qubit_indices
+                if qubit in last_operation_on_qubit
+            ),
+            default=None,
+        )
+        if (
+            _is_constant_operation(operation)
+            and previous_index is not None
+            and _is_constant_operation(merged_operations[previous_index])
+        ):
+            previous_operation = merged_operations[previous_index]
+            merged_qubit_indices = previous_operation[1] + tuple(
+                qubit for qubit in qubit_indices if qubit not in previous_operation[1]
+            )
+            if len(merged_qubit_indices) <= 2:
+                # Nothing after previous_operation acts on these qubits, so the
+                # operation can be moved back to it
+                matrix = _embed_matrix(
+                    _get_constant_matrix(operation),
+                    qubit_indices,
+                    merged_qubit_indices,
+                ) @ _embed_matrix(
+                    _get_constant_matrix(previous_operation),
+                    previous_operation[1],
+                    merged_qubit_indices,
+                )
+                merged_operations[previous_index] = (
+                    "MATRIX",
+                    merged_qubit_indices,
+                    matrix,
+                )
+                for qubit in qubit_indices:
+                    last_operation_on_qubit[qubit] = previous_index
+                continue
+
+        for qubit in qubit_indices:
+            last_operation_on_qubit[qubit] = len(merged_operations)
+        merged_operations.append(operation)
+
+    return [
+        operation
+        for operation in merged_operations
+        if operation[0] != "MATRIX" or not _is_global_phase(operation[2])
+    ]
+
+
+def _is_global_phase(matrix):
+    return np.allclose(matrix, matrix[0, 0] * np.eye(len(matrix)))
+
+
+def _apply_operation(states, operation, gate_matrix, number_of_qubits, inverse=False):
+    """Apply one compiled gate to a (batch, 2^n) array of states, where
+    gate_matrix comes from _get_gate_matrices. The inverse of each gate is its
+    conjugate transpose."""
+    gate_name, qubit_indices, _ = operation
+
+    if gate_name == "CNOT":
+        return _apply_cnot(states, qubit_indices[0], qubit_indices[1], number_of_qubits)
+
+    if gate_name in _CONSTANT_GATES or gate_name == "MATRIX":
+        gate_matrix = _get_constant_matrix(operation)
+        if inverse:
+            gate_matrix = np.conj(gate_matrix.T)
+        return _apply_matrix(states, gate_matrix, qubit_indices, number_of_qubits)
+
+    if inverse:
+        gate_matrix = np.conj(gate_matrix)
+    if gate_name in _DIAGONAL_GATES:
+        return _apply_diagonal(states, gate_matrix, qubit_indices, number_of_qubits)
+    if inverse:
+        gate_matrix = np.swapaxes(gate_matrix, 1, 2)
+    return _apply_matrix(states, gate_matrix, qubit_indices, number_of_qubits)
+
+
+def _apply_matrix(states, matrix, qubit_indices, number_of_qubits):
+    """matrix is either shared by the whole batch or has a leading batch axis"""
+    batch_size = len(states)
+    if matrix.ndim == 3 and len(matrix) == 1:
+        matrix = matrix[0]
+    is_batched = matrix.ndim == 3
+    if len(qubit_indices) == 1:
+        qubit = qubit_indices[0]
+        view = states.reshape(
+            batch_size, 2 ** qubit, 2, 2 ** (number_of_qubits - qubit - 1)
+        )
+        if is_batched:
+            matrix = matrix[:, np.newaxis]
+        return np.matmul(matrix, view).reshape(batch_size, -1)
+
+    tensor = matrix.reshape(matrix.shape[:-2] + (2, 2, 2, 2))
+    first, second = qubit_indices
+    if first > second:
+        tensor = np.swapaxes(np.swapaxes(tensor, -4, -3), -2, -1)
+        first, second = second, first
+    view = states.reshape(
+        batch_size,
+        2 ** first,
+        2,
+        2 ** (second - first - 1),
+        2,
+        2 ** (number_of_qubits - second - 1),
+    )
+    subscripts = "zijkl,zakblc->zaibjc" if is_batched else "ijkl,zakblc->zaibjc"
+    return np.einsum(subscripts, tensor, view).reshape(batch_size, -1)
+
+
+def _apply_diagonal(states, diagonal, qubit_indices, number_of_qubits):
+    """diagonal has a leading batch axis, like the batched matrices"""
+    batch_size = len(states)
+    if len(qubit_indices) == 1:
+        qubit = qubit_indices[0]
+        view = states.reshape(
+            batch_size, 2 ** qubit, 2, 2 ** (number_of_qubits - qubit - 1)
+        )
+        return (view * diagonal[:, np.newaxis, :, np.newaxis]).reshape(batch_size, -1)
+
+    diagonal = diagonal.reshape(batch_size, 2, 2)
+    first, second = qubit_indices
+    if first > second:
+        diagonal = np.swapaxes(diagonal, 1, 2)
+        first, second = second, first
+    view = states.reshape(
+        batch_size,
+        2 ** first,
+        2,
+        2 ** (second - first - 1),
+        2,
+        2 ** (number_of_qubits - second - 1),
+    )
+    return (view * diagonal[:, np.newaxis, :, np.newaxis, :, np.newaxis]).reshape(
+        batch_size, -1
+    )
+
+
+def _apply_cnot(states, control, target, number_of_qubits):
+    view = states.reshape((len(states),) + (2,) * number_of_qubits).copy()
+    controlled = [slice(None)] * (number_of_qubits + 1)
+    controlled[control + 1] = 1
+    controlled = tuple(controlled)
+    # Within the control=1 subspace the target axis moves to position target
+    # (after the batch axis) when it comes after the control.
+    target_axis = target if target > control else target + 1
+    view[controlled] = np.flip(view[controlled], axis=target_axis)
+    return view.reshape(len(states), -1)
+
+
+def _rx_matrix(angles):
+    cos, sin = np.cos(angles / 2), np.sin(angles / 2)
+    return _stack_matrices([[cos, -1j * sin], [-1j * sin, cos]])
+
+
+def _ry_matrix(angles):
+    cos, sin = np.cos(angles / 2), np.sin(angles / 2)
+    return _stack_matrices([[cos, -sin], [sin, cos]])
+
+
+def _rz_diagonal(angles):
+    return np.exp(angles[..., np.newaxis] * np.asarray([-0.5j, 0.5j]))
+
+
+def _xx_matrix(angles):
+    """exp(-i angle XX / 2), zquantum's XX gate"""
+    cos, sin = np.cos(angles / 2), -1j * np.sin(angles / 2)
+    zero = np.zeros_like(sin)
+    return _stack_matrices(
+        [
+            [cos, zero, zero, sin],
+            [zero, cos, sin, zero],
+            [zero, sin, cos, zero],
+            [sin, zero, zero, cos],
+        ]
+    )
+
+
+def _xx_yy_zz_matrix(alpha, beta, gamma):
+    """exp(i (alpha XX + beta YY + gamma ZZ) / 2), which is what
+    vqe.circuits._add_xx_yy_zz_gate implements up to a global phase.
+
+    XX, YY and ZZ commute, so the exponential splits into rotations on the
+    {|00>, |11>} and {|01>, |10>} subspaces."""
+    even_phase = np.exp(0.5j * gamma)
+    odd_phase = np.exp(-0.5j * gamma)
+    even_cos = even_phase * np.cos((alpha - beta) / 2)
+    even_sin = 1j * even_phase * np.sin((alpha - beta) / 2)
+    odd_cos = odd_phase * np.cos((alpha + beta) / 2)
+    odd_sin = 1j * odd_phase * np.sin((alpha + beta) / 2)
+    zero = np.zeros_like(even_cos)
+    return _stack_matrices(
+        [
+            [even_cos, zero, zero, even_sin],
+            [zero, odd_cos, odd_sin, zero],
+            [zero, odd_sin, odd_cos, zero],
+            [even_sin, zero, zero, even_cos],
+        ]
+    )
+
+
+def _zz_phase_diagonal(gamma):
+    """exp(i gamma ZZ), which is what vqe.circuits._add_zz_gate implements"""
+    return np.exp(gamma[..., np.newaxis] * np.asarray([1j, -1j, -1j, 1j]))
+
+
+def _stack_matrices(entries):
+    """(..., d, d) complex array from a d x d nested list of equally shaped
+    arrays"""
+    dimension = len(entries)
+    matrices = np.empty(
+        np.shape(entries[0][0]) + (dimension, dimension), dtype=np.complex128
+    )
+    for row_index, row in enumerate(entries):
+        for column_index, entry in enumerate(row):
+            matrices[..., row_index, column_index] = entry
+    return matrices
+
+
+_PAULI_X = np.asarray([[0, 1], [1, 0]], dtype=np.complex128)
+_PAULI_Y = np.asarray([[0, -1j], [1j, 0]], dtype=np.complex128)
+_PAULI_Z = np.asarray([[1, 0], [0, -1]], dtype=np.complex128)
+
+_CONSTANT_GATES = {
+    "H": np.asarray([[1, 1], [1, -1]], dtype=np.complex128) / np.sqrt(2),
+    "X": _PAULI_X,
+}
+
+_CNOT_MATRIX = np.asarray(
+    [[1, 0, 0, 0], [0, 1, 0, 0], [0, 0, 0, 1], [0, 0, 1, 0]], dtype=np.complex128
+)
+_SWAP_MATRIX = np.asarray(
+    [[1, 0, 0, 0], [0, 0, 1, 0], [0, 1, 0, 0], [0, 0, 0, 1]], dtype=np.complex128
+)
+
+_ROTATION_GATES = {
+    "RX": _rx_matrix,
+    "RY": _ry_matrix,
+    "XX": _xx_matrix,
+    "XX_YY_ZZ": _xx_yy_zz_matrix,
+}
+
+_DIAGONAL_GATES = {
+    "RZ": _rz_diagonal,
+    "ZZ_PHASE": _zz_phase_diagonal,
+}
+
+_PARAMETERIZED_GATES = {**_ROTATION_GATES, **_DIAGONAL_GATES}
+
+_SUPPORTED_GATES = {"H", "X", "CNOT", "RX", "RY", "RZ", "XX"}
+
+# (generator, factor) for every gate angle, with dU/dtheta = (i factor / 2) G U
+_GENERATORS = {
+    "RX": [(_PAULI_X, -1)],
+    "RY": [(_PAULI_Y, -1)],
+    "RZ": [(_PAULI_Z, -1)],
+    "XX": [(np.kron(_PAULI_X, _PAULI_X), -1)],
+    "XX_YY_ZZ": [
+        (np.kron(_PAULI_X, _PAULI_X), 1),
+        (np.kron(_PAULI_Y, _PAULI_Y), 1),
+        (np.kron(_PAULI_Z, _PAULI_Z), 1),
+    ],
+    "ZZ_PHASE": [(np.kron(_PAULI_Z, _PAULI_Z), 2)],
+}
@@ -0,0 +1,101 @@
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import json
+import os
+import run_store
+
+MANIFEST_FILE = "manifest.json"
+
+
+def download_project(
+    api, entity, project, directory=run_store.DEFAULT_DIRECTORY, max_workers=8
+):
+    """Download the history of every run of a wandb project into the run store,
+    so that run_store.load_project can read it.
+
+    Runs are fetched concurrently by max_workers threads, and each is stored
+    under its wandb id with its full config. A manifest of the last step stored
+    for every run is updated as each run completes, so a rerun only fetches the
+    steps (and runs) that are new. api is a wandb.Api, or anything with the same
+    `runs` method. Returns the manifest."""
+    manifest_path = os.path.join(directory, project, MANIFEST_FILE)
+    manifest = load_manifest(project, directory)
+    runs = list(api.runs(entity + "/" + project))
+
+    runs_to_download = []
+    for run in runs:
+        last_step = manifest.get(run.id, {}).get("last_step", -1)
+        last_history_step = getattr(run, "lastHistoryStep", None)
+        if last_history_step is not None and last_history_step <= last_step:
+            continue
+        runs_to_download.append((run, last_step))
+
+    with ThreadPoolExecutor(max_workers) as executor:
+        futures = {
+            executor.submit(download_run, run, project, directory, last_step): run
+            for run, last_step in runs_to_download
+        }
+        for number_of_downloaded_runs, future in enumerate(as_completed(futures)):
+            run = futures[future]
+            print(
+                "[{}%] ".format(
+                    round(100 * (number_of_downloaded_runs / len(futures)), 1)
+                ),
+                run.name,
+            )
+            try:
+                last_step = future.result()
+            except Exception as error:
+                # The run is left as it was and fetched again by the next rerun
+                print("Failed to download", run.name, repr(error))
+                continue
+            manifest[run.id] = {"name": run.name, "last_step": last_step}
+            run_store.write_json(manifest_path, manifest)
+
+    return manifest
+
+
+def download_run(run, project, directory=run_store.DEFAULT_DIRECTORY, last_step=-1):
+    """Store the config of a wandb run and the history steps after last_step, and
+    return the new last step. Parts written before a failure are removed, so a
+    failed download can simply be retried."""
+    run_path = run_store.get_run_path(project, run.id, directory)
+    os.makedirs(run_path, exist_ok=True)
+    run_store.write_config(run_path, dict(run.config))
+    number_of_existing_parts = len(run_store.get_part_paths(run_path))
+
+    try:
+        rows = []
+        for row in run.scan_history(min_step=last_step + 1):
+            step = row.get("_step", last_step + 1)
+            rows.append(
+                run_store.get_row(
+                    {key: value for key, value in row.items() if key != "_step"}, step
+                )
+            )
+            last_step = max(last_step, step)
+            if len(rows) == run_store.ROWS_PER_PART:
+                run_store.write_part(run_path, rows)
+                rows = []
+        if rows:
+            run_store.write_part(run_path, rows)
+    except Exception:
+        for part_path in run_store.get_part_paths(run_path)[number_of_existing_parts:]:
+            os.remove(part_path)
+        raise
+
+    run_store.write_summary(
+        run_path,
+        {"name": run.name, "state": run.state, "number_of_steps": last_step + 1},
+    )
+    # These runs are already in wandb, so replay_run_store.py skips them
+    run_store.write_json(os.path.join(run_path, "wandb.json"), {"id": run.id})
+    return last_step
+
+
+def load_manifest(project, directory=run_store.DEFAULT_DIRECTORY):
+    """{run id: {"name": ..., "last_step": ...}} of the runs downloaded so far"""
+    manifest_path = os.path.join(directory, project, MANIFEST_FILE)
+    if not os.path.exists(manifest_path):
+        return {}
+    with open(manifest_path) as f:
+        return json.load(f)